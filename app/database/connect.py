@@ -1,10 +1,30 @@
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
+from app.services.metrics import sampler
 from config import settings
 
 
-async_engine = create_async_engine(settings.db_url, future=True)
+async_engine = create_async_engine(settings.db_url, future=True, pool_size=settings.db_pool_size,
+                                   max_overflow=settings.db_max_overflow)
+
+
+def pool_connections() -> dict[tuple[str, ...], int]:
+    """
+    The pool_connections function reads the connections of the database pool by state, for the metrics.
+    Pools without a fixed size (e.g. NullPool in the tests) report nothing.
+
+    :return: A dictionary of the states and the numbers of connections
+    """
+    pool = async_engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return {}
+
+    return {("checked_out",): pool.checkedout(), ("idle",): pool.checkedin(), ("overflow",): max(pool.overflow(), 0),
+            ("size",): pool.size()}
+
+
+sampler.gauge("db_pool_connections", "Connections of the database pool by state", ["state"], pool_connections)
 
 AsyncSessionLocal = sessionmaker(async_engine, autocommit=False, autoflush=False, class_=AsyncSession)  # noqa
 
@@ -4,6 +4,7 @@ from .images import Image
 from .image_comments import ImageComment
 from .image_formats import ImageFormat
 from .tags import Tag
+from .email_outbox import EmailOutbox, OutboxStatus
 from app.database.models.image_raiting import ImageRating
 
 
@@ -16,4 +17,6 @@ __all__ = (
     'ImageFormat',
     'Tag',
     'ImageRating',
+    'EmailOutbox',
+    'OutboxStatus',
 )
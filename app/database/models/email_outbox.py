@@ -0,0 +1,38 @@
+from enum import StrEnum, auto
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import String, Text, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import ENUM, JSONB
+
+from .base import Base
+
+
+class OutboxStatus(StrEnum):
+    pending = auto()
+    failed = auto()
+
+
+class EmailOutbox(Base):
+    """
+    Email waiting to be sent by the outbox worker. Sent emails are deleted, emails that failed permanently
+    or ran out of attempts are kept with the failed status.
+    """
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    recipient: Mapped[str] = mapped_column(String(250))
+    subject: Mapped[str] = mapped_column(String(255))
+    template_name: Mapped[str] = mapped_column(String(255))
+    template_body: Mapped[dict] = mapped_column(JSONB)
+    status: Mapped[OutboxStatus] = mapped_column(
+        ENUM(OutboxStatus, name='outbox_status'), default=OutboxStatus.pending
+    )
+    attempts: Mapped[int] = mapped_column(default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(default=func.now())
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(default=func.now())
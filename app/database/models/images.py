@@ -8,6 +8,8 @@ from sqlalchemy import (
     Integer,
     Table,
     Column,
+    Index,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -23,20 +25,26 @@ image_m2m_tag = Table(
     "image_m2m_tag",
     Base.metadata,
     Column("id", Integer, primary_key=True),
-    Column("image_id", Integer, ForeignKey("images.id", ondelete="CASCADE")),
-    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE")),
+    Column("image_id", Integer, ForeignKey("images.id", ondelete="CASCADE"), index=True),
+    Column("tag_id", Integer, ForeignKey("tags.id", ondelete="CASCADE"), index=True),
 )
 
 
 class Image(Base):
     __tablename__ = 'images'
+    __table_args__ = (
+        # Uploads through the api share the asset of an identical file, a direct upload has its own
+        Index('ix_images_public_id_direct_upload', 'public_id', unique=True,
+              postgresql_where=text('content_hash IS NULL')),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    public_id: Mapped[str] = mapped_column(String(255))
+    public_id: Mapped[str] = mapped_column(String(255), index=True)
+    content_hash: Mapped[Optional[str]] = mapped_column(String(64), index=True)
     description: Mapped[str] = mapped_column(String(1200))
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     updated_at: Mapped[Optional[datetime]] = mapped_column(onupdate=func.now())
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
 
     user: Mapped[User] = relationship(backref="images")
     tags: Mapped[Tag] = relationship("Tag", secondary=image_m2m_tag, backref="images", lazy='joined')
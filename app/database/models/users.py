@@ -2,7 +2,7 @@ from enum import StrEnum, auto
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import String, func, event
+from sqlalchemy import String, func, event, select
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import ENUM
 
@@ -39,15 +39,16 @@ class User(Base):
         when the User model is about to be inserted into the database. The function checks
         if there are any users in the database, and if not, it sets the role of this user to admin.
         If there are already users in the database, then this user's role will be set to user.
+        A single user is selected instead of counting them, so the check does not scan the whole table.
 
         :param mapper: Access the mapper object for the class
         :param connection: Access the database
         :param target: Access the user object that is being saved
         :return: The target object
         """
-        count = connection.execute(func.count(User.id)).scalar()
+        any_user = connection.execute(select(User.id).limit(1)).scalar()
 
-        if not count:
+        if any_user is None:
             target.role = UserRole.admin
         else:
             target.role = UserRole.user
@@ -0,0 +1,82 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class StatementStats:
+    """
+    The sql statements executed while tracked (e.g. during a request): their number, the total time the database
+    took to run them and how many times each statement was executed. A statement executed many times with different
+    parameters is the mark of an N+1 query, e.g. a lazy loaded relationship read in a loop.
+    """
+    __slots__ = ("scope", "count", "duration", "statements")
+
+    def __init__(self, scope: Optional[dict] = None) -> None:
+        self.scope = scope
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter[str] = Counter()
+
+    @property
+    def route(self) -> str:
+        """
+        The route function returns the path template of the route of the tracked request.
+
+        :param self: Represent the instance of the object itself
+        :return: The path template, "<unmatched>" before the request is routed or if no route matches
+        """
+        return getattr((self.scope or {}).get("route"), "path", "<unmatched>")
+
+    def most_repeated(self) -> tuple[Optional[str], int]:
+        """
+        The most_repeated function returns the statement executed the most times.
+
+        :param self: Represent the instance of the object itself
+        :return: The statement and the number of times it was executed, None and 0 without statements
+        """
+        for statement, count in self.statements.most_common(1):
+            return statement, count
+        return None, 0
+
+
+statement_stats: ContextVar[Optional[StatementStats]] = ContextVar("statement_stats", default=None)
+
+
+@contextmanager
+def track_statements(scope: Optional[dict] = None) -> Iterator[StatementStats]:
+    """
+    The track_statements function counts the sql statements executed in the block, by the current task and the
+    tasks and threads it starts.
+
+    :param scope: Optional[dict]: Pass the scope of the request the statements are executed for
+    :return: A context manager returning the statistics of the statements
+    """
+    stats = StatementStats(scope)
+    token = statement_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        statement_stats.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is not None and statement_stats.get() is not None:
+        context.statement_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = statement_stats.get()
+    start = getattr(context, "statement_start", None)
+    if stats is None or start is None:
+        return
+
+    stats.count += 1
+    stats.duration += time.perf_counter() - start
+    stats.statements[statement] += 1
@@ -0,0 +1,22 @@
+from .admission import AdmissionMiddleware
+from .ip_filter import IPFilterMiddleware
+from .metrics import MetricsMiddleware
+from .profiling import ContinuousProfilingMiddleware, ProfilingMiddleware
+from .request_id import RequestIdFilter, RequestIdMiddleware, log_config, request_id
+from .statements import StatementsMiddleware
+from .timing import TimingMiddleware
+
+
+__all__ = (
+    'AdmissionMiddleware',
+    'ContinuousProfilingMiddleware',
+    'IPFilterMiddleware',
+    'MetricsMiddleware',
+    'ProfilingMiddleware',
+    'RequestIdFilter',
+    'RequestIdMiddleware',
+    'StatementsMiddleware',
+    'TimingMiddleware',
+    'log_config',
+    'request_id',
+)
@@ -0,0 +1,61 @@
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.admission import AdmissionControl, Rejected
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware admitting the http requests of every route class up to its adaptive concurrency limit.
+    Requests over the limit wait in a short queue and are rejected with 503 and a Retry-After header when it is full
+    or their wait times out, before they take a database connection or a worker. The latency of an admitted request
+    is measured until its response starts, so a client slowly reading a streamed body does not lower the limit; the
+    request keeps its slot until the body is sent. 5xx responses and errors count as failures.
+    """
+
+    def __init__(self, app: ASGIApp, admission: AdmissionControl, retry_after: int = 1) -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :param admission: AdmissionControl: Pass the limits of the route classes
+        :param retry_after: int: Set the number of seconds rejected clients are asked to wait
+        :return: Nothing
+        """
+        self.app = app
+        self.admission = admission
+        self.rejection = JSONResponse(status_code=503, content={"detail": "Server overloaded, retry later"},
+                                      headers={"Retry-After": str(retry_after)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limit = self.admission.classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limit.acquire()
+        except Rejected:
+            await self.rejection(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        latency = None
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal latency, status
+            if message["type"] == "http.response.start":
+                latency = time.perf_counter() - start
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if latency is None:
+                latency = time.perf_counter() - start
+            limit.release(latency, dropped=status >= 500)
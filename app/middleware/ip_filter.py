@@ -0,0 +1,37 @@
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.services.blocklist import BlocklistSource
+
+
+class IPFilterMiddleware:
+    """
+    ASGI middleware rejecting the http and websocket connections of blocked client addresses with 403.
+    The address is the client of the ASGI scope, behind a proxy the server must be started with trusted proxy headers.
+    """
+
+    def __init__(self, app: ASGIApp, blocklist: BlocklistSource) -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :param blocklist: BlocklistSource: Pass the source of the current blocklist
+        :return: Nothing
+        """
+        self.app = app
+        self.blocklist = blocklist
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        client = scope.get("client")
+
+        if scope["type"] in ("http", "websocket") and client and client[0] in self.blocklist:
+            if scope["type"] == "websocket":
+                await send({"type": "websocket.close", "code": 1008})
+                return
+
+            response = JSONResponse(status_code=403, content={"detail": "You are banned"})
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,51 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_PROGRESS
+
+METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the duration of the http requests by method, route template and status code,
+    and the number of requests in progress.
+    The route is the path template of the matched route (e.g. /api/images/{image_id}), so the number of histograms
+    stays bounded; requests matching no route are recorded with the route "<unmatched>".
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :return: Nothing
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = scope.get("route")
+            method = scope["method"] if scope["method"] in METHODS else "OTHER"
+            HTTP_REQUEST_DURATION.labels(method, getattr(route, "path", "<unmatched>"), str(status)).observe(
+                time.perf_counter() - start
+            )
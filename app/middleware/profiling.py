@@ -0,0 +1,95 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.profiler import ContinuousProfiler, ProfileStore, RequestProfiler
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling single requests on demand.
+    A request with the profiling header from an authorized user is sampled until its response starts: the time of
+    the categories (sql, redis, cloudinary, serialization, other) is added to the Server-Timing header and the folded
+    stacks are stored for download, with their id in the X-Profile-Id header. Other requests only pay for looking
+    up the header.
+    """
+
+    def __init__(self, app: ASGIApp, authorize: Callable[[Request], Awaitable[bool]], store: ProfileStore,
+                 header: str = "X-Profile", interval: float = 0.001) -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :param authorize: Callable[[Request], Awaitable[bool]]: Pass the check of the user allowed to profile
+        :param store: ProfileStore: Pass the store of the profiles
+        :param header: str: Set the name of the request header asking for a profile
+        :param interval: float: Set the sampling interval in seconds
+        :return: Nothing
+        """
+        self.app = app
+        self.authorize = authorize
+        self.store = store
+        self.raw_header = header.lower().encode("latin-1")
+        self.interval = interval
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not any(name == self.raw_header for name, _ in scope["headers"]) \
+                or not await self.authorize(Request(scope)):
+            await self.app(scope, receive, send)
+            return
+
+        profiler: Optional[RequestProfiler] = RequestProfiler(asyncio.current_task(), self.interval)
+
+        async def send_with_profile(message: Message) -> None:
+            nonlocal profiler
+            if message["type"] == "http.response.start" and profiler is not None:
+                profile, profiler = profiler.stop(), None
+                profile_id = await self.store.save(profile)
+
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", profile.server_timing())
+                if profile_id is not None:
+                    headers.append("X-Profile-Id", profile_id)
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+
+
+class ContinuousProfilingMiddleware:
+    """
+    ASGI middleware telling the continuous profiler which http request every task handles, so its samples are
+    aggregated by route.
+    """
+
+    def __init__(self, app: ASGIApp, profiler: ContinuousProfiler) -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :param profiler: ContinuousProfiler: Pass the profiler
+        :return: Nothing
+        """
+        self.app = app
+        self.requests = profiler.requests
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        task = asyncio.current_task()
+        self.requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.requests.pop(task, None)
@@ -0,0 +1,93 @@
+import copy
+import logging
+import re
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+VALID_REQUEST_ID = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving every http and websocket connection a request id.
+    The id sent by the client (or a proxy) is kept if it looks sane, otherwise a new one is generated. It is available
+    as ``request.state.request_id`` and in the ``request_id`` context variable, and returned in the response header.
+    """
+
+    def __init__(self, app: ASGIApp, header: str = "X-Request-ID") -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :param header: str: Set the name of the request and response header
+        :return: Nothing
+        """
+        self.app = app
+        self.header = header
+        self.raw_header = header.lower().encode("latin-1")
+
+    def _request_id(self, scope: Scope) -> str:
+        for name, value in scope["headers"]:
+            if name == self.raw_header:
+                value = value.decode("latin-1")
+                if VALID_REQUEST_ID.fullmatch(value):
+                    return value
+                break
+        return uuid.uuid4().hex
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        current = self._request_id(scope)
+        scope.setdefault("state", {})["request_id"] = current
+
+        async def send_with_request_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(self.header, current)
+            await send(message)
+
+        token = request_id.set(current)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Logging filter adding the id of the current request to the records, as ``%(request_id)s`` in the formats.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get() or "-"
+        return True
+
+
+def log_config() -> dict:
+    """
+    The log_config function returns the logging configuration of uvicorn with the RequestIdFilter installed on its
+    handlers, which also receive the records of the application through the root logger, and the id of the request
+    added to the formats.
+
+    :return: The configuration, for ``uvicorn.Config(log_config=...)`` or ``logging.config.dictConfig``
+    """
+    from uvicorn.config import LOGGING_CONFIG
+
+    config = copy.deepcopy(LOGGING_CONFIG)
+    config["filters"] = {"request_id": {"()": RequestIdFilter}}
+    for handler in config["handlers"].values():
+        handler["filters"] = ["request_id"]
+    for formatter in config["formatters"].values():
+        formatter["fmt"] = formatter["fmt"].replace("%(levelprefix)s ", "%(levelprefix)s [%(request_id)s] ", 1)
+    config["root"] = {"handlers": ["default"], "level": "INFO"}
+
+    return config
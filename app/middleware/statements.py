@@ -0,0 +1,71 @@
+import logging
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.database.statements import StatementStats, track_statements
+from app.services.metrics import DB_REPEATED_STATEMENTS, DB_STATEMENTS, DB_STATEMENTS_DURATION
+from .metrics import METHODS
+
+logger = logging.getLogger(__name__)
+
+
+class StatementsMiddleware:
+    """
+    ASGI middleware counting the sql statements executed by the http requests and the time the database took to run
+    them, by method and route template, and reporting the requests repeating a statement (N+1 queries).
+    In debug mode the numbers are also returned in the X-DB-Statements and Server-Timing headers; they are taken when
+    the response starts, so the statements run while a response is streamed are only in the metrics.
+    """
+
+    def __init__(self, app: ASGIApp, debug: bool = False, repeated: int = 5) -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :param debug: bool: Add the headers to the responses
+        :param repeated: int: Set how many times a request may execute the same statement before it is reported
+        :return: Nothing
+        """
+        self.app = app
+        self.debug = debug
+        self.repeated = repeated
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_statements(scope) as stats:
+            async def send_with_statements(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    headers.append("X-DB-Statements", str(stats.count))
+                    headers.append("Server-Timing", f"db;dur={stats.duration * 1000:.1f}")
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_statements if self.debug else send)
+            finally:
+                self.observe(scope, stats)
+
+    def observe(self, scope: Scope, stats: StatementStats) -> None:
+        """
+        The observe function records the statements of a finished request in the metrics and logs the statement
+        it repeated the most times if it is over the limit.
+
+        :param self: Represent the instance of the object itself
+        :param scope: Scope: Pass the scope of the request
+        :param stats: StatementStats: Pass the statements the request executed
+        :return: Nothing
+        """
+        method = scope["method"] if scope["method"] in METHODS else "OTHER"
+        route = stats.route
+        DB_STATEMENTS.labels(method, route).observe(stats.count)
+        DB_STATEMENTS_DURATION.labels(method, route).observe(stats.duration)
+
+        statement, count = stats.most_repeated()
+        if count >= self.repeated:
+            DB_REPEATED_STATEMENTS.labels(method, route).inc()
+            logger.warning("%s %s executed %s times the statement: %s", method, route, count, statement)
@@ -0,0 +1,38 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware adding the processing time of http requests to the responses, in a Server-Timing header.
+    The time is measured until the response starts, the body of a streaming response is not waited for.
+    """
+
+    def __init__(self, app: ASGIApp, metric: str = "app") -> None:
+        """
+        The __init__ function wraps the application.
+
+        :param self: Represent the instance of the object itself
+        :param app: ASGIApp: Pass the wrapped application
+        :param metric: str: Set the name of the metric in the Server-Timing header
+        :return: Nothing
+        """
+        self.app = app
+        self.metric = metric
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                duration = (time.perf_counter() - start) * 1000
+                MutableHeaders(scope=message).append("Server-Timing", f"{self.metric};dur={duration:.1f}")
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -0,0 +1,138 @@
+from datetime import timedelta
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import EmailOutbox, OutboxStatus
+
+
+async def add_email(recipient: str, subject: str, template_name: str, template_body: dict,
+                    db: AsyncSession) -> EmailOutbox:
+    """
+    The add_email function puts an email into the outbox, it is sent later by the outbox worker.
+    The email is only flushed: the caller commits it with the changes it announces, so it is sent if and only if they
+    are committed.
+
+    :param recipient: str: Specify the email address of the recipient
+    :param subject: str: Specify the subject of the email
+    :param template_name: str: Specify the template the email is rendered with
+    :param template_body: dict: Pass the variables of the template
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The email added to the outbox
+    """
+    email = EmailOutbox(recipient=recipient, subject=subject, template_name=template_name, template_body=template_body)
+
+    db.add(email)
+    await db.flush()
+
+    return email
+
+
+async def claim_emails(limit: int, lease: int, db: AsyncSession) -> list[EmailOutbox]:
+    """
+    The claim_emails function takes a batch of due emails for sending.
+    The emails are locked with SKIP LOCKED, so concurrent workers claim different emails, and their next attempt is
+    postponed by the lease, so the emails of a worker that died are retried once the lease expires.
+    The emails are detached from the session, so they stay readable after the commit.
+
+    :param limit: int: Set the maximum number of emails claimed
+    :param lease: int: Set the number of seconds the emails are reserved for the worker
+    :param db: AsyncSession: Pass the database session to the function
+    :return: A list of email objects
+    """
+    due = (
+        select(EmailOutbox.id)
+        .filter(EmailOutbox.status == OutboxStatus.pending, EmailOutbox.next_attempt_at <= func.now())
+        .order_by(EmailOutbox.next_attempt_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+    emails = await db.scalars(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due.scalar_subquery()))
+        .values(next_attempt_at=func.now() + timedelta(seconds=lease), attempts=EmailOutbox.attempts + 1)
+        .returning(EmailOutbox),
+        execution_options={"synchronize_session": False},
+    )
+    emails = emails.all()  # noqa
+    for email in emails:
+        db.expunge(email)
+    await db.commit()
+
+    return emails
+
+
+async def delete_emails(email_ids: list[int], db: AsyncSession) -> None:
+    """
+    The delete_emails function removes sent emails from the outbox.
+
+    :param email_ids: list[int]: Specify the ids of the emails
+    :param db: AsyncSession: Pass the database session to the function
+    :return: Nothing
+    """
+    if email_ids:
+        await db.execute(delete(EmailOutbox).where(EmailOutbox.id.in_(email_ids)))
+        await db.commit()
+
+
+async def retry_email(email_id: int, delay: float, error: str, db: AsyncSession) -> None:
+    """
+    The retry_email function postpones the next attempt of an email that could not be sent.
+
+    :param email_id: int: Specify the id of the email
+    :param delay: float: Specify the number of seconds before the next attempt
+    :param error: str: Pass the error of the last attempt
+    :param db: AsyncSession: Pass the database session to the function
+    :return: Nothing
+    """
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == email_id)
+        .values(next_attempt_at=func.now() + timedelta(seconds=delay), last_error=error)
+    )
+    await db.commit()
+
+
+async def fail_email(email_id: int, error: str, db: AsyncSession) -> None:
+    """
+    The fail_email function marks an email as failed, it is not retried anymore.
+
+    :param email_id: int: Specify the id of the email
+    :param error: str: Pass the error of the last attempt
+    :param db: AsyncSession: Pass the database session to the function
+    :return: Nothing
+    """
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id == email_id)
+        .values(status=OutboxStatus.failed, last_error=error)
+    )
+    await db.commit()
+
+
+async def get_outbox_stats(db: AsyncSession) -> dict:
+    """
+    The get_outbox_stats function returns the depth of the outbox.
+
+    :param db: AsyncSession: Pass the database session to the function
+    :return: The number of pending, due and failed emails and the age of the oldest pending email in seconds
+    """
+    pending = EmailOutbox.status == OutboxStatus.pending
+
+    result = await db.execute(
+        select(
+            func.count().filter(pending),
+            func.count().filter(pending, EmailOutbox.next_attempt_at <= func.now()),
+            func.count().filter(EmailOutbox.status == OutboxStatus.failed),
+            func.extract('epoch', func.now() - func.min(EmailOutbox.created_at).filter(pending)),
+        )
+    )
+    pending_count, due_count, failed_count, oldest_age = result.one()
+
+    return {
+        "pending": pending_count,
+        "due": due_count,
+        "failed": failed_count,
+        "oldest_pending_age": float(oldest_age or 0),
+    }
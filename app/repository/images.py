@@ -1,4 +1,5 @@
-from sqlalchemy import select
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.models import Image, Tag
 from typing import Optional
@@ -20,7 +21,65 @@ async def get_image_by_id(image_id: int, db: AsyncSession) -> Image:
     )
 
 
-async def create_image(user_id: int, description: str, tags: list[str], public_id: str, db: AsyncSession) -> Image:
+async def get_image_by_public_id(public_id: str, db: AsyncSession) -> Optional[Image]:
+    """
+    The get_image_by_public_id function returns the first image stored under the given cloudinary public id.
+
+    :param public_id: str: Filter the images by public id
+    :param db: AsyncSession: Pass in the database session to use
+    :return: A single image object or None
+    """
+    return await db.scalar(
+        select(Image)
+        .filter(Image.public_id == public_id)
+        .limit(1)
+    )
+
+
+async def get_image_by_content_hash(content_hash: str, db: AsyncSession) -> Optional[Image]:
+    """
+    The get_image_by_content_hash function returns the first image whose file has the given sha-256 hash.
+
+    :param content_hash: str: Filter the images by the hash of their content
+    :param db: AsyncSession: Pass in the database session to use
+    :return: A single image object or None
+    """
+    return await db.scalar(
+        select(Image)
+        .filter(Image.content_hash == content_hash)
+        .limit(1)
+    )
+
+
+async def lock_content_hash(content_hash: str, db: AsyncSession) -> None:
+    """
+    The lock_content_hash function takes a transaction level advisory lock on a content hash, released when the
+    transaction ends. The uploads and the deletions of the same file are serialized with it, so an upload never
+    reuses the asset of an image whose deletion is being committed.
+
+    :param content_hash: str: Specify the sha-256 hash of the file
+    :param db: AsyncSession: Pass in the database session to use
+    :return: None
+    """
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(content_hash))))
+
+
+async def count_images_by_public_id(public_id: str, db: AsyncSession) -> int:
+    """
+    The count_images_by_public_id function returns how many images reference the same cloudinary asset.
+
+    :param public_id: str: Specify the public id of the asset
+    :param db: AsyncSession: Pass in the database session to use
+    :return: The number of images
+    """
+    return await db.scalar(
+        select(func.count(Image.id))
+        .filter(Image.public_id == public_id)
+    )
+
+
+async def create_image(user_id: int, description: str, tags: list[str], public_id: str,
+                       content_hash: Optional[str], db: AsyncSession) -> Optional[Image]:
     """
     The create_image function creates a new image in the database.
 
@@ -28,13 +87,15 @@ async def create_image(user_id: int, description: str, tags: list[str], public_i
     :param description: str: Describe the image
     :param tags: list[str]: Specify that the tags parameter is a list of strings
     :param public_id: str: Store the public id of the image in cloudinary
+    :param content_hash: Optional[str]: Store the sha-256 hash of the image file
     :param db: AsyncSession: Pass in the database session
-    :return: An image object
+    :return: An image object, or None if a direct upload with the same public id already exists
     """
     image = Image(
         user_id=user_id,
         description=description,
-        public_id=public_id
+        public_id=public_id,
+        content_hash=content_hash,
     )
 
     if tags:
@@ -42,7 +103,11 @@ async def create_image(user_id: int, description: str, tags: list[str], public_i
 
     db.add(image)
 
-    await db.commit()
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        return
 
     await db.refresh(image)
 
@@ -71,16 +136,20 @@ async def update_description(image_id: int, description: str, tags: list[str], d
     return image
 
 
-async def delete_image(image: Image, db: AsyncSession) -> None:
+async def delete_image(image: Image, db: AsyncSession) -> int:
     """
     The delete_image function deletes an image from the database.
+    The deletion is only flushed: the caller commits it and then removes the asset of the image from the storage
+    when no other image references it.
 
     :param image: Image: Pass the image object to be deleted
     :param db: AsyncSession: Pass in the database session
-    :return: None, which is the default return value for a function that doesn't explicitly return anything
+    :return: The number of images still referencing the asset of the image
     """
     await db.delete(image)
-    await db.commit()
+    await db.flush()
+
+    return await count_images_by_public_id(image.public_id, db)
 
 
 async def get_images(
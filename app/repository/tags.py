@@ -2,6 +2,7 @@ from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 
 from app.database.models import Tag
 from app.schemas.tag import TagBase
@@ -59,31 +60,26 @@ async def get_or_create_tags(values: list[str], db: AsyncSession) -> list[Tag]:
     """
     The get_or_create_tags function takes a list of strings and an async database session.
     It returns a list of Tag objects.
-    If the tag already exists in the database, it is returned as-is. If not, it is created and then returned.
+    The missing tags are inserted with ON CONFLICT DO NOTHING, so concurrent requests creating the same new tag do
+    not fail on its unique name, and all the tags are then selected. The insert is committed by the caller.
 
     :param values: list[str]: Pass in a list of strings
     :param db: AsyncSession: Pass the database session to the function
     :return: A list of tag objects
     """
-    tags = await get_tags_by_list_values(values, db)
-    new_tags = []
+    if not values:
+        return []
 
-    for value in values:
-        for tag in tags:
-            if value == tag.name:
-                break
-        else:
-            new_tags.append(Tag(name=value.strip()))
+    # Sorted, so concurrent inserts of the same tags lock their names in the same order
+    names = sorted({value.strip() for value in values})
 
-    db.add_all(new_tags)
-
-    await db.commit()
-    for new_tag in new_tags:
-        await db.refresh(new_tag)
-
-    tags.extend(new_tags)
+    await db.execute(
+        insert(Tag)
+        .values([{"name": name} for name in names])
+        .on_conflict_do_nothing(index_elements=[Tag.name])
+    )
 
-    return tags
+    return await get_tags_by_list_values(names, db)
 
 
 async def update_tag(tag_id: int, body: TagBase, db: AsyncSession) -> Optional[Tag]:
@@ -7,6 +7,10 @@ from . import image_formats
 from . import image_comments
 from . import image_ratings
 from . import tags
+from . import media
+from . import outbox
+from . import profiles
+from . import slow_queries
 
 
 
@@ -19,6 +23,10 @@ router.include_router(image_formats.router)
 router.include_router(image_comments.router)
 router.include_router(image_ratings.router)
 router.include_router(tags.router)
+router.include_router(media.router)
+router.include_router(outbox.router)
+router.include_router(profiles.router)
+router.include_router(slow_queries.router)
 
 
 
@@ -1,9 +1,8 @@
 from typing import Any
 
-from fastapi import APIRouter, HTTPException, Depends, status, Security, BackgroundTasks, Request, Form
+from fastapi import APIRouter, HTTPException, Depends, status, Security, Request, Form
 from fastapi.responses import HTMLResponse
 from fastapi.security import OAuth2PasswordRequestForm, HTTPAuthorizationCredentials, HTTPBearer
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.connect import get_db
@@ -13,27 +12,27 @@ from app.schemas.token import TokenResponse
 from app.repository import users as repository_users
 from app.services.auth import AuthService, get_current_active_user
 from app.services.email import send_email_confirmed, send_email_reset_password
-from config import Template
+from app.services.rate_limit import RateLimiter
+from app.services.deadline import deadline_route
+from config import get_html_templates, settings
 
 
-router = APIRouter(prefix='/auth', tags=["Authorization"])
+router = APIRouter(prefix='/auth', tags=["Authorization"], route_class=deadline_route(settings.deadline_default))
 security = HTTPBearer()
 
 
 @router.post("/signup", response_model=user_schemas.UserCreateResponse, status_code=status.HTTP_201_CREATED)
 async def signup(
         body: user_schemas.UserCreate,
-        background_tasks: BackgroundTasks,
         request: Request, db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     The signup function creates a new user in the database.
         It takes in a UserModel object, which is validated by pydantic.
         If the email already exists, it will return an HTTP 409 error code (conflict).
-        Otherwise, it will create a new user and send them an email to confirm their account.
+        Otherwise, it will create a new user and put an email to confirm their account into the outbox.
 
     :param body: UserModel: Get the user's email and password from the request body
-    :param background_tasks: BackgroundTasks: Add tasks to the background queue
     :param request: Request: Get the base url of the server
     :param db: AsyncSession: Get the database session
     :return: A dictionary with the user and a detail message
@@ -45,9 +44,10 @@ async def signup(
                             detail="An account with the same email address or username already exists")
 
     body.password = AuthService.get_password_hash(body.password)
-    new_user = await repository_users.create_user(body, db)
 
-    background_tasks.add_task(send_email_confirmed, new_user.email, new_user.username, request.base_url)
+    # The email is committed with the user, so a user is never created without it
+    await send_email_confirmed(body.email, body.username, request.base_url, db)
+    new_user = await repository_users.create_user(body, db)
 
     return {"user": new_user, "detail": "User successfully created"}
 
@@ -171,19 +171,17 @@ async def confirmed_email(
 @router.post("/reset_password", dependencies=[Depends(RateLimiter(times=10, minutes=5))])
 async def reset_password(
         body: user_schemas.EmailModel,
-        background_tasks: BackgroundTasks, request: Request,
+        request: Request,
         db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     The reset_password function is used to send an email to the user with a link that will allow them
     to reset their password. The function takes in the body of the request, which contains only an email address,
     and uses this information to find and retrieve a user from our database. If no such user exists, then we raise
-    an HTTPException indicating that there was no such account found for this email address. Otherwise, we add a task
-    to our background tasks queue (which is handled by Celery) and call it send_email_reset_password with arguments:
-    the users' email address; username; and base
+    an HTTPException indicating that there was no such account found for this email address. Otherwise, we put the
+    email into the outbox with send_email_reset_password, it is sent by the outbox worker.
 
     :param body: EmailModel: Get the email from the request body
-    :param background_tasks: BackgroundTasks: Add a task to the background tasks queue
     :param request: Request: Get the base url of the website
     :param db: AsyncSession: Access the database
     :return: A message and a timeout_link
@@ -193,7 +191,8 @@ async def reset_password(
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email")
 
-    background_tasks.add_task(send_email_reset_password, user.email, user.username, request.base_url)
+    await send_email_reset_password(user.email, user.username, request.base_url, db)
+    await db.commit()
 
     return {"message": "Password reset email sent", "timeout_link": {"seconds": 86_400}}
 
@@ -224,7 +223,7 @@ async def reset_password_template(
     if not user.email_verified:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Email not confirmed")
 
-    return Template.html_response.TemplateResponse("new_password.html", {"request": request})
+    return get_html_templates().TemplateResponse("new_password.html", {"request": request})
 
 
 @router.post('/reset_password/{token}', include_in_schema=False)
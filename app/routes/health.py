@@ -0,0 +1,33 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.services.health import health_checks
+
+router = APIRouter(tags=["Health"])
+
+
+@router.get("/livez", include_in_schema=False)
+async def livez() -> dict:
+    """
+    The livez function answers the liveness probe: the worker runs its event loop.
+    It does no I/O, so a failing dependency never gets the worker restarted.
+
+    :return: A dictionary with the status
+    """
+    return {"status": "ok"}
+
+
+@router.get("/readyz", include_in_schema=False)
+async def readyz() -> JSONResponse:
+    """
+    The readyz function answers the readiness probe from the cached results of the dependency checks and the
+    saturation of the database pool and of the worker pools, it does no I/O either.
+
+    :return: The report of the checks, with the status 503 if the worker should not receive traffic
+    """
+    ready, checks = health_checks.readiness()
+
+    return JSONResponse(
+        {"status": "ok" if ready else "unavailable", "checks": checks},
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -1,7 +1,6 @@
 from typing import List, Optional, Any
 
 from fastapi import APIRouter, HTTPException, Depends, status
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.connect import get_db
@@ -11,9 +10,13 @@ from app.repository import comments as repository_comments
 from app.repository import images as repository_images
 from app.utils.filters import UserRoleFilter
 from app.services.auth import get_current_active_user
+from app.services.rate_limit import UserRateLimiter
+from app.services.deadline import deadline_route
+from config import settings
 
 
-router = APIRouter(prefix='/images/comments', tags=["Image comments"])
+router = APIRouter(prefix='/images/comments', tags=["Image comments"],
+                   route_class=deadline_route(settings.deadline_default))
 
 
 @router.post("/", response_model=CommentPublic, status_code=status.HTTP_201_CREATED)
@@ -43,7 +46,7 @@ async def create_comment(
     '/',
     response_model=List[CommentPublic],
     description='No more than 10 requests per minute',
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))]
+    dependencies=[Depends(UserRateLimiter(times=10, seconds=60))]
 )
 async def get_comments_by_image_or_user_id(
         image_id: Optional[int] = None,
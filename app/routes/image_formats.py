@@ -1,9 +1,7 @@
-import asyncio
+import zipfile
 from typing import Any, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import StreamingResponse
-from fastapi_limiter.depends import RateLimiter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.connect import get_db
@@ -17,18 +15,26 @@ from app.schemas.image_formats import (
     ImageFormatsResponse,
     ImageFormatRemoveResponse,
 )
-from app.services import cloudinary
+from app.services.storage import get_storage
 from app.services.auth import get_current_active_user
-from app.services.qr_code import create_qr_for_url
+from app.services.rate_limit import UserRateLimiter
+from app.services.qr_code import MEDIA_TYPES, QRCodeFormat, qr_code_key, render_qr_code, render_qr_codes
+from app.services.deadline import deadline_route
+from app.utils.responses import ZipStreamingResponse
+from config import settings
 
-router = APIRouter(prefix="/images/formats", tags=["Image formats"])
+router = APIRouter(prefix="/images/formats", tags=["Image formats"],
+                   route_class=deadline_route(settings.deadline_image_formats))
+
+# The qr code of an image format never changes, it only depends on the query parameters
+QR_CODE_CACHE_CONTROL = "private, max-age=31536000, immutable"
 
 
 @router.post(
     '/', response_model=FormattedImageCreateResponse,
     response_model_by_alias=False,
     status_code=status.HTTP_201_CREATED,
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+    dependencies=[Depends(UserRateLimiter(times=10, seconds=60))])
 async def formatting_image(
         body: ImageTransformation,
         current_user: User = Depends(get_current_active_user),
@@ -53,7 +59,7 @@ async def formatting_image(
     if image.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="You can't format someone else's image")
 
-    format_image = cloudinary.formatting_image_url(image.public_id, body.transformation)
+    format_image = get_storage().formatting_image_url(image.public_id, body.transformation)
 
     formatted_image = await repository_image_formats.create_image_format(
         current_user.id, body.image_id, format_image['format'], db
@@ -99,7 +105,7 @@ async def get_image_formats(
 
 
 @router.delete("/{image_format_id}", response_model=ImageFormatRemoveResponse,
-               dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+               dependencies=[Depends(UserRateLimiter(times=10, seconds=60))])
 async def delete_image_format(
         image_format_id: int,
         db: AsyncSession = Depends(get_db),
@@ -129,21 +135,27 @@ async def delete_image_format(
 @router.get('/qr-code/{image_format_id}')
 async def get_image_format_qrcode(
         image_format_id: int,
+        request: Request,
         version: Optional[int] = 1,
         box_size: Optional[int] = 10,
         border: Optional[int] = 5,
         fit: Optional[bool] = True,
+        image_format: QRCodeFormat = Query(QRCodeFormat.PNG, alias="format"),
         current_user: User = Depends(get_current_active_user),
         db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     The get_image_format_qrcode function is used to generate a QR code for the specified image format.
+    Rendered QR codes are cached, the response has a strong ETag and a request with a matching If-None-Match
+    header gets 304 Not Modified.
 
     :param image_format_id: int: Get the image format by id
+    :param request: Request: Get the If-None-Match header of the request
     :param version: Optional[int]: Specify the version of the qr code
     :param box_size: Optional[int]: Specify the size of each box in pixels
     :param border: Optional[int]: Specify the width of the border that will be added around
     :param fit: Optional[bool]: Determine whether the qr code should be resized to fit the size of
+    :param image_format: QRCodeFormat: Specify the format of the qr code, png or svg
     :param current_user: User: Get the current user from the request
     :param db: AsyncSession: Get the database session
     :return: A qr code for the image format
@@ -155,16 +167,74 @@ async def get_image_format_qrcode(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The image does not belong to you")
 
     image = await get_image_by_id(formatted_image.image_id, db)
+    url = get_storage().formatting_image_url(image.public_id, formatted_image.format)['url']
 
-    loop = asyncio.get_event_loop()
-    qr_image = await loop.run_in_executor(
-        None,
-        create_qr_for_url,
-        cloudinary.formatting_image_url(image.public_id, formatted_image.format)['url'],
-        version,
-        box_size,
-        border,
-        fit
-    )
+    # The key is computed from the parameters, so a revalidation is answered without rendering the qr code
+    headers = {"ETag": f'"{qr_code_key(url, version, box_size, border, fit, image_format)}"',
+               "Cache-Control": QR_CODE_CACHE_CONTROL}
+
+    if_none_match = {tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")}
+    if "*" in if_none_match or headers["ETag"] in if_none_match:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    _, content = await render_qr_code(url, version, box_size, border, fit, image_format)
+
+    return Response(content, media_type=MEDIA_TYPES[image_format], headers=headers)
+
+
+@router.get('/{image_id}/qr-codes.zip', response_class=ZipStreamingResponse)
+async def get_image_qrcodes_zip(
+        image_id: int,
+        format_ids: Optional[list[int]] = Query(None),
+        version: Optional[int] = 1,
+        box_size: Optional[int] = 10,
+        border: Optional[int] = 5,
+        fit: Optional[bool] = True,
+        image_format: QRCodeFormat = Query(QRCodeFormat.PNG, alias="format"),
+        current_user: User = Depends(get_current_active_user),
+        db: AsyncSession = Depends(get_db)
+) -> Any:
+    """
+    The get_image_qrcodes_zip function returns a zip archive with the QR codes of all formats of an image, or only
+    of the formats listed in format_ids. The QR codes are rendered in parallel on a process pool and the archive is
+    streamed while they are rendered.
+
+    :param image_id: int: Get the image by id
+    :param format_ids: Optional[list[int]]: Specify the image formats to export, all of them by default
+    :param version: Optional[int]: Specify the version of the qr codes
+    :param box_size: Optional[int]: Specify the size of each box in pixels
+    :param border: Optional[int]: Specify the width of the border that will be added around
+    :param fit: Optional[bool]: Determine whether the qr codes should be resized to fit the size of
+    :param image_format: QRCodeFormat: Specify the format of the qr codes, png or svg
+    :param current_user: User: Get the current user from the request
+    :param db: AsyncSession: Get the database session
+    :return: A zip archive of the qr codes
+    """
+    image = await repository_images.get_image_by_id(image_id, db)
+    if image is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found image")
+    if current_user.role != UserRole.admin and image.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+
+    image_formats = await repository_image_formats.get_image_formats_by_image_id(image.user_id, image_id, db)
+    if format_ids:
+        image_formats = [formatted_image for formatted_image in image_formats if formatted_image.id in format_ids]
+    if not image_formats:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found formatted image")
 
-    return StreamingResponse(qr_image, media_type="image/png")
+    storage = get_storage()
+    compress_type = zipfile.ZIP_DEFLATED if image_format == QRCodeFormat.SVG else zipfile.ZIP_STORED
+    entries = [
+        (
+            zipfile.ZipInfo(f"{formatted_image.id}.{image_format.value}", formatted_image.created_at.timetuple()[:6]),
+            storage.formatting_image_url(image.public_id, formatted_image.format)['url'],
+        )
+        for formatted_image in image_formats
+    ]
+
+    async def files():
+        async for info, content in render_qr_codes(entries, version, box_size, border, fit, image_format):
+            info.compress_type = compress_type
+            yield info, content
+
+    return ZipStreamingResponse(files(), filename=f"image_{image_id}_qr_codes.zip")
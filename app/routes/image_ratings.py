@@ -7,10 +7,13 @@ from app.database.connect import get_db
 from app.database.models import User, UserRole
 from app.schemas.image_raitings import ImageRatingCreate, ImageRatingUpdate, ImageRatingResponse
 from app.services.auth import get_current_active_user
+from app.services.deadline import deadline_route
 from app.repository import image_ratings as repo_image_ratings
 from app.repository import images as repository_images
+from config import settings
 
-router = APIRouter(prefix="/images/ratings", tags=["Image ratings"])
+router = APIRouter(prefix="/images/ratings", tags=["Image ratings"],
+                   route_class=deadline_route(settings.deadline_default))
 
 
 @router.post("/", response_model=ImageRatingResponse, status_code=status.HTTP_201_CREATED)
@@ -1,24 +1,87 @@
-import asyncio
+import hashlib
+import time
+import uuid
 from typing import Optional, Any
 
 from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status, Query, Body
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.connect import get_db
 from app.database.models import User, UserRole
 from app.repository import images as repository_images
-from app.schemas.image import ImageCreateResponse, ImagePublic, ImageRemoveResponse
-from app.services import cloudinary
+from app.schemas.image import (
+    ImageCreateResponse,
+    ImagePublic,
+    ImageRemoveResponse,
+    ImageUploadSignature,
+    ImageUploadComplete,
+)
+from app.services.storage import StorageBackend, get_storage
 from app.services.auth import get_current_active_user
+from app.services.rate_limit import UserRateLimiter
+from app.services.deadline import deadline_route
+from config import settings
 from .docs import images as docs
 
-router = APIRouter(prefix="/images", tags=["Images"])
+router = APIRouter(prefix="/images", tags=["Images"], route_class=deadline_route(settings.deadline_images))
+
+CHUNK_SIZE = 64 * 1024
+
+
+def validate_tags(tags: Optional[list[str]]) -> None:
+    """
+    The validate_tags function checks that no more than five tags are added to an image and that every tag is
+    between 3 and 50 characters long.
+
+    :param tags: Optional[list[str]]: Pass the list of tags to check
+    :return: None
+    """
+    if tags and len(tags) > 5:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Maximum five tags can be added")
+
+    if tags:
+        for tag in tags:
+            if not 3 <= len(tag) <= 50:
+                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                    detail=f'Invalid length tag: {tag}')
+
+
+def direct_upload_storage() -> StorageBackend:
+    """
+    The direct_upload_storage function returns the storage for the direct upload routes.
+
+    :return: The storage backend
+    """
+    storage = get_storage()
+    if not storage.supports_direct_upload:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                            detail="Direct uploads are not supported by the storage backend")
+
+    return storage
+
+
+async def hash_upload(file: UploadFile) -> str:
+    """
+    The hash_upload function computes the sha-256 hash of an uploaded file, reading it in chunks.
+    The file is rewound afterwards, so it can be read again.
+
+    :param file: UploadFile: Pass the uploaded file
+    :return: The hex digest of the file
+    """
+    sha256 = hashlib.sha256()
+
+    while chunk := await file.read(CHUNK_SIZE):
+        sha256.update(chunk)
+
+    await file.seek(0)
+
+    return sha256.hexdigest()
 
 
 @router.post(
     "/", response_model=ImageCreateResponse, response_model_by_alias=False, status_code=status.HTTP_201_CREATED,
-    dependencies=[Depends(RateLimiter(times=10, seconds=60))],
+    dependencies=[Depends(UserRateLimiter(times=10, seconds=60))],
     description=docs.UPLOAD_IMAGE
 )
 async def upload_image(
@@ -42,29 +105,109 @@ async def upload_image(
     :param : Get the image id from the url
     :return: A dictionary with the image and detail keys
     """
-    if tags and len(tags) > 5:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                            detail="Maximum five tags can be added")
+    validate_tags(tags)
 
-    if tags:
-        for tag in tags:
-            if not 3 <= len(tag) <= 50:
-                raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                                    detail=f'Invalid length tag: {tag}')
+    user_id = current_user.id
+    content_hash = await hash_upload(file)
 
-    loop = asyncio.get_event_loop()
-    image = await loop.run_in_executor(None, cloudinary.upload_image, file.file)
+    uploaded = None
+    while True:
+        # Held until the image is committed, so a deletion of the same file cannot remove the asset it reuses
+        await repository_images.lock_content_hash(content_hash, db)
 
-    if image is None:
-        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid image file")
+        image = await repository_images.get_image_by_content_hash(content_hash, db)
+        if image is not None or uploaded is not None:
+            break
 
-    image = await repository_images.create_image(current_user.id, description.strip(), tags, image['public_id'], db)
+        # The file is stored outside the transaction, a slow storage holds neither a connection nor the lock
+        await db.rollback()
+
+        uploaded = await get_storage().upload_image(file.file)
+        if uploaded is None:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid image file")
+
+    # A concurrent upload of the same file committed its image first, the asset stored here is redundant
+    redundant = uploaded['public_id'] if image is not None and uploaded is not None else None
+    public_id = image.public_id if image is not None else uploaded['public_id']
+
+    image = await repository_images.create_image(
+        user_id, description.strip(), tags, public_id, content_hash, db
+    )
+
+    if redundant is not None:
+        await get_storage().remove_image(redundant)
+
+    return {"image": image, "message": "Image successfully uploaded"}
+
+
+@router.post(
+    "/upload-signature", response_model=ImageUploadSignature,
+    dependencies=[Depends(UserRateLimiter(times=10, seconds=60))]
+)
+async def create_upload_signature(
+        current_user: User = Depends(get_current_active_user),
+        storage: StorageBackend = Depends(direct_upload_storage),
+) -> Any:
+    """
+    The create_upload_signature function issues signed parameters that allow the client to upload an image directly
+    to Cloudinary, so the image bytes never pass through the api. After the upload the client sends the response of
+    Cloudinary to the upload-complete endpoint.
+
+    :param current_user: User: Get the current user that is logged in
+    :param storage: StorageBackend: Get the storage, if it supports direct uploads
+    :return: The upload url and the signed upload parameters
+    """
+    params = storage.sign_upload(f"{current_user.id}_{uuid.uuid4().hex}")
+
+    return {**params, "expires_in": settings.cloudinary_upload_ttl}
+
+
+@router.post(
+    "/upload-complete", response_model=ImageCreateResponse, response_model_by_alias=False,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(UserRateLimiter(times=10, seconds=60))]
+)
+async def complete_upload(
+        body: ImageUploadComplete,
+        db: AsyncSession = Depends(get_db),
+        current_user: User = Depends(get_current_active_user),
+        storage: StorageBackend = Depends(direct_upload_storage),
+) -> Any:
+    """
+    The complete_upload function creates an image from a direct upload to Cloudinary.
+    The signature of the Cloudinary response proves the upload happened, the public id proves the upload parameters
+    were issued to the current user and the version (upload time) must be within the lifetime of the signature.
+
+    :param body: ImageUploadComplete: Get the upload response, description and tags from the request body
+    :param db: AsyncSession: Get the database session
+    :param current_user: User: Get the current user that is logged in
+    :param storage: StorageBackend: Get the storage, if it supports direct uploads
+    :return: A dictionary with the image and detail keys
+    """
+    validate_tags(body.tags)
+
+    if not storage.verify_upload(body.public_id, body.version, body.signature):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid upload signature")
+
+    if not body.public_id.startswith(f"{settings.cloudinary_folder}/{current_user.id}_"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
+
+    if time.time() - body.version > settings.cloudinary_upload_ttl:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Upload signature expired")
+
+    image = await repository_images.create_image(
+        current_user.id, body.description, body.tags, body.public_id, None, db
+    )
+
+    # The public id of a direct upload is unique, a concurrent completion of the same upload fails on it too
+    if image is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Image already uploaded")
 
     return {"image": image, "message": "Image successfully uploaded"}
 
 
 @router.get("/", response_model=list[ImagePublic], description="Get all images",
-            dependencies=[Depends(RateLimiter(times=30, seconds=60))])
+            dependencies=[Depends(UserRateLimiter(times=30, seconds=60))])
 async def get_images(
         skip: int = 0,
         limit: int = Query(default=10, ge=1, le=100),
@@ -116,7 +259,7 @@ async def get_image(
     return image
 
 
-@router.patch("/", response_model=ImagePublic, dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+@router.patch("/", response_model=ImagePublic, dependencies=[Depends(UserRateLimiter(times=10, seconds=60))])
 async def update_image_data(
         image_id: int = Body(ge=1),
         description: str = Body(min_length=10, max_length=1200),
@@ -152,14 +295,14 @@ async def update_image_data(
 
 
 @router.delete("/{image_id}", response_model=ImageRemoveResponse,
-               dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+               dependencies=[Depends(UserRateLimiter(times=10, seconds=60))])
 async def delete_image(
         image_id: int,
         db: AsyncSession = Depends(get_db),
         current_user: User = Depends(get_current_active_user)
 ) -> Any:
     """
-    The delete_image function deletes an image from the database and cloudinary.
+    The delete_image function deletes an image from the database and the storage.
 
     :param image_id: int: Get the image id from the url
     :param db: AsyncSession: Get the database session
@@ -174,8 +317,15 @@ async def delete_image(
     if current_user.role != UserRole.admin and image.user_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied")
 
-    loop = asyncio.get_event_loop()
-    await loop.run_in_executor(None, cloudinary.remove_image, image.public_id)
-    await repository_images.delete_image(image, db)
+    if image.content_hash is not None:
+        await repository_images.lock_content_hash(image.content_hash, db)
+
+    public_id = image.public_id
+    references = await repository_images.delete_image(image, db)
+    await db.commit()
+
+    # Every upload stores a new asset, so no image can reference this one again once the deletion is committed
+    if not references:
+        await get_storage().remove_image(public_id)
 
     return {"message": "Image successfully deleted"}
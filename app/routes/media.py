@@ -0,0 +1,31 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from app.services.storage import get_storage
+from app.services.deadline import deadline_route
+from app.utils.responses import FileRangeResponse
+from config import settings
+
+router = APIRouter(prefix="/media", tags=["Media"], route_class=deadline_route(settings.deadline_default))
+
+
+@router.api_route("/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_media(path: str, request: Request) -> Any:
+    """
+    The get_media function delivers images of storages that keep them locally, with support of range requests.
+    The path is the public id of the image, optionally preceded by a transformation, e.g. c_fill,h_250,w_250.
+
+    :param path: str: Get the path of the image from the url
+    :param request: Request: Get the range header and the method of the request
+    :return: The image file
+    """
+    try:
+        file = await get_storage().open_image(path)
+    except ValueError as err:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(err))
+
+    if file is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found image")
+
+    return FileRangeResponse(file, request.headers.get("range"), method=request.method)
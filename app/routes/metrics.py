@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from app.services import metrics
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics() -> Response:
+    """
+    The get_metrics function exposes the metrics in the Prometheus text format.
+    Behind the pre-fork server they are aggregated across the workers, whichever worker serves the scrape.
+
+    :return: The metrics
+    """
+    return Response(metrics.expose(), media_type=CONTENT_TYPE_LATEST)
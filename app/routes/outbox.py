@@ -0,0 +1,29 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.connect import get_db
+from app.database.models import UserRole
+from app.repository import email_outbox as repository_outbox
+from app.schemas.outbox import OutboxStats
+from app.services.email import outbox
+from app.services.deadline import deadline_route
+from app.utils.filters import UserRoleFilter
+from config import settings
+
+router = APIRouter(prefix="/outbox", tags=["Email outbox"], route_class=deadline_route(settings.deadline_default))
+
+
+@router.get("/stats", response_model=OutboxStats, dependencies=[Depends(UserRoleFilter(UserRole.admin))])
+async def get_outbox_stats(db: AsyncSession = Depends(get_db)) -> Any:
+    """
+    The get_outbox_stats function returns the depth of the email outbox and the counters of the outbox worker
+    of the process that handles the request.
+
+    :param db: AsyncSession: Get the database session
+    :return: The numbers of pending, due and failed emails, the age of the oldest pending email and the worker counters
+    """
+    stats = await repository_outbox.get_outbox_stats(db)
+
+    return {**stats, "worker": {**outbox.stats, "smtp_connects": outbox.pool.connects}}
@@ -0,0 +1,51 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, status
+from fastapi.responses import PlainTextResponse
+
+from app.database.models import UserRole
+from app.services.profiler import continuous_profiler, profiles
+from app.services.deadline import deadline_route
+from app.utils.filters import UserRoleFilter
+from config import settings
+
+router = APIRouter(prefix="/profiles", tags=["Profiles"], route_class=deadline_route(settings.deadline_default))
+
+
+@router.get("/continuous", response_class=PlainTextResponse,
+            dependencies=[Depends(UserRoleFilter(UserRole.admin))])
+async def get_continuous_profile(route: Optional[str] = Query(None, description="Route template, e.g. /api/users/me/"),
+                                 reset: bool = False) -> PlainTextResponse:
+    """
+    The get_continuous_profile function downloads the samples of the continuous profiler of the worker handling the
+    request, in the folded stacks format with the route template as the root frame.
+    Every worker samples its own requests, the value of a stack is its number of samples.
+
+    :param route: Optional[str]: Keep only the samples of a route
+    :param reset: bool: Clear the samples after downloading them, to profile a period of time
+    :return: The folded stacks
+    """
+    headers = {
+        "Content-Disposition": 'attachment; filename="continuous.folded"',
+        "X-Profile-Samples": str(continuous_profiler.samples),
+        "X-Profile-Idle-Samples": str(continuous_profiler.idle),
+    }
+    return PlainTextResponse(continuous_profiler.folded(route, reset), headers=headers)
+
+
+@router.get("/{profile_id}", response_class=PlainTextResponse,
+            dependencies=[Depends(UserRoleFilter(UserRole.admin))])
+async def get_profile(profile_id: str = Path(regex="^[0-9a-f]{32}$")) -> PlainTextResponse:
+    """
+    The get_profile function downloads the profile of a request sent with the X-Profile header.
+    The profile is in the folded stacks format, it can be rendered by flamegraph.pl or opened in speedscope.
+
+    :param profile_id: str: Specify the id returned in the X-Profile-Id header
+    :return: The folded stacks of the profile
+    """
+    content = await profiles.load(profile_id)
+    if content is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+
+    return PlainTextResponse(content,
+                             headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'})
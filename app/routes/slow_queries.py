@@ -0,0 +1,34 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, status
+
+from app.database.models import UserRole
+from app.schemas.slow_query import SlowQueryResponse
+from app.services.slow_queries import slow_queries
+from app.services.deadline import deadline_route
+from app.utils.filters import UserRoleFilter
+from config import settings
+
+router = APIRouter(prefix="/slow-queries", tags=["Slow queries"], route_class=deadline_route(settings.deadline_default))
+
+
+@router.get("/", response_model=list[SlowQueryResponse], dependencies=[Depends(UserRoleFilter(UserRole.admin))])
+async def get_slow_queries() -> Any:
+    """
+    The get_slow_queries function returns the latest sql statements of all the workers that took longer than the
+    threshold, the slowest first, with their redacted parameters, the route that issued them and their plan.
+    The plan is null if it was not explained because other plans were being captured.
+
+    :return: The slow statements
+    """
+    return await slow_queries.recent()
+
+
+@router.delete("/", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(UserRoleFilter(UserRole.admin))])
+async def clear_slow_queries() -> None:
+    """
+    The clear_slow_queries function empties the slow query log.
+
+    :return: Nothing
+    """
+    await slow_queries.clear()
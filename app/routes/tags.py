@@ -11,8 +11,10 @@ from app.repository import tags as repository_tags
 
 from app.utils.filters import UserRoleFilter
 from app.services.auth import get_current_active_user
+from app.services.deadline import deadline_route
+from config import settings
 
-router = APIRouter(prefix='/tags', tags=["tags"])
+router = APIRouter(prefix='/tags', tags=["tags"], route_class=deadline_route(settings.deadline_default))
 
 
 @router.post("/", response_model=list[TagResponse])
@@ -30,6 +32,9 @@ async def get_or_create_tags(
     :return: A list of tag objects
     """
     tags = await repository_tags.get_or_create_tags(tags, db)
+    await db.commit()
+    for tag in tags:
+        await db.refresh(tag)
     return tags
 
 
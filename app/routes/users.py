@@ -1,8 +1,6 @@
-import asyncio
 from typing import Any
 
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.connect import get_db
@@ -11,15 +9,19 @@ from app.repository import users as repository_users
 from app.schemas.user import UserPublic, ProfileUpdate
 
 from app.schemas import user as user_schemas
-from app.services import cloudinary
+from app.services.cloudinary import FORMAT_AVATAR
+from app.services.storage import get_storage
 from app.services.auth import AuthService, get_current_active_user
+from app.services.rate_limit import UserRateLimiter
+from app.services.deadline import deadline_route
 from app.utils.filters import UserRoleFilter
 from config import settings
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=deadline_route(settings.deadline_default))
 
 
-@router.get("/me/", response_model=user_schemas.UserPublic, dependencies=[Depends(RateLimiter(times=30, seconds=60))])
+@router.get("/me/", response_model=user_schemas.UserPublic,
+            dependencies=[Depends(UserRateLimiter(times=30, seconds=60))])
 async def get_me(
         current_user: User = Depends(get_current_active_user)
 ) -> Any:
@@ -33,7 +35,7 @@ async def get_me(
 
 
 @router.patch("/avatar", response_model=user_schemas.UserPublic,
-              dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+              dependencies=[Depends(UserRateLimiter(times=10, seconds=60))])
 async def update_avatar(
         file: UploadFile = File(),
         db: AsyncSession = Depends(get_db),
@@ -51,21 +53,19 @@ async def update_avatar(
     if not link.endswith(settings.cloudinary_folder):
         public_id = None
 
-    loop = asyncio.get_event_loop()
-    image = await loop.run_in_executor(
-        None, cloudinary.upload_image, file.file, public_id
-    )
+    storage = get_storage()
+    image = await storage.upload_image(file.file, public_id)
 
     if image is None:
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Invalid image file")
 
-    avatar = cloudinary.formatting_image_url(image['public_id'], cloudinary.FORMAT_AVATAR, image['version'])
+    avatar = storage.formatting_image_url(image['public_id'], FORMAT_AVATAR, image['version'])
 
     return await repository_users.update_avatar(current_user.id, avatar['url'], db)
 
 
 @router.patch("/email", response_model=user_schemas.UserPublic,
-              dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+              dependencies=[Depends(UserRateLimiter(times=2, seconds=60))])
 async def update_email(
         body: user_schemas.EmailModel,
         db: AsyncSession = Depends(get_db),
@@ -90,7 +90,7 @@ async def update_email(
 
 
 @router.patch("/password", response_model=user_schemas.UserPublic,
-              dependencies=[Depends(RateLimiter(times=2, seconds=60))])
+              dependencies=[Depends(UserRateLimiter(times=2, seconds=60))])
 async def update_password(
         body: user_schemas.UserPasswordUpdate,
         db: AsyncSession = Depends(get_db),
@@ -140,7 +140,7 @@ async def change_user_role(
 
 
 @router.get("/{username}", response_model=user_schemas.UserProfile,
-            dependencies=[Depends(RateLimiter(times=10, seconds=60))])
+            dependencies=[Depends(UserRateLimiter(times=10, seconds=60))])
 async def get_user_profile(
         username: str,
         db: AsyncSession = Depends(get_db),
@@ -1,8 +1,10 @@
-from pydantic import utils, root_validator
+from typing import Optional
+
+from pydantic import utils, root_validator, constr
 
 from .core import CoreModel, IDModelMixin, DateTimeModelMixin
 from .tag import TagResponse
-from app.services.cloudinary import formatting_image_url
+from app.services.storage import get_storage
 
 
 class ImageBase(CoreModel):
@@ -22,7 +24,7 @@ class ImageBase(CoreModel):
 
     @staticmethod
     def format_url(public_id: str):
-        return formatting_image_url(public_id)['url']
+        return get_storage().formatting_image_url(public_id)['url']
 
 
 class ImagePublic(DateTimeModelMixin, ImageBase, IDModelMixin):
@@ -37,3 +39,21 @@ class ImageCreateResponse(CoreModel):
 
 class ImageRemoveResponse(CoreModel):
     message: str = "Image successfully deleted"
+
+
+class ImageUploadSignature(CoreModel):
+    upload_url: str
+    api_key: str
+    public_id: str
+    folder: str
+    timestamp: int
+    signature: str
+    expires_in: int
+
+
+class ImageUploadComplete(CoreModel):
+    public_id: str
+    version: int
+    signature: str
+    description: constr(strip_whitespace=True, min_length=10, max_length=1200)
+    tags: Optional[list[str]] = None
@@ -2,7 +2,8 @@ from typing import Optional
 
 from pydantic import root_validator, utils
 
-from app.services.cloudinary import CroppingOrResizingTransformation, formatting_image_url
+from app.services.cloudinary import CroppingOrResizingTransformation
+from app.services.storage import get_storage
 from .core import CoreModel, IDModelMixin, DateTimeModelMixin
 from .image import ImagePublic
 
@@ -33,7 +34,7 @@ class FormattedImageBase(CoreModel):
 
     @staticmethod
     def format_url(public_id: str, format_: dict):
-        return formatting_image_url(public_id, format_)['url']
+        return get_storage().formatting_image_url(public_id, format_)['url']
 
 
 class FormattedImagePublic(DateTimeModelMixin, FormattedImageBase, IDModelMixin):
@@ -0,0 +1,17 @@
+from app.schemas.core import CoreModel
+
+
+class OutboxWorkerStats(CoreModel):
+    sent: int
+    retried: int
+    failed: int
+    batches: int
+    smtp_connects: int
+
+
+class OutboxStats(CoreModel):
+    pending: int
+    due: int
+    failed: int
+    oldest_pending_age: float
+    worker: OutboxWorkerStats
@@ -0,0 +1,14 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from app.schemas.core import CoreModel
+
+
+class SlowQueryResponse(CoreModel):
+    timestamp: datetime
+    duration: float
+    statement: str
+    parameters: Any
+    route: str
+    plan: Optional[str]
+    error: Optional[str]
@@ -0,0 +1,196 @@
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Iterable, Optional
+
+from prometheus_client import Counter, Histogram
+
+from app.services.metrics import FAST_BUCKETS, sampler
+from config import settings
+
+# Route classes of the api, the first matching (methods, path) applies. Requests outside the api (health probes,
+# metrics, docs) are always admitted.
+ROUTE_CLASSES = (
+    ("auth", None, r"/api/auth/.*"),
+    ("uploads", ("POST",), r"/api/images/?"),
+    ("uploads", ("PATCH",), r"/api/users/avatar"),
+    ("qr", ("GET", "HEAD"), r"/api/images/formats/(qr-code/\d+|\d+/qr-codes\.zip)"),
+    ("reads", ("GET", "HEAD"), r"/api/.*"),
+    ("writes", None, r"/api/.*"),
+)
+
+ADMISSION_QUEUE_DURATION = Histogram(
+    "admission_queue_duration_seconds", "Time the admitted requests waited for a slot, by route class", ["route_class"],
+    buckets=FAST_BUCKETS,
+)
+ADMISSION_REJECTED = Counter(
+    "admission_rejected", "Requests rejected with 503 by the admission control, by route class", ["route_class"],
+)
+
+
+class Rejected(Exception):
+    """
+    The request was not admitted: the queue of its route class is full or it waited too long for a slot.
+    """
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit of a route class that adapts to its latency (AIMD).
+    A request completed within the target latency while the limit was reached raises the limit by 1 / limit, so
+    about 1 per limit requests; a slower or failed request lowers it by the backoff factor, at most once per target
+    latency so one burst of slow requests counts once. When the limit is reached the requests wait in a queue as long
+    as the limit, for at most ``queue_timeout`` seconds.
+    """
+
+    def __init__(self, name: str, target: float, initial: int = 20, min_limit: int = 2, max_limit: int = 200,
+                 backoff: float = 0.9, queue_timeout: float = 0.5) -> None:
+        """
+        The __init__ function creates the limit.
+
+        :param self: Represent the instance of the object itself
+        :param name: str: Set the name of the route class
+        :param target: float: Set the latency in seconds above which the limit is lowered
+        :param initial: int: Set the initial number of concurrent requests
+        :param min_limit: int: Set the lowest limit
+        :param max_limit: int: Set the highest limit
+        :param backoff: float: Set the factor lowering the limit
+        :param queue_timeout: float: Set how long a request may wait for a slot in seconds
+        :return: Nothing
+        """
+        self.name = name
+        self.target = target
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        self.last_decrease = 0.0
+        self.queue_duration = ADMISSION_QUEUE_DURATION.labels(name)
+        self.rejected = ADMISSION_REJECTED.labels(name)
+
+    async def acquire(self) -> None:
+        """
+        The acquire function takes a slot for a request, waiting in the queue if the limit is reached.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        :raises Rejected: If the queue is full or no slot was free within the queue timeout
+        """
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            self.queue_duration.observe(0)
+            return
+
+        if len(self.waiters) >= int(self.limit):
+            self.rejected.inc()
+            raise Rejected(self.name)
+
+        start = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await waiter
+        except (TimeoutError, asyncio.CancelledError) as err:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over as the wait ended
+                self._free()
+            else:
+                self.waiters.remove(waiter)
+            if not isinstance(err, TimeoutError):
+                raise
+            self.rejected.inc()
+            raise Rejected(self.name) from None
+
+        self.queue_duration.observe(time.perf_counter() - start)
+
+    def release(self, latency: float, dropped: bool) -> None:
+        """
+        The release function frees the slot of a finished request, adapts the limit and admits the next queued one.
+
+        :param self: Represent the instance of the object itself
+        :param latency: float: Pass the time the request took once admitted, in seconds
+        :param dropped: bool: Tell whether the request failed or timed out
+        :return: Nothing
+        """
+        saturated = self.in_flight >= int(self.limit) or bool(self.waiters)
+
+        if dropped or latency > self.target:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.target:
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self.last_decrease = now
+        elif saturated:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        self._free()
+
+    def _free(self) -> None:
+        self.in_flight -= 1
+        while self.waiters and self.in_flight < int(self.limit):
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+
+class AdmissionControl:
+    """
+    Adaptive concurrency limits of the route classes of the api, so a slow dependency of one class (e.g. Cloudinary
+    for the uploads) cannot take the database connections and the workers of the others.
+    """
+
+    def __init__(self, targets: dict[str, float], initial: int = 20, max_limit: int = 200, queue_timeout: float = 0.5,
+                 route_classes: Iterable[tuple[str, Optional[tuple[str, ...]], str]] = ROUTE_CLASSES) -> None:
+        """
+        The __init__ function creates a limit for every route class.
+
+        :param self: Represent the instance of the object itself
+        :param targets: dict[str, float]: Pass the target latency of every route class in seconds
+        :param initial: int: Set the initial limit of the route classes
+        :param max_limit: int: Set the highest limit of the route classes
+        :param queue_timeout: float: Set how long a request may wait for a slot in seconds
+        :param route_classes: Iterable[tuple]: Pass the names, methods (None for any) and path patterns of the classes
+        :return: Nothing
+        """
+        self.limits = {
+            name: AdaptiveLimit(name, target, initial=initial, max_limit=max_limit, queue_timeout=queue_timeout)
+            for name, target in targets.items()
+        }
+        self.route_classes = [(name, methods, re.compile(pattern)) for name, methods, pattern in route_classes
+                              if name in self.limits]
+
+    def classify(self, method: str, path: str) -> Optional[AdaptiveLimit]:
+        """
+        The classify function finds the limit of a request.
+
+        :param self: Represent the instance of the object itself
+        :param method: str: Pass the method of the request
+        :param path: str: Pass the path of the request
+        :return: The limit of the route class of the request, None if it is always admitted
+        """
+        for name, methods, pattern in self.route_classes:
+            if (methods is None or method in methods) and pattern.fullmatch(path):
+                return self.limits[name]
+        return None
+
+    def state(self, attribute: str) -> dict[tuple[str, ...], float]:
+        if attribute == "waiters":
+            return {(name,): len(limit.waiters) for name, limit in self.limits.items()}
+        return {(name,): getattr(limit, attribute) for name, limit in self.limits.items()}
+
+
+admission = AdmissionControl(settings.admission_latency_targets, initial=settings.admission_initial_limit,
+                             max_limit=settings.admission_max_limit, queue_timeout=settings.admission_queue_timeout)
+
+# Summed over the workers of the pre-fork server
+sampler.gauge("admission_concurrency_limit", "Concurrency limit of the route classes", ["route_class"],
+              lambda: admission.state("limit"))
+sampler.gauge("admission_in_flight", "Admitted requests in progress by route class", ["route_class"],
+              lambda: admission.state("in_flight"))
+sampler.gauge("admission_queued", "Requests waiting for a slot by route class", ["route_class"],
+              lambda: admission.state("waiters"))
@@ -3,7 +3,6 @@ from calendar import timegm
 from datetime import datetime, timedelta
 from typing import Optional
 
-import redis as redis_db
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
@@ -13,6 +12,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.database.connect import get_db
 from app.repository import users as repository_users
 from app.database.models import User
+from app.services.metrics import InstrumentedSyncRedis
 from config import settings
 
 
@@ -21,7 +21,8 @@ class AuthService:
     SECRET_KEY = settings.secret_key_jwt
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    redis = redis_db.Redis(host=settings.redis_host, port=settings.redis_port, db=0, password=settings.redis_password)
+    redis = InstrumentedSyncRedis(host=settings.redis_host, port=settings.redis_port, db=0,
+                                  password=settings.redis_password, metric_client="auth")
 
     @classmethod
     def verify_password(cls, plain_password, hashed_password) -> bool:
@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import socket
+from ipaddress import ip_network
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from config import settings, BANNED_IPS
+
+logger = logging.getLogger(__name__)
+
+
+class Node:
+    """
+    Node of a prefix trie: the prefix of ``length`` bits of ``value``, the children continue it with a 0 or a 1 bit.
+    """
+
+    __slots__ = ("value", "length", "children", "terminal")
+
+    def __init__(self, value: int, length: int, terminal: bool = False) -> None:
+        self.value = value
+        self.length = length
+        self.children: list[Optional[Node]] = [None, None]
+        self.terminal = terminal
+
+
+class PrefixTrie:
+    """
+    Path-compressed binary trie of network prefixes.
+    Nodes only exist where prefixes branch or end, so a lookup visits at most one node per bit of the longest prefix,
+    usually far fewer. A prefix covered by a shorter one is not stored: the trie only answers if any prefix matches.
+
+    The first ``stride`` bits are resolved by a table indexed with them, which holds True for the slots covered by a
+    shorter prefix and otherwise the first node at or below that depth, so a lookup skips the top of the trie.
+    """
+
+    def __init__(self, bits: int, stride: int = 16) -> None:
+        """
+        The __init__ function creates an empty trie.
+
+        :param self: Represent the instance of the object itself
+        :param bits: int: Specify the size of the addresses, 32 for IPv4 and 128 for IPv6
+        :param stride: int: Set the number of leading bits resolved by the table
+        :return: Nothing
+        """
+        self.bits = bits
+        self.stride = stride
+        self.root = Node(0, 0)
+        self.table: Optional[list[Union[Node, bool, None]]] = None
+
+    def _bit(self, value: int, position: int) -> int:
+        return (value >> (self.bits - 1 - position)) & 1
+
+    def _mask(self, value: int, length: int) -> int:
+        return value >> (self.bits - length) << (self.bits - length) if length else 0
+
+    def add(self, value: int, length: int) -> None:
+        """
+        The add function inserts a prefix into the trie.
+
+        :param self: Represent the instance of the object itself
+        :param value: int: Pass the address of the network
+        :param length: int: Pass the length of the prefix
+        :return: Nothing
+        """
+        value = self._mask(value, length)
+        node = self.root
+        self.table = None
+
+        while True:
+            if node.terminal:
+                return
+
+            if node.length == length:
+                node.terminal = True
+                node.children = [None, None]
+                return
+
+            bit = self._bit(value, node.length)
+            child = node.children[bit]
+
+            if child is None:
+                node.children[bit] = Node(value, length, terminal=True)
+                return
+
+            difference = value ^ child.value
+            common = min(length, child.length, self.bits - difference.bit_length())
+
+            if common == child.length:
+                node = child
+                continue
+
+            branch = Node(self._mask(value, common), common, terminal=common == length)
+            if not branch.terminal:
+                branch.children[self._bit(child.value, common)] = child
+                branch.children[self._bit(value, common)] = Node(value, length, terminal=True)
+            node.children[bit] = branch
+            return
+
+    def __len__(self) -> int:
+        size, nodes = 0, [self.root]
+        while nodes:
+            node = nodes.pop()
+            size += node.terminal
+            nodes += [child for child in node.children if child is not None]
+        return size
+
+    def index(self) -> None:
+        """
+        The index function builds the table of the leading bits, it is rebuilt after the trie changed.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        bits, stride = self.bits, self.stride
+        table: list[Union[Node, bool, None]] = [None] * (1 << stride)
+        nodes = [self.root]
+
+        while nodes:
+            node = nodes.pop()
+            if node.length >= stride:
+                table[node.value >> (bits - stride)] = node
+            elif node.terminal:
+                first, span = node.value >> (bits - stride), 1 << (stride - node.length)
+                table[first:first + span] = [True] * span
+            else:
+                nodes += [child for child in node.children if child is not None]
+
+        self.table = table
+
+    def __contains__(self, value: int) -> bool:
+        if self.table is None:
+            self.index()
+
+        bits = self.bits
+        node = self.table[value >> (bits - self.stride)]
+        if node is None or node is True:
+            return node is True
+        if (value ^ node.value) >> (bits - node.length):
+            return False
+
+        while True:
+            if node.terminal:
+                return True
+
+            node = node.children[(value >> (bits - 1 - node.length)) & 1]
+            if node is None or (value ^ node.value) >> (bits - node.length):
+                return False
+
+
+IPV4_MAPPED = bytes(10) + b"\xff\xff"
+
+
+class Blocklist:
+    """
+    Set of blocked IPv4 and IPv6 networks.
+    """
+
+    def __init__(self, networks: Iterable[str] = ()) -> None:
+        """
+        The __init__ function builds the tries of the networks.
+        Invalid networks are skipped with a warning, so a typo does not disable the whole list.
+
+        :param self: Represent the instance of the object itself
+        :param networks: Iterable[str]: Pass the networks in CIDR notation or single addresses
+        :return: Nothing
+        """
+        self.v4 = PrefixTrie(32)
+        self.v6 = PrefixTrie(128)
+
+        for network in networks:
+            try:
+                network = ip_network(network.strip(), strict=False)
+            except ValueError:
+                logger.warning("Skipping invalid blocklist entry %r", network)
+                continue
+
+            trie = self.v4 if network.version == 4 else self.v6
+            trie.add(int(network.network_address), network.prefixlen)
+
+        self.v4.index()
+        self.v6.index()
+
+    def __len__(self) -> int:
+        return len(self.v4) + len(self.v6)
+
+    def __contains__(self, address: str) -> bool:
+        try:
+            if ":" not in address:
+                return int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big") in self.v4
+            packed = socket.inet_pton(socket.AF_INET6, address)
+        except OSError:
+            return False
+
+        if packed[:12] == IPV4_MAPPED:
+            return int.from_bytes(packed[12:], "big") in self.v4
+        return int.from_bytes(packed, "big") in self.v6
+
+
+def read_networks(path: Path) -> list[str]:
+    """
+    The read_networks function reads a blocklist file: one network per line, empty lines and # comments are ignored.
+
+    :param path: Path: Specify the file
+    :return: A list of networks
+    """
+    with open(path) as file:
+        return [entry for line in file if (entry := line.split("#", 1)[0].strip())]
+
+
+class BlocklistSource:
+    """
+    Holder of the current blocklist, loaded from static networks, a file and a Redis set.
+    A message on the Redis channel reloads the sources; the new blocklist is built in an executor and replaces the
+    previous one at once, so requests are never checked against a partial list.
+    """
+
+    def __init__(self, networks: Iterable[str] = (), path: Optional[Path] = None, redis_key: Optional[str] = None,
+                 channel: str = "blocklist:reload") -> None:
+        """
+        The __init__ function configures the sources, the blocklist only holds the static networks until loaded.
+
+        :param self: Represent the instance of the object itself
+        :param networks: Iterable[str]: Pass the networks that are always blocked
+        :param path: Optional[Path]: Specify the blocklist file
+        :param redis_key: Optional[str]: Specify the Redis set of networks
+        :param channel: str: Specify the Redis channel announcing changes of the sources
+        :return: Nothing
+        """
+        self.networks = [str(network) for network in networks]
+        self.path = path
+        self.redis_key = redis_key
+        self.channel = channel
+        self.blocklist = Blocklist(self.networks)
+        self.redis: Optional[redis.Redis] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __contains__(self, address: str) -> bool:
+        return address in self.blocklist
+
+    @property
+    def reloadable(self) -> bool:
+        """
+        The reloadable property tells whether the blocklist has a source that can change, a file or a Redis set.
+
+        :param self: Represent the instance of the object itself
+        :return: True if the blocklist is reloaded on the messages of the channel
+        """
+        return self.path is not None or self.redis_key is not None
+
+    async def load(self) -> None:
+        """
+        The load function reads the sources and replaces the blocklist.
+        If a source can not be read, the error is logged and the previous blocklist stays in place.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        networks = list(self.networks)
+        loop = asyncio.get_running_loop()
+
+        try:
+            if self.path is not None:
+                networks += await loop.run_in_executor(None, read_networks, self.path)
+            if self.redis is not None and self.redis_key is not None:
+                networks += [network.decode() for network in await self.redis.smembers(self.redis_key)]
+        except (OSError, RedisError) as err:
+            logger.warning("Blocklist was not reloaded: %r", err)
+            return
+
+        self.blocklist = await loop.run_in_executor(None, Blocklist, networks)
+        logger.info("Blocklist loaded with %s networks", len(self.blocklist))
+
+    async def listen(self) -> None:
+        """
+        The listen function reloads the blocklist on every message of the channel until it is cancelled.
+        The subscription is renewed with a backoff when the connection to Redis is lost, followed by a reload since
+        messages may have been missed.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        delay, reconnected = 1, False
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    delay = 1
+                    async for message in pubsub.listen():
+                        if message["type"] == "message" or (message["type"] == "subscribe" and reconnected):
+                            await self.load()
+            except (RedisError, OSError) as err:
+                reconnected = True
+                logger.warning("Blocklist channel lost, retrying in %ss: %r", delay, err)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    async def start(self, client: Optional[redis.Redis] = None) -> None:
+        """
+        The start function loads the blocklist and, with a Redis client, listens for reloads if it is reloadable,
+        e.g. after the file was edited.
+
+        :param self: Represent the instance of the object itself
+        :param client: Optional[redis.Redis]: Pass the Redis client
+        :return: Nothing
+        """
+        self.redis = client
+        await self.load()
+
+        if client is not None and self.reloadable and self._task is None:
+            self._task = asyncio.create_task(self.listen())
+
+    async def stop(self) -> None:
+        """
+        The stop function stops listening for reloads.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self.redis is not None:
+            await self.redis.close()
+            self.redis = None
+
+
+blocklist = BlocklistSource(BANNED_IPS, path=settings.blocklist_file, redis_key=settings.blocklist_redis_key,
+                            channel=settings.blocklist_channel)
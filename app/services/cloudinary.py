@@ -1,20 +1,36 @@
+import hmac
 import uuid
 import enum
 
+from functools import lru_cache
+from types import ModuleType
 from typing import BinaryIO, Optional
 
-import cloudinary
-from cloudinary.uploader import upload
+import httpx
 from pydantic import BaseModel
 
+from app.services import deadline, metrics
 from config import settings
 
-cloudinary.config(
-    cloud_name=settings.cloudinary_name,
-    api_key=settings.cloudinary_api_key,
-    api_secret=settings.cloudinary_api_secret,
-    secure=True
-)
+@lru_cache
+def sdk() -> ModuleType:
+    """
+    The sdk function returns the Cloudinary SDK, configured with the credentials of the settings.
+    The SDK and its dependencies (urllib3, six, ...) are imported on first use, so processes storing the images
+    locally never load them.
+
+    :return: The cloudinary module
+    """
+    import cloudinary
+    import cloudinary.utils
+
+    cloudinary.config(
+        cloud_name=settings.cloudinary_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        secure=True
+    )
+    return cloudinary
 
 
 class CropMode(enum.StrEnum):
@@ -94,25 +110,230 @@ class CroppingOrResizingTransformation(BaseModel):
     gravity: Optional[GravityMode] = None
 
 
-def upload_image(file: BinaryIO, public_id: Optional[str] = None) -> Optional[dict]:
+class AsyncCloudinaryClient:
+    """
+    Asyncio-native client for the Cloudinary upload and admin APIs.
+
+    Requests are sent through a single pool of keep-alive HTTP connections, so CDN calls neither open a new TLS
+    session per request nor occupy an executor thread. Upload parameters are signed with the SDK's own signing code.
+    """
+    BULK_DELETE_LIMIT = 100
+
+    def __init__(
+            self,
+            cloud_name: str,
+            api_key: str,
+            api_secret: str,
+            api_url: str = "https://api.cloudinary.com",
+            pool_size: int = 100,
+            timeout: float = 60,
+            transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        """
+        The __init__ function stores the credentials and connection settings of the client.
+        The underlying connection pool is created lazily on the first request.
+
+        :param self: Represent the instance of the object itself
+        :param cloud_name: str: Specify the name of the cloud
+        :param api_key: str: Specify the api key used to sign requests
+        :param api_secret: str: Specify the api secret used to sign requests
+        :param api_url: str: Specify the base url of the cloudinary api
+        :param pool_size: int: Set the maximum number of pooled connections
+        :param timeout: float: Set the timeout of a single request in seconds, shortened to the deadline of the request
+        :param transport: Optional[httpx.AsyncBaseTransport]: Replace the network transport (used in tests)
+        :return: Nothing
+        """
+        self.cloud_name = cloud_name
+        self.api_key = str(api_key)
+        self.api_secret = api_secret
+        self.api_url = api_url.rstrip('/')
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.transport = transport
+        self.in_progress = metrics.CLOUDINARY_REQUESTS_IN_PROGRESS
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The client property returns the pooled http client, creating it on first use.
+
+        :param self: Represent the instance of the object itself
+        :return: An httpx.AsyncClient object
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=f"{self.api_url}/{sdk().API_VERSION}/{self.cloud_name}",
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=self.timeout,
+                transport=self.transport,
+            )
+        return self._client
+
+    def sign(self, params: dict) -> dict:
+        """
+        The sign function adds the timestamp, signature and api key to the request parameters.
+
+        :param self: Represent the instance of the object itself
+        :param params: dict: Pass the parameters of the request
+        :return: The signed parameters
+        """
+        utils = sdk().utils
+        return utils.sign_request(
+            {**params, "timestamp": utils.now()},
+            {"api_key": self.api_key, "api_secret": self.api_secret},
+        )
+
+    @property
+    def upload_url(self) -> str:
+        """
+        The upload_url property returns the url of the upload api, used by clients uploading images directly.
+
+        :param self: Represent the instance of the object itself
+        :return: The url of the upload api
+        """
+        return f"{self.api_url}/{sdk().API_VERSION}/{self.cloud_name}/image/upload"
+
+    def verify_response(self, public_id: str, version: int, signature: str) -> bool:
+        """
+        The verify_response function checks the signature of an upload api response.
+        Cloudinary signs the public_id and version of every uploaded image with the api secret, so a valid signature
+        proves the image was uploaded with parameters signed by us.
+
+        :param self: Represent the instance of the object itself
+        :param public_id: str: Specify the public id returned by the upload api
+        :param version: int: Specify the version returned by the upload api
+        :param signature: str: Specify the signature returned by the upload api
+        :return: True if the signature is valid
+        """
+        params = {'public_id': public_id, 'version': version}
+        return hmac.compare_digest(signature.encode(), sdk().utils.api_sign_request(params, self.api_secret).encode())
+
+    async def upload(self, file: BinaryIO | bytes, **options) -> dict:
+        """
+        The upload function uploads a file to Cloudinary.
+
+        :param self: Represent the instance of the object itself
+        :param file: BinaryIO | bytes: Pass the file to be uploaded
+        :param options: Pass the upload parameters (public_id, folder, overwrite, ...)
+        :return: The response of the upload api
+        """
+        with self.in_progress.track_inprogress():
+            response = await self.client.post(
+                "/image/upload",
+                data=self.sign(options),
+                files={"file": (options.get("public_id") or "file", file)},
+                timeout=deadline.timeout(self.timeout),
+            )
+        response.raise_for_status()
+
+        return response.json()
+
+    async def destroy(self, public_id: str) -> dict:
+        """
+        The destroy function removes a single image from Cloudinary.
+
+        :param self: Represent the instance of the object itself
+        :param public_id: str: Specify the public id of the image
+        :return: The response of the destroy api
+        """
+        with self.in_progress.track_inprogress():
+            response = await self.client.post("/image/destroy", data=self.sign({"public_id": public_id}),
+                                              timeout=deadline.timeout(self.timeout))
+        response.raise_for_status()
+
+        return response.json()
+
+    async def delete_resources(self, public_ids: list[str]) -> dict:
+        """
+        The delete_resources function removes several images with the admin api.
+        The admin api accepts at most 100 public ids per call, so the list is sent in chunks.
+
+        :param self: Represent the instance of the object itself
+        :param public_ids: list[str]: Specify the public ids of the images
+        :return: A dictionary with the deletion result of every public id
+        """
+        deleted = {}
+
+        for i in range(0, len(public_ids), self.BULK_DELETE_LIMIT):
+            with self.in_progress.track_inprogress():
+                response = await self.client.delete(
+                    "/resources/image/upload",
+                    params=[("public_ids[]", public_id) for public_id in public_ids[i:i + self.BULK_DELETE_LIMIT]],
+                    auth=(self.api_key, self.api_secret),
+                    timeout=deadline.timeout(self.timeout),
+                )
+            response.raise_for_status()
+            deleted.update(response.json()['deleted'])
+
+        return {'deleted': deleted}
+
+    async def ping(self) -> dict:
+        """
+        The ping function checks that the admin api is reachable and accepts the credentials.
+
+        :param self: Represent the instance of the object itself
+        :return: The response of the ping api
+        """
+        with self.in_progress.track_inprogress():
+            response = await self.client.get("/ping", auth=(self.api_key, self.api_secret),
+                                             timeout=deadline.timeout(self.timeout))
+        response.raise_for_status()
+
+        return response.json()
+
+    async def close(self) -> None:
+        """
+        The close function closes all pooled connections.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._client is not None:
+            await self._client.aclose()
+
+
+client = AsyncCloudinaryClient(
+    cloud_name=settings.cloudinary_name,
+    api_key=settings.cloudinary_api_key,
+    api_secret=settings.cloudinary_api_secret,
+    api_url=settings.cloudinary_api_url,
+    pool_size=settings.cloudinary_pool_size,
+    timeout=settings.cloudinary_timeout,
+)
+
+
+async def upload_image(file: BinaryIO, public_id: Optional[str] = None) -> Optional[dict]:
     """
     The upload_image function uploads an image to Cloudinary.
 
     :param file: BinaryIO: Pass the image file to be uploaded
     :param public_id: Optional[str]: Set a custom name for the image
-    :return: A tuple of three values:
+    :return: A dictionary with the url, public_id and version of the image or None if the upload failed
     """
     try:
-        image = cloudinary.uploader.upload_image(
-            file=file,
+        image = await client.upload(
+            file,
             public_id=public_id or uuid.uuid4().hex,
             folder=settings.cloudinary_folder,
-            owerwrite=True,
+            overwrite=True,
         )
-    except cloudinary.exceptions.Error:
+    except httpx.HTTPError:
         return
 
-    return {'url': image.url, 'public_id': image.public_id, 'version': image.version}
+    return {'url': image['secure_url'], 'public_id': image['public_id'], 'version': image['version']}
+
+
+def sign_upload(public_id: str) -> dict:
+    """
+    The sign_upload function creates signed parameters that allow a client to upload an image directly to Cloudinary.
+
+    :param public_id: str: Specify the public id the image will be uploaded with
+    :return: A dictionary with the upload url and the signed upload parameters
+    """
+    params = client.sign({'public_id': public_id, 'folder': settings.cloudinary_folder})
+
+    return {'upload_url': client.upload_url, **params}
 
 
 def formatting_image_url(public_id: str,
@@ -130,7 +351,7 @@ def formatting_image_url(public_id: str,
     if isinstance(transformation, CroppingOrResizingTransformation):
         transformation = transformation.dict()
 
-    image = cloudinary.CloudinaryImage(
+    image = sdk().CloudinaryImage(
         public_id=public_id,
         version=version,
         url_options=transformation
@@ -139,7 +360,7 @@ def formatting_image_url(public_id: str,
     return {'url': image.url, 'format': image.url_options}
 
 
-def remove_image(public_id: str) -> bool:
+async def remove_image(public_id: str) -> bool:
     """
     The remove_image function takes in a public_id string and returns True if the image was successfully removed from
     Cloudinary. If the image is not found, or there is an error removing it, False will be returned.
@@ -147,13 +368,32 @@ def remove_image(public_id: str) -> bool:
     :param public_id: str: Specify the public id of the image to be deleted
     :return: A boolean value indicating whether the image was successfully removed
     """
-    result = cloudinary.uploader.destroy(public_id=public_id)
+    try:
+        result = await client.destroy(public_id)
+    except httpx.HTTPError:
+        return False
+
     if result['result'] == "ok":
         return True
 
     return False
 
 
+async def remove_images(public_ids: list[str]) -> list[str]:
+    """
+    The remove_images function removes several images from Cloudinary with as few requests as possible.
+
+    :param public_ids: list[str]: Specify the public ids of the images to be deleted
+    :return: The public ids that were successfully removed
+    """
+    try:
+        result = await client.delete_resources(public_ids)
+    except httpx.HTTPError:
+        return []
+
+    return [public_id for public_id, status in result['deleted'].items() if status == "deleted"]
+
+
 FORMAT_AVATAR = CroppingOrResizingTransformation(
     crop=CropMode.FILL,
     width=250,
@@ -0,0 +1,127 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Iterator, Optional, Type
+
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# Time the cancelled calls of a handler get to fail on their own past the deadline, e.g. for Postgres to cancel the
+# running statement, before the handler is cancelled
+GRACE = 0.1
+
+# Monotonic time by which the current request must be answered
+request_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    The deadline of the request passed before a call to a backend was sent.
+    """
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[float]:
+    """
+    The deadline function sets the deadline of the code run in the block, an enclosing earlier deadline is kept.
+
+    :param seconds: float: Set the time the block has in seconds
+    :return: A context manager returning the monotonic time of the deadline
+    """
+    expires = time.monotonic() + seconds
+    current = request_deadline.get()
+    if current is not None:
+        expires = min(expires, current)
+
+    token = request_deadline.set(expires)
+    try:
+        yield expires
+    finally:
+        request_deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """
+    The remaining function returns the time left until the deadline of the current request.
+
+    :return: The time left in seconds, None without a deadline
+    :raises DeadlineExceeded: If the deadline has passed
+    """
+    expires = request_deadline.get()
+    if expires is None:
+        return None
+
+    left = expires - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left
+
+
+def timeout(default: Optional[float]) -> Optional[float]:
+    """
+    The timeout function returns the timeout of a call to a backend: the default timeout of the client, shortened
+    to the time left until the deadline of the current request.
+
+    :param default: Optional[float]: Pass the timeout of the client, None for no timeout
+    :return: The timeout in seconds
+    :raises DeadlineExceeded: If the deadline has passed
+    """
+    left = remaining()
+    if left is None or (default is not None and default < left):
+        return default
+    return left
+
+
+@event.listens_for(Session, "after_begin")
+def _set_statement_timeout(session, transaction, connection) -> None:
+    # Postgres cancels a statement still running at the deadline, the connection stays usable
+    left = remaining()
+    if left is not None and connection.dialect.name == "postgresql":
+        connection.execute(text(f"SET LOCAL statement_timeout = {math.ceil(left * 1000)}"))
+
+
+class DeadlineRoute(APIRoute):
+    """
+    Route answering 504 Gateway Timeout when its handler, with the dependencies and the serialization of the
+    response, does not finish within the deadline: the handler is cancelled, and the deadline is passed on to the
+    database, Redis and Cloudinary calls it makes, which fail when it is exceeded.
+    """
+    deadline: Optional[float] = None
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        seconds = self.deadline
+
+        async def handler_with_deadline(request: Request) -> Response:
+            with deadline(seconds) as expires:
+                try:
+                    async with asyncio.timeout(expires + GRACE - time.monotonic()):
+                        return await handler(request)
+                except HTTPException:
+                    raise
+                except Exception as err:
+                    if time.monotonic() < expires:
+                        raise
+                    raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                        detail="Request deadline exceeded") from err
+
+        return handler_with_deadline if seconds is not None else handler
+
+
+@lru_cache
+def deadline_route(seconds: Optional[float]) -> Type[APIRoute]:
+    """
+    The deadline_route function returns the route class of a router whose requests have a deadline, e.g.
+    ``APIRouter(prefix="/images", route_class=deadline_route(settings.deadline_images))``.
+
+    :param seconds: Optional[float]: Set the deadline of the requests in seconds, None for no deadline
+    :return: The route class
+    """
+    if seconds is None:
+        return APIRoute
+    return type("DeadlineRoute", (DeadlineRoute,), {"deadline": seconds})
@@ -1,29 +1,77 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
 from pydantic import EmailStr
-from fastapi_mail import ConnectionConfig, MessageSchema, MessageType, FastMail
-from fastapi_mail.errors import ConnectionErrors
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.database.connect import AsyncSessionLocal
+from app.repository import email_outbox as repository_outbox
 from .auth import AuthService
+from .email_outbox import OutboxWorker, SMTPPool
+from .email_templates import EmailTemplates
 from config import settings, Template
 
+if TYPE_CHECKING:
+    from fastapi_mail import ConnectionConfig
+
+
+@lru_cache
+def get_mail_config() -> "ConnectionConfig":
+    """
+    The get_mail_config function returns the connection settings of the mail server.
+    They are built when the first email is sent, so fastapi-mail is not imported by processes that send none.
+
+    :return: The connection settings
+    """
+    from fastapi_mail import ConnectionConfig
+
+    return ConnectionConfig(
+        MAIL_USERNAME=settings.mail_username,
+        MAIL_PASSWORD=settings.mail_password,
+        MAIL_FROM=settings.mail_from,
+        MAIL_PORT=settings.mail_port,
+        MAIL_SERVER=settings.mail_server,
+        MAIL_FROM_NAME=settings.mail_from_name,
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=settings.mail_validate_certs,
+        TEMPLATE_FOLDER=Template.emails,
+    )
+
+
+templates = EmailTemplates(Template.emails, settings.mail_template_cache_dir)
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME=settings.mail_from_name,
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Template.emails,
+outbox = OutboxWorker(
+    SMTPPool(get_mail_config, size=settings.mail_pool_size),
+    session_factory=AsyncSessionLocal,
+    batch_size=settings.mail_batch_size,
+    max_attempts=settings.mail_max_attempts,
+    retry_base=settings.mail_retry_base,
+    retry_max=settings.mail_retry_max,
+    lease=settings.mail_lease,
+    poll_interval=settings.mail_poll_interval,
+    templates=templates,
 )
 
 
-async def send_email_reset_password(email: EmailStr, username: str, host: str) -> None:
+def notify_on_commit(db: AsyncSession) -> None:
+    """
+    The notify_on_commit function wakes the outbox worker up once the transaction of the session is committed, so it
+    does not look for the new email before it is visible.
+
+    :param db: AsyncSession: Pass the database session the email was added with
+    :return: Nothing
+    """
+    event.listen(db.sync_session, "after_commit", lambda session: outbox.notify(), once=True)
+
+
+async def send_email_reset_password(email: EmailStr, username: str, host: str, db: AsyncSession) -> None:
     """
     The send_email_reset_password function sends an email to the user with a link to reset their password.
+    The email is put into the outbox and sent by the outbox worker, so it survives restarts of the application.
+    It is committed by the caller.
         Args:
             email (str): The user's email address.
             username (str): The user's full name.
@@ -32,27 +80,23 @@ async def send_email_reset_password(email: EmailStr, username: str, host: str) -
     :param email: EmailStr: Get the email address of the user and send an email to that address
     :param username: str: Get the username of the user who is requesting a password reset
     :param host: str: Create the link to reset password
+    :param db: AsyncSession: Pass the database session to the function
     :return: None
     """
-    try:
-        token_verification = await AuthService.create_email_token({"sub": email})
+    token_verification = await AuthService.create_email_token({"sub": email})
 
-        message = MessageSchema(
-            subject="Reset password ",
-            recipients=[email],
-            template_body={"host": host, "full_name": username, "token": token_verification},
-            subtype=MessageType.html
-        )
+    await repository_outbox.add_email(
+        email, "Reset password ", "reset_password.html",
+        {"host": str(host), "full_name": username, "token": token_verification}, db
+    )
+    notify_on_commit(db)
 
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="reset_password.html")
-    except ConnectionErrors as err:
-        print(err)
 
-
-async def send_email_confirmed(email: EmailStr, username: str, host: str) -> None:
+async def send_email_confirmed(email: EmailStr, username: str, host: str, db: AsyncSession) -> None:
     """
     The send_email_confirmed function sends an email to the user with a link to confirm their email address.
+    The email is put into the outbox and sent by the outbox worker, so it survives restarts of the application.
+    It is committed by the caller.
         The function takes in three parameters:
             -email: EmailStr, the user's email address.
             -username: str, the username of the user who is confirming their account.
@@ -61,19 +105,13 @@ async def send_email_confirmed(email: EmailStr, username: str, host: str) -> Non
     :param email: EmailStr: Specify the email address of the user
     :param username: str: Pass the username to the template
     :param host: str: Pass the hostname of the server to the template
+    :param db: AsyncSession: Pass the database session to the function
     :return: Nothing
     """
-    try:
-        token_verification = await AuthService.create_email_token({"sub": email})
-
-        message = MessageSchema(
-            subject="Confirm your email ",
-            recipients=[email],
-            template_body={"host": host, "username": username, "token": token_verification},
-            subtype=MessageType.html
-        )
-
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="confirmed_email.html")
-    except ConnectionErrors as err:
-        print(err)
+    token_verification = await AuthService.create_email_token({"sub": email})
+
+    await repository_outbox.add_email(
+        email, "Confirm your email ", "confirmed_email.html",
+        {"host": str(host), "username": username, "token": token_verification}, db
+    )
+    notify_on_commit(db)
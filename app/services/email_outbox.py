@@ -0,0 +1,379 @@
+import asyncio
+import logging
+import random
+from contextlib import asynccontextmanager
+from email.message import Message
+from email.mime.text import MIMEText
+from email.utils import formataddr, formatdate, make_msgid
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Optional, Union
+
+import aiosmtplib
+from jinja2 import TemplateError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import EmailOutbox
+from app.repository import email_outbox as repository_outbox
+from app.services.email_templates import EmailTemplates
+
+if TYPE_CHECKING:
+    from fastapi_mail import ConnectionConfig
+
+logger = logging.getLogger(__name__)
+
+# Errors of the delivery a retry may overcome, any other error is caused by the message itself
+TRANSIENT_ERRORS = (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError)
+
+
+class SMTPPool:
+    """
+    Pool of authenticated SMTP connections kept open between the messages, so the TLS handshake and the login
+    are paid once per connection instead of once per message.
+    """
+
+    def __init__(self, conf: Union["ConnectionConfig", Callable[[], "ConnectionConfig"]], size: int,
+                 timeout: float = 60) -> None:
+        """
+        The __init__ function creates an empty pool, the connections are opened on demand.
+
+        :param self: Represent the instance of the object itself
+        :param conf: ConnectionConfig | Callable: Pass the connection settings of the mail server, or a function
+            returning them, called on first use
+        :param size: int: Set the maximum number of open connections
+        :param timeout: float: Set the timeout of the smtp commands in seconds
+        :return: Nothing
+        """
+        self._conf = conf
+        self.size = size
+        self.timeout = timeout
+        self.connects = 0
+        self._idle: list[aiosmtplib.SMTP] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @property
+    def conf(self) -> "ConnectionConfig":
+        if callable(self._conf):
+            self._conf = self._conf()
+        return self._conf
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.conf.MAIL_SERVER,
+            port=self.conf.MAIL_PORT,
+            use_tls=self.conf.MAIL_SSL_TLS,
+            start_tls=self.conf.MAIL_STARTTLS,
+            validate_certs=self.conf.VALIDATE_CERTS,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+
+        if self.conf.USE_CREDENTIALS:
+            await smtp.login(self.conf.MAIL_USERNAME, self.conf.MAIL_PASSWORD)
+
+        self.connects += 1
+
+        return smtp
+
+    @asynccontextmanager
+    async def connection(self, fresh: bool = False) -> AsyncIterator[aiosmtplib.SMTP]:
+        """
+        The connection function lends a connection of the pool, opening a new one if no idle connection is left.
+        A connection that raised an error is closed instead of being returned to the pool.
+
+        :param self: Represent the instance of the object itself
+        :param fresh: bool: Open a new connection even if an idle one is available
+        :return: An async context manager of the connection
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.size)
+
+        async with self._semaphore:
+            smtp = None
+            while self._idle and smtp is None:
+                smtp = self._idle.pop()
+                if fresh or not smtp.is_connected:
+                    smtp.close()
+                    smtp = None
+
+            if smtp is None:
+                smtp = await self._connect()
+
+            try:
+                yield smtp
+            except BaseException:
+                smtp.close()
+                raise
+
+            self._idle.append(smtp)
+
+    async def send(self, message: Message) -> None:
+        """
+        The send function sends a message over a pooled connection.
+        If the server closed the idle connection in the meantime, the message is sent again over a new one.
+
+        :param self: Represent the instance of the object itself
+        :param message: Message: Pass the message to send
+        :return: Nothing
+        """
+        try:
+            async with self.connection() as smtp:
+                await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            async with self.connection(fresh=True) as smtp:
+                await smtp.send_message(message)
+
+    async def close(self) -> None:
+        """
+        The close function closes the idle connections.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        while self._idle:
+            smtp = self._idle.pop()
+            try:
+                await smtp.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                smtp.close()
+
+
+def is_permanent(error: Exception) -> bool:
+    """
+    The is_permanent function tells if sending an email can not succeed on a retry:
+    the server rejected the recipient or the message with a 5xx reply, the template can not be rendered or the
+    message is invalid (e.g. a malformed address or header).
+
+    :param error: Exception: Pass the error of the attempt
+    :return: True if the email should not be retried
+    """
+    if isinstance(error, (aiosmtplib.SMTPRecipientsRefused, TemplateError)):
+        return True
+
+    if (isinstance(error, aiosmtplib.SMTPResponseException)
+            and not isinstance(error, aiosmtplib.SMTPServerDisconnected)):
+        return error.code >= 500
+
+    return not isinstance(error, TRANSIENT_ERRORS)
+
+
+class OutboxWorker:
+    """
+    Worker draining the email outbox. Due emails are claimed in batches, rendered in the default executor and sent
+    concurrently over the connections of an SMTP pool. Sent emails are deleted, failed ones are retried with an
+    exponential backoff.
+    """
+
+    def __init__(
+            self,
+            pool: SMTPPool,
+            session_factory: Callable[[], AsyncSession],
+            batch_size: int = 50,
+            max_attempts: int = 8,
+            retry_base: float = 5,
+            retry_max: float = 3600,
+            lease: int = 300,
+            poll_interval: float = 5,
+            templates: Optional[EmailTemplates] = None,
+    ) -> None:
+        """
+        The __init__ function configures the worker.
+
+        :param self: Represent the instance of the object itself
+        :param pool: SMTPPool: Pass the pool of smtp connections
+        :param session_factory: Callable[[], AsyncSession]: Pass the factory of the database sessions
+        :param batch_size: int: Set the number of emails claimed at once
+        :param max_attempts: int: Set the number of attempts before an email is marked as failed
+        :param retry_base: float: Set the delay before the first retry in seconds, it doubles with every attempt
+        :param retry_max: float: Set the maximum delay between the attempts in seconds
+        :param lease: int: Set the number of seconds the claimed emails are reserved for the worker
+        :param poll_interval: float: Set the number of seconds between the checks of an empty outbox
+        :param templates: Optional[EmailTemplates]: Pass the shared email templates,
+            the templates of the folder of the pool configuration if None
+        :return: Nothing
+        """
+        self.pool = pool
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "batches": 0}
+
+        self._templates = templates
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def templates(self) -> EmailTemplates:
+        if self._templates is None:
+            self._templates = EmailTemplates(self.pool.conf.TEMPLATE_FOLDER)
+        return self._templates
+
+    def render(self, email: EmailOutbox) -> Message:
+        """
+        The render function builds the message of an email of the outbox.
+
+        :param self: Represent the instance of the object itself
+        :param email: EmailOutbox: Pass the email of the outbox
+        :return: The message
+        """
+        conf = self.pool.conf
+        html = self.templates.render(email.template_name, email.template_body)
+
+        message = MIMEText(html, "html", "utf-8")
+        message["From"] = formataddr((conf.MAIL_FROM_NAME, conf.MAIL_FROM))
+        message["To"] = email.recipient
+        message["Subject"] = email.subject
+        message["Date"] = formatdate(localtime=True)
+        message["Message-ID"] = make_msgid(domain=conf.MAIL_FROM.rpartition("@")[2])
+
+        return message
+
+    def render_all(self, emails: list[EmailOutbox]) -> list[Union[Message, Exception]]:
+        """
+        The render_all function builds the messages of a batch of emails, it is run in an executor so the rendering
+        does not block the event loop.
+
+        :param self: Represent the instance of the object itself
+        :param emails: list[EmailOutbox]: Pass the emails of the outbox
+        :return: The message of every email, or the error if it could not be rendered
+        """
+        messages = []
+        for email in emails:
+            try:
+                messages.append(self.render(email))
+            except Exception as err:  # noqa: one invalid email must not abort the batch
+                messages.append(err)
+
+        return messages
+
+    async def deliver(self, message: Union[Message, Exception]) -> Optional[Exception]:
+        """
+        The deliver function sends a rendered message.
+        Every error is returned instead of raised: the other emails of the batch, some of them already sent, are
+        then still deleted or retried.
+
+        :param self: Represent the instance of the object itself
+        :param message: Union[Message, Exception]: Pass the message, or the error of its rendering
+        :return: None if the email was sent, the error otherwise
+        """
+        if isinstance(message, Exception):
+            return message
+
+        try:
+            await self.pool.send(message)
+        except Exception as err:  # noqa: unknown errors are permanent, see is_permanent
+            return err
+
+    def retry_delay(self, attempts: int) -> float:
+        """
+        The retry_delay function returns the delay before the next attempt, doubling with every attempt,
+        with a random jitter so the retries of many emails are spread.
+
+        :param self: Represent the instance of the object itself
+        :param attempts: int: Specify the number of attempts made
+        :return: The delay in seconds
+        """
+        return min(self.retry_max, self.retry_base * 2 ** (attempts - 1)) * random.uniform(0.5, 1)
+
+    async def drain_once(self) -> int:
+        """
+        The drain_once function claims a batch of due emails and sends them.
+
+        :param self: Represent the instance of the object itself
+        :return: The number of emails claimed
+        """
+        async with self.session_factory() as db:
+            emails = await repository_outbox.claim_emails(self.batch_size, self.lease, db)
+            if not emails:
+                return 0
+
+            messages = await asyncio.get_running_loop().run_in_executor(None, self.render_all, emails)
+            errors = await asyncio.gather(*(self.deliver(message) for message in messages))
+
+            await repository_outbox.delete_emails(
+                [email.id for email, error in zip(emails, errors) if error is None], db
+            )
+
+            for email, error in zip(emails, errors):
+                if error is None:
+                    continue
+
+                logger.warning("Sending email %s failed (attempt %s): %r", email.id, email.attempts, error)
+
+                if is_permanent(error) or email.attempts >= self.max_attempts:
+                    await repository_outbox.fail_email(email.id, repr(error), db)
+                    self.stats["failed"] += 1
+                else:
+                    await repository_outbox.retry_email(email.id, self.retry_delay(email.attempts), repr(error), db)
+                    self.stats["retried"] += 1
+
+        self.stats["sent"] += errors.count(None)
+        self.stats["batches"] += 1
+
+        return len(emails)
+
+    def notify(self) -> None:
+        """
+        The notify function wakes the worker of this process up, so a new email is sent without waiting for the
+        next poll.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        """
+        The run function drains the outbox until it is cancelled.
+        When the outbox is empty it waits for a notification or the poll interval.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        self._wakeup = asyncio.Event()
+
+        while True:
+            try:
+                claimed = await self.drain_once()
+            except Exception as err:  # noqa: the worker must survive database outages
+                logger.exception("Draining the email outbox failed: %r", err)
+                claimed = 0
+
+            if claimed < self.batch_size:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        """
+        The start function runs the worker as a task of the running event loop.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        The stop function cancels the worker and closes the smtp connections.
+        Emails claimed by a cancelled batch are retried when their lease expires.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+        await self.pool.close()
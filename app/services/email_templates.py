@@ -0,0 +1,120 @@
+from functools import partial
+from itertools import chain
+from os import PathLike
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, nodes
+
+
+Renderer = Callable[[dict], str]
+
+
+def static_parts(environment: Environment, name: str) -> Optional[tuple[tuple[str, ...], tuple[str, ...]]]:
+    """
+    The static_parts function splits a template into its static text and the variables printed between it.
+    Only templates made of plain text and ``{{ variable }}`` expressions can be split, a template with tags, filters
+    or attribute access can not be substituted and has to be rendered by jinja.
+
+    :param environment: Environment: Pass the environment loading the template
+    :param name: str: Specify the name of the template
+    :return: The static texts and the variable names, None if the template can not be split
+    """
+    source, _, _ = environment.loader.get_source(environment, name)
+    statics, names, text = [], [], []
+
+    for output in environment.parse(source, name).body:
+        if not isinstance(output, nodes.Output):
+            return None
+
+        for node in output.nodes:
+            if isinstance(node, nodes.TemplateData):
+                text.append(node.data)
+            elif isinstance(node, nodes.Name) and node.ctx == "load" and node.name not in environment.globals:
+                statics.append("".join(text))
+                names.append(node.name)
+                text = []
+            else:
+                return None
+
+    statics.append("".join(text))
+
+    return tuple(statics), tuple(names)
+
+
+def substitute(statics: tuple[str, ...], names: tuple[str, ...], context: dict) -> str:
+    """
+    The substitute function renders a split template: the values of the variables are put between the static texts.
+    Like in jinja a missing variable is rendered as an empty string.
+
+    :param statics: tuple[str, ...]: Pass the static texts of the template
+    :param names: tuple[str, ...]: Pass the names of the variables between the static texts
+    :param context: dict: Pass the values of the variables
+    :return: The rendered template
+    """
+    values = [str(context[name]) if name in context else "" for name in names]
+
+    return "".join(chain.from_iterable(zip(statics, values))) + statics[-1]
+
+
+class EmailTemplates:
+    """
+    Shared environment of the email templates.
+    The templates are compiled once, with the compiled code kept in a bytecode cache so the other workers and the
+    next starts skip the compilation, and the templates without logic are pre-rendered into static texts, so sending
+    an email only substitutes the fields of the recipient.
+    """
+
+    def __init__(self, folder: Union[str, PathLike], cache_dir: Optional[Union[str, PathLike]] = None) -> None:
+        """
+        The __init__ function creates the environment of the templates, they are compiled on first use or by compile.
+
+        :param self: Represent the instance of the object itself
+        :param folder: Union[str, PathLike]: Specify the folder of the templates
+        :param cache_dir: Optional[Union[str, PathLike]]: Specify the folder of the bytecode cache,
+            a folder in the temporary directory if None
+        :return: Nothing
+        """
+        if cache_dir is not None:
+            Path(cache_dir).mkdir(parents=True, exist_ok=True)
+
+        self.environment = Environment(
+            loader=FileSystemLoader(folder),
+            bytecode_cache=FileSystemBytecodeCache(str(cache_dir) if cache_dir is not None else None),
+            auto_reload=False,
+        )
+        self._renderers: dict[str, Renderer] = {}
+
+    def _compile(self, name: str) -> Renderer:
+        template = self.environment.get_template(name)
+        parts = static_parts(self.environment, name)
+
+        if parts is None:
+            return lambda context: template.render(**context)
+
+        return partial(substitute, *parts)
+
+    def compile(self) -> None:
+        """
+        The compile function compiles all the templates of the folder.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        for name in self.environment.list_templates():
+            self._renderers[name] = self._compile(name)
+
+    def render(self, name: str, context: dict) -> str:
+        """
+        The render function renders a template.
+
+        :param self: Represent the instance of the object itself
+        :param name: str: Specify the name of the template
+        :param context: dict: Pass the variables of the template
+        :return: The rendered template
+        """
+        renderer = self._renderers.get(name)
+        if renderer is None:
+            renderer = self._renderers[name] = self._compile(name)
+
+        return renderer(context)
@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import text
+
+from app.database.connect import async_engine
+from app.services import cloudinary
+from app.services.metrics import InstrumentedRedis, pending_tasks
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CheckResult:
+    """
+    Outcome of the last run of a dependency check.
+    """
+    ok: bool
+    detail: str
+    latency: float
+    checked_at: float
+
+
+class HealthChecks:
+    """
+    Dependency checks of the readiness probe, run in the background and served from their last results.
+    A probe never waits for a dependency, so a slow database slows down neither the probes nor the requests, and
+    the dependencies see one check per interval and worker however often the orchestrator probes. Results older than
+    ``stale_after`` fail, so a stuck check loop does not keep reporting the worker ready.
+
+    Saturation checks are read on every probe instead: they only look at counters of the process.
+    """
+
+    def __init__(self, interval: float = 5, timeout: float = 2, stale_after: Optional[float] = None) -> None:
+        """
+        The __init__ function creates the checks, they report not ready until started and run once.
+
+        :param self: Represent the instance of the object itself
+        :param interval: float: Set the time between two runs of the checks in seconds
+        :param timeout: float: Set the time after which a check fails in seconds
+        :param stale_after: Optional[float]: Set the age after which a result fails, three intervals if None
+        :return: Nothing
+        """
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after if stale_after is not None else 3 * interval
+        self.checks: dict[str, tuple[Callable[[], Awaitable[Optional[str]]], bool]] = {}
+        self.saturation: dict[str, Callable[[], Optional[str]]] = {}
+        self.results: dict[str, CheckResult] = {}
+        self.draining = False
+        self._task: Optional[asyncio.Task] = None
+
+    def add_check(self, name: str, check: Callable[[], Awaitable[Optional[str]]], critical: bool = True) -> None:
+        """
+        The add_check function registers a dependency check.
+
+        :param self: Represent the instance of the object itself
+        :param name: str: Specify the name of the check
+        :param check: Callable: Pass the coroutine function checking the dependency, it raises or returns a detail
+        :param critical: bool: Fail the readiness when the check fails, otherwise it is only reported
+        :return: Nothing
+        """
+        self.checks[name] = (check, critical)
+
+    def add_saturation(self, name: str, check: Callable[[], Optional[str]]) -> None:
+        """
+        The add_saturation function registers a saturation check.
+
+        :param self: Represent the instance of the object itself
+        :param name: str: Specify the name of the check
+        :param check: Callable: Pass the function returning a description of the saturation or None
+        :return: Nothing
+        """
+        self.saturation[name] = check
+
+    async def _run(self, name: str, check: Callable[[], Awaitable[Optional[str]]]) -> None:
+        start = time.perf_counter()
+        try:
+            detail = await asyncio.wait_for(check(), self.timeout)
+            ok = True
+        except asyncio.TimeoutError:
+            ok, detail = False, f"timed out after {self.timeout}s"
+        except Exception as err:  # noqa: any failure of a dependency makes the check fail
+            ok, detail = False, repr(err)
+
+        if not ok and (previous := self.results.get(name)) is not None and previous.ok:
+            logger.warning("Health check %s failed: %s", name, detail)
+        self.results[name] = CheckResult(ok, detail or "ok", time.perf_counter() - start, time.monotonic())
+
+    async def run_checks(self) -> None:
+        """
+        The run_checks function runs all dependency checks concurrently and stores their results.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        await asyncio.gather(*(self._run(name, check) for name, (check, _) in self.checks.items()))
+
+    async def loop(self) -> None:
+        """
+        The loop function runs the checks every interval until it is cancelled.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        while True:
+            await self.run_checks()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """
+        The start function starts running the checks in the background.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        self.draining = False
+        if self._task is None:
+            self._task = asyncio.create_task(self.loop())
+
+    async def stop(self) -> None:
+        """
+        The stop function reports the worker not ready from now on and stops the checks.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        self.draining = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def readiness(self) -> tuple[bool, dict]:
+        """
+        The readiness function evaluates the cached results and the saturation of the worker, without any I/O.
+
+        :param self: Represent the instance of the object itself
+        :return: Whether the worker is ready and the report of every check
+        """
+        now = time.monotonic()
+        ready = not self.draining
+        report = {}
+
+        for name, (_, critical) in self.checks.items():
+            result = self.results.get(name)
+            if result is None:
+                ok, entry = False, {"ok": False, "detail": "not checked yet"}
+            else:
+                age = now - result.checked_at
+                ok = result.ok and age <= self.stale_after
+                detail = result.detail if ok or not result.ok else f"stale, last checked {age:.0f}s ago"
+                entry = {"ok": ok, "detail": detail, "latency_ms": round(result.latency * 1000, 1),
+                         "age_s": round(age, 1)}
+            entry["critical"] = critical
+            report[name] = entry
+            ready = ready and (ok or not critical)
+
+        for name, check in self.saturation.items():
+            detail = check()
+            report[name] = {"ok": detail is None, "detail": detail or "ok", "critical": True}
+            ready = ready and detail is None
+
+        return ready, report
+
+
+async def check_postgres() -> None:
+    async with async_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+redis_client = InstrumentedRedis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password,
+                                 db=0, socket_timeout=settings.health_timeout,
+                                 socket_connect_timeout=settings.health_timeout, metric_client="health")
+
+
+async def check_redis() -> None:
+    await redis_client.ping()
+
+
+async def check_cloudinary() -> None:
+    await cloudinary.client.ping()
+
+
+def pool_saturation() -> Optional[str]:
+    """
+    The pool_saturation function checks if every connection of the database pool is in use, in which case new
+    requests wait for a connection.
+
+    :return: A description of the saturation or None
+    """
+    pool = async_engine.sync_engine.pool
+    if not hasattr(pool, "checkedout"):
+        return None
+
+    limit = settings.db_pool_size + settings.db_max_overflow
+    in_use = pool.checkedout()
+    return f"{in_use} of {limit} connections in use" if in_use >= limit else None
+
+
+def executor_saturation(executor: str, workers: Optional[int]) -> Callable[[], Optional[str]]:
+    """
+    The executor_saturation function creates the check of a worker pool, which is saturated when more tasks than
+    ``health_executor_backlog`` per worker are submitted and not finished.
+
+    :param executor: str: Specify the name of the worker pool in the executor_tasks metric
+    :param workers: Optional[int]: Specify the number of workers of the pool, the number of cpus if None
+    :return: The check
+    """
+    limit = settings.health_executor_backlog * (workers or os.cpu_count() or 1)
+
+    def check() -> Optional[str]:
+        pending = pending_tasks[executor]
+        return f"{pending} of {limit} tasks pending" if pending >= limit else None
+
+    return check
+
+
+health_checks = HealthChecks(settings.health_interval, settings.health_timeout)
+health_checks.add_check("postgres", check_postgres)
+health_checks.add_check("redis", check_redis)
+if settings.storage_backend == "cloudinary":
+    health_checks.add_check("cloudinary", check_cloudinary, critical=False)
+health_checks.add_saturation("db_pool", pool_saturation)
+health_checks.add_saturation("qr_code_executor", executor_saturation("qr_code", settings.qr_workers))
+health_checks.add_saturation("local_storage_executor",
+                             executor_saturation("local_storage", settings.storage_local_workers))
+
+
+def start() -> None:
+    """
+    The start function starts the dependency checks of the process.
+
+    :return: Nothing
+    """
+    health_checks.start()
+
+
+async def close() -> None:
+    """
+    The close function reports the process not ready, stops the dependency checks and closes their connections.
+
+    :return: Nothing
+    """
+    await health_checks.stop()
+    await redis_client.close()
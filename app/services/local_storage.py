@@ -0,0 +1,435 @@
+import asyncio
+import os
+import re
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+from pydantic import ValidationError
+
+from app.services import metrics
+from app.services.cloudinary import CropMode, ResizeMode, GravityMode, CroppingOrResizingTransformation
+from app.services.storage import StorageBackend
+
+
+GRAVITY_CENTERING = {
+    GravityMode.CENTER: (0.5, 0.5),
+    GravityMode.NORTH: (0.5, 0.0),
+    GravityMode.NORTH_WEST: (0.0, 0.0),
+    GravityMode.NORTH_EAST: (1.0, 0.0),
+    GravityMode.SOUTH: (0.5, 1.0),
+    GravityMode.SOUTH_WEST: (0.0, 1.0),
+    GravityMode.SOUTH_EAST: (1.0, 1.0),
+    GravityMode.WEST: (0.0, 0.5),
+    GravityMode.EAST: (1.0, 0.5),
+}
+
+URL_PARAMS = {'width': 'w', 'height': 'h', 'crop': 'c', 'gravity': 'g'}
+SEGMENT = re.compile(r"^[a-z]_[a-z0-9_]+(,[a-z]_[a-z0-9_]+)*$")
+
+
+def format_segment(transformation: dict) -> str:
+    """
+    The format_segment function returns the url segment of a transformation, e.g. c_fill,h_250,w_250.
+    The parameters are sorted, so a transformation has a single segment.
+
+    :param transformation: dict: Specify the transformation parameters
+    :return: The segment, empty without transformation
+    """
+    return ",".join(sorted(
+        f"{URL_PARAMS[key]}_{value}" for key, value in transformation.items() if key in URL_PARAMS and value
+    ))
+
+
+def probe_image(path: str) -> Optional[str]:
+    """
+    The probe_image function checks that a file is an image readable by Pillow.
+    It runs in the process pool of the local storage.
+
+    :param path: str: Specify the path of the file
+    :return: The lowercase format of the image (png, jpeg, ...) or None if the file is not an image
+    """
+    try:
+        with Image.open(path) as image:
+            image.verify()
+            return image.format.lower()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return
+
+
+def _crop_box(size: tuple[int, int], box: tuple[int, int], gravity: Optional[GravityMode]) -> tuple[int, ...]:
+    width, height = size
+    box_width, box_height = min(box[0], width), min(box[1], height)
+    center_x, center_y = GRAVITY_CENTERING[gravity or GravityMode.CENTER]
+
+    left = round((width - box_width) * center_x)
+    top = round((height - box_height) * center_y)
+
+    return left, top, left + box_width, top + box_height
+
+
+def _pad(image: Image.Image, box: tuple[int, int], gravity: Optional[GravityMode]) -> Image.Image:
+    mode = "RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB"
+    background = Image.new(mode, box, (255, 255, 255, 0) if mode == "RGBA" else (255, 255, 255))
+    center_x, center_y = GRAVITY_CENTERING[gravity or GravityMode.CENTER]
+
+    background.paste(image.convert(mode), (
+        round((box[0] - image.width) * center_x),
+        round((box[1] - image.height) * center_y),
+    ))
+
+    return background
+
+
+def transform_image(image: Image.Image, transformation: CroppingOrResizingTransformation) -> Image.Image:
+    """
+    The transform_image function applies the crop/resize modes of Cloudinary to an image with Pillow.
+    Add-on modes (imagga_*) are approximated with their built-in counterparts.
+
+    :param image: Image.Image: Pass the image to be transformed
+    :param transformation: CroppingOrResizingTransformation: Specify the transformation
+    :return: The transformed image
+    """
+    width, height = transformation.width or None, transformation.height or None
+    if width is None and height is None:
+        return image
+
+    # A missing dimension keeps the aspect ratio of the image
+    ratio = image.width / image.height
+    box = (width or round(height * ratio), height or round(width / ratio))
+    crop, gravity = transformation.crop or ResizeMode.SCALE, transformation.gravity
+
+    if crop == CropMode.CROP:
+        return image.crop(_crop_box(image.size, box, gravity))
+
+    if crop in (CropMode.FILL, CropMode.THUMB, CropMode.IMAGGA_CROP):
+        return ImageOps.fit(image, box, Image.LANCZOS, centering=GRAVITY_CENTERING[gravity or GravityMode.CENTER])
+
+    if crop == CropMode.IFILL:
+        scale = min(max(box[0] / image.width, box[1] / image.height), 1)
+        image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+        return image.crop(_crop_box(image.size, box, gravity))
+
+    if crop in (ResizeMode.SCALE, ResizeMode.IMAGGA_SCALA):
+        return image.resize(box, Image.LANCZOS)
+
+    scale = min(box[0] / image.width, box[1] / image.height)
+    if crop in (ResizeMode.LIMIT, ResizeMode.IPAD):
+        scale = min(scale, 1)
+    elif crop in (ResizeMode.M_FIT, ResizeMode.MPAD):
+        scale = max(scale, 1)
+
+    image = image.resize((round(image.width * scale), round(image.height * scale)), Image.LANCZOS)
+
+    if crop in (ResizeMode.PAD, ResizeMode.IPAD, ResizeMode.MPAD, CropMode.FILL_PAD):
+        return _pad(image, box, gravity)
+
+    return image
+
+
+def render_variant(source: str, target: str, transformation: dict) -> int:
+    """
+    The render_variant function transforms an image file and writes the result next to the target atomically.
+    It runs in the process pool of the local storage.
+
+    :param source: str: Specify the path of the original image
+    :param target: str: Specify the path of the transformed image
+    :param transformation: dict: Specify the transformation parameters
+    :return: The size of the transformed image in bytes
+    """
+    with Image.open(source) as image:
+        image_format = image.format
+        result = transform_image(image, CroppingOrResizingTransformation(**transformation))
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+
+        if image_format == "JPEG" and result.mode not in ("RGB", "L"):
+            result = result.convert("RGB")
+        result.save(tmp, format=image_format)
+
+    os.replace(tmp, target)
+
+    return os.path.getsize(target)
+
+
+class VariantCache:
+    """
+    Least recently used index of the transformed images kept on disk.
+
+    When the total size of the files exceeds ``max_size`` the least recently used ones are deleted.
+    """
+
+    def __init__(self, root: Path, max_size: int) -> None:
+        """
+        The __init__ function indexes the files already stored in the cache directory, oldest access first.
+
+        :param self: Represent the instance of the object itself
+        :param root: Path: Specify the cache directory
+        :param max_size: int: Set the maximum total size of the cached files in bytes
+        :return: Nothing
+        """
+        self.root = root
+        self.max_size = max_size
+        self.entries: OrderedDict[Path, int] = OrderedDict()
+        self.size = 0
+        self.hits = metrics.CACHE_REQUESTS.labels("image_variants", "hit")
+        self.misses = metrics.CACHE_REQUESTS.labels("image_variants", "miss")
+
+        files = [(path, path.stat()) for path in root.rglob("*") if path.is_file() and path.suffix != ".tmp"]
+        for path, stat in sorted(files, key=lambda item: item[1].st_atime):
+            self.add(path, stat.st_size)
+
+    def get(self, path: Path) -> bool:
+        """
+        The get function marks a cached file as recently used.
+
+        :param self: Represent the instance of the object itself
+        :param path: Path: Specify the path of the file
+        :return: True if the file is cached
+        """
+        if path not in self.entries:
+            self.misses.inc()
+            return False
+
+        if not path.exists():
+            self.size -= self.entries.pop(path)
+            self.misses.inc()
+            return False
+
+        self.entries.move_to_end(path)
+        self.hits.inc()
+
+        return True
+
+    def add(self, path: Path, size: int) -> None:
+        """
+        The add function adds a file to the cache and evicts the least recently used files above the size limit.
+
+        :param self: Represent the instance of the object itself
+        :param path: Path: Specify the path of the file
+        :param size: int: Specify the size of the file in bytes
+        :return: Nothing
+        """
+        self.size += size - self.entries.pop(path, 0)
+        self.entries[path] = size
+
+        while self.size > self.max_size and len(self.entries) > 1:
+            evicted, evicted_size = self.entries.popitem(last=False)
+            self.size -= evicted_size
+            evicted.unlink(missing_ok=True)
+
+    def forget(self, directory: Path) -> None:
+        """
+        The forget function removes the cached files of a directory from the index, without deleting them.
+
+        :param self: Represent the instance of the object itself
+        :param directory: Path: Specify the directory
+        :return: Nothing
+        """
+        for path in [path for path in self.entries if path.is_relative_to(directory)]:
+            self.size -= self.entries.pop(path)
+
+    def discard(self, directory: Path) -> None:
+        """
+        The discard function removes all cached files of a directory.
+
+        :param self: Represent the instance of the object itself
+        :param directory: Path: Specify the directory
+        :return: Nothing
+        """
+        self.forget(directory)
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Storage keeping the images on the local filesystem.
+
+    Transformations use the crop/resize semantics of Cloudinary and are rendered with Pillow in a process pool.
+    Rendered variants are cached on disk with LRU eviction and delivered by the media route of the api.
+    """
+
+    def __init__(self, root: Path, base_url: str, folder: str, cache_size: int, workers: Optional[int] = None,
+                 max_dimension: int = 4096):
+        """
+        The __init__ function prepares the storage directories.
+
+        :param self: Represent the instance of the object itself
+        :param root: Path: Specify the directory of the storage
+        :param base_url: str: Specify the url the media route is served under
+        :param folder: str: Specify the folder the images are uploaded to
+        :param cache_size: int: Set the maximum total size of the cached variants in bytes
+        :param workers: Optional[int]: Set the number of processes rendering the variants
+        :param max_dimension: int: Set the largest width and height of a variant in pixels
+        :return: Nothing
+        """
+        self.originals = Path(root) / "originals"
+        self.variants = Path(root) / "variants"
+        self.originals.mkdir(parents=True, exist_ok=True)
+        self.variants.mkdir(parents=True, exist_ok=True)
+
+        self.base_url = base_url.rstrip('/')
+        self.folder = folder
+        self.workers = workers
+        self.max_dimension = max_dimension
+        self.cache = VariantCache(self.variants, cache_size)
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._rendering: dict[Path, asyncio.Future] = {}
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def original_path(self, public_id: str) -> Optional[Path]:
+        """
+        The original_path function finds the stored original of an image.
+        It reads the filesystem, the async functions run it in the default executor.
+
+        :param self: Represent the instance of the object itself
+        :param public_id: str: Specify the public id of the image
+        :return: The path of the original or None if the image does not exist
+        """
+        path = (self.originals / public_id).resolve()
+        if not path.is_relative_to(self.originals.resolve()) or not path.parent.is_dir():
+            return
+
+        # The files being uploaded are written next to the originals until they are complete
+        return next((original for original in path.parent.glob(f"{path.name}.*") if original.suffix != ".tmp"), None)
+
+    async def upload_image(self, file: BinaryIO, public_id: Optional[str] = None) -> Optional[dict]:
+        public_id = f"{self.folder}/{public_id or uuid.uuid4().hex}"
+        path = (self.originals / public_id).resolve()
+        if not path.is_relative_to(self.originals.resolve()):
+            return
+
+        tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write, file, tmp)
+
+        image_format = await metrics.track_executor(
+            "local_storage", loop.run_in_executor(self.pool, probe_image, str(tmp))
+        )
+        if image_format is None:
+            await loop.run_in_executor(None, tmp.unlink, True)
+            return
+
+        await loop.run_in_executor(None, self._replace, public_id, tmp, path.with_name(f"{path.name}.{image_format}"))
+        await self._discard_variants(public_id)
+
+        version = str(int(time.time()))
+
+        return {'url': self.formatting_image_url(public_id, version=version)['url'],
+                'public_id': public_id, 'version': version}
+
+    @staticmethod
+    def _write(file: BinaryIO, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as output:
+            shutil.copyfileobj(file, output)
+
+    def _replace(self, public_id: str, tmp: Path, path: Path) -> None:
+        previous = self.original_path(public_id)
+        os.replace(tmp, path)
+        if previous is not None and previous != path:
+            previous.unlink(missing_ok=True)
+
+    async def _discard_variants(self, public_id: str) -> None:
+        directory = self.variants / public_id
+        self.cache.forget(directory)
+        await asyncio.get_running_loop().run_in_executor(None, shutil.rmtree, directory, True)
+
+    def formatting_image_url(self,
+                             public_id: str,
+                             transformation: Optional[CroppingOrResizingTransformation | dict] = None,
+                             version: Optional[str] = None) -> dict:
+        if isinstance(transformation, CroppingOrResizingTransformation):
+            transformation = transformation.dict()
+
+        transformation = transformation or {}
+        segment = format_segment(transformation)
+
+        url = "/".join(filter(None, (self.base_url, segment, public_id)))
+        if version:
+            url = f"{url}?v={version}"
+
+        return {'url': url, 'format': transformation}
+
+    async def remove_image(self, public_id: str) -> bool:
+        loop = asyncio.get_running_loop()
+        original = await loop.run_in_executor(None, self.original_path, public_id)
+        if original is None:
+            return False
+
+        await loop.run_in_executor(None, original.unlink, True)
+        await self._discard_variants(public_id)
+
+        return True
+
+    async def open_image(self, path: str) -> Optional[Path]:
+        """
+        The open_image function returns the file of an image url path, rendering the transformation if it is not
+        cached yet. Concurrent requests for the same variant wait for a single rendering.
+
+        :param self: Represent the instance of the object itself
+        :param path: str: Specify the path of the image url relative to the media url, [transformation/]public_id
+        :return: The path of the file or None if the image does not exist
+        """
+        segment, _, public_id = path.partition("/")
+        if not SEGMENT.match(segment):
+            segment, public_id = "", path
+
+        original = await asyncio.get_running_loop().run_in_executor(None, self.original_path, public_id)
+        if original is None or not segment:
+            return original
+
+        params = dict(item.split("_", maxsplit=1) for item in segment.split(","))
+        names = {short: name for name, short in URL_PARAMS.items()}
+        try:
+            transformation = CroppingOrResizingTransformation(
+                **{names[key]: value for key, value in params.items() if key in names}
+            )
+        except ValidationError as err:
+            raise ValueError(f"Invalid transformation: {segment}") from err
+
+        # Only the urls built by formatting_image_url are rendered, so the spellings of a transformation (order,
+        # unknown or repeated parameters) do not each start a rendering
+        if format_segment(transformation.dict()) != segment:
+            raise ValueError(f"Invalid transformation: {segment}")
+
+        if max(transformation.width or 0, transformation.height or 0) > self.max_dimension:
+            raise ValueError(f"Invalid transformation: {segment}, the width and height are limited to "
+                             f"{self.max_dimension} pixels")
+
+        target = self.variants / public_id / f"{segment}{original.suffix}"
+        if self.cache.get(target):
+            return target
+
+        if target not in self._rendering:
+            loop = asyncio.get_running_loop()
+            self._rendering[target] = metrics.track_executor("local_storage", loop.run_in_executor(
+                self.pool, render_variant, str(original), str(target), transformation.dict()
+            ))
+
+        try:
+            size = await asyncio.shield(self._rendering[target])
+        finally:
+            self._rendering.pop(target, None)
+
+        self.cache.add(target, size)
+
+        return target
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,267 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Callable, Iterable, Optional, TypeVar
+
+import redis
+import redis.asyncio as aioredis
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, \
+    generate_latest, multiprocess
+
+from app.services import deadline
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# prometheus_client chooses the multiprocess mode when it is imported, see server.py
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Sampler:
+    """
+    Gauges read from callbacks when sampled instead of being updated where the value changes, e.g. the connections
+    of the database pool. The callbacks are sampled before the metrics are exposed and every interval in the
+    background, so in multiprocess mode the workers not serving the scrape report recent values too.
+    """
+
+    def __init__(self) -> None:
+        self.gauges: list[tuple[Gauge, Callable[[], dict[tuple[str, ...], float]]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str],
+              callback: Callable[[], dict[tuple[str, ...], float]], multiprocess_mode: str = "livesum") -> Gauge:
+        """
+        The gauge function creates a gauge set from a callback.
+
+        :param self: Represent the instance of the object itself
+        :param name: str: Specify the name of the metric
+        :param documentation: str: Describe the metric
+        :param labelnames: Iterable[str]: Specify the names of the labels
+        :param callback: Callable: Pass the function returning a dictionary of the label values and the values
+        :param multiprocess_mode: str: Specify how the values of the workers are combined in multiprocess mode
+        :return: The gauge
+        """
+        gauge = Gauge(name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+        self.gauges.append((gauge, callback))
+        return gauge
+
+    def sample(self) -> None:
+        """
+        The sample function sets the gauges to the values returned by their callbacks.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        for gauge, callback in self.gauges:
+            for labels, value in callback().items():
+                gauge.labels(*labels).set(value)
+
+    async def loop(self, interval: float) -> None:
+        """
+        The loop function samples the gauges every interval until it is cancelled.
+
+        :param self: Represent the instance of the object itself
+        :param interval: float: Set the time between two samples in seconds
+        :return: Nothing
+        """
+        while True:
+            try:
+                self.sample()
+            except Exception:  # noqa: a failing callback must not stop the sampling of the others
+                logger.exception("Sampling the metrics failed")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        """
+        The start function starts sampling the gauges in the background.
+
+        :param self: Represent the instance of the object itself
+        :param interval: float: Set the time between two samples in seconds
+        :return: Nothing
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self.loop(interval))
+
+    async def stop(self) -> None:
+        """
+        The stop function stops sampling the gauges.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+sampler = Sampler()
+
+
+def expose() -> bytes:
+    """
+    The expose function renders the metrics in the Prometheus text format.
+    In multiprocess mode they are read from the files of all the workers, the counters and histograms are summed and
+    the gauges combined by their multiprocess mode, so any worker serving the scrape returns the same metrics.
+
+    :return: The metrics
+    """
+    sampler.sample()
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def worker_exited(pid: int) -> None:
+    """
+    The worker_exited function drops the live gauges of a worker that exited, its counters and histograms are kept.
+
+    :param pid: int: Pass the process id of the worker
+    :return: Nothing
+    """
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Duration of the http requests until the response is sent",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge("http_requests_in_progress", "Http requests being processed",
+                                  multiprocess_mode="livesum")
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds", "Duration of the redis commands, pipelines are timed as a whole",
+    ["client", "command"], buckets=FAST_BUCKETS,
+)
+EXECUTOR_TASKS = Gauge("executor_tasks", "Tasks submitted to a worker pool and not finished yet", ["executor"],
+                       multiprocess_mode="livesum")
+CLOUDINARY_REQUESTS_IN_PROGRESS = Gauge("cloudinary_requests_in_progress", "Requests to the Cloudinary api in flight",
+                                        multiprocess_mode="livesum")
+DB_STATEMENTS = Histogram(
+    "db_statements_per_request", "SQL statements executed by the http requests", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+DB_STATEMENTS_DURATION = Histogram(
+    "db_statements_duration_seconds", "Time the database took to run the sql statements of the http requests",
+    ["method", "route"], buckets=FAST_BUCKETS,
+)
+DB_REPEATED_STATEMENTS = Counter(
+    "db_repeated_statements", "Http requests repeating a sql statement, likely N+1 queries", ["method", "route"],
+)
+CACHE_REQUESTS = Counter("cache_requests", "Lookups of the caches by result (hit or miss)", ["cache", "result"])
+
+# Tasks of the worker pools of this process not finished yet, read by the health checks of the process
+pending_tasks: defaultdict[str, int] = defaultdict(int)
+
+
+def track_executor(executor: str, future: "asyncio.Future[T]") -> "asyncio.Future[T]":
+    """
+    The track_executor function counts a task submitted to a worker pool until it is finished.
+
+    :param executor: str: Specify the name of the worker pool
+    :param future: asyncio.Future: Pass the future returned by run_in_executor
+    :return: The same future
+    """
+    gauge = EXECUTOR_TASKS.labels(executor)
+    gauge.inc()
+    pending_tasks[executor] += 1
+
+    def done(_) -> None:
+        gauge.dec()
+        pending_tasks[executor] -= 1
+
+    future.add_done_callback(done)
+    return future
+
+
+def _command_name(args: tuple) -> str:
+    name = args[0]
+    return (name.decode() if isinstance(name, bytes) else str(name)).upper()
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """
+    Asyncio Redis client recording the duration of its commands and pipelines.
+    The commands sent during a request with a deadline are cancelled when it is exceeded.
+    """
+
+    def __init__(self, *args, metric_client: str = "default", **kwargs) -> None:
+        """
+        The __init__ function creates the client.
+
+        :param self: Represent the instance of the object itself
+        :param args: Pass the arguments of redis.asyncio.Redis
+        :param metric_client: str: Set the client label of the metrics
+        :param kwargs: Pass the keyword arguments of redis.asyncio.Redis
+        :return: Nothing
+        """
+        super().__init__(*args, **kwargs)
+        self.metric_client = metric_client
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(deadline.remaining()):
+                return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(self.metric_client, _command_name(args)).observe(
+                time.perf_counter() - start
+            )
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> "InstrumentedPipeline":
+        pipe = InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+        pipe.metric_client = self.metric_client
+        return pipe
+
+
+class InstrumentedPipeline(aioredis.client.Pipeline):
+    metric_client = "default"
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(deadline.remaining()):
+                return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels(self.metric_client, "PIPELINE").observe(time.perf_counter() - start)
+
+
+class InstrumentedSyncRedis(redis.Redis):
+    """
+    Blocking Redis client recording the duration of its commands.
+    A blocking command cannot be cancelled, it is not sent once the deadline of the request has passed.
+    """
+
+    def __init__(self, *args, metric_client: str = "default", **kwargs) -> None:
+        """
+        The __init__ function creates the client.
+
+        :param self: Represent the instance of the object itself
+        :param args: Pass the arguments of redis.Redis
+        :param metric_client: str: Set the client label of the metrics
+        :param kwargs: Pass the keyword arguments of redis.Redis
+        :return: Nothing
+        """
+        super().__init__(*args, **kwargs)
+        self.metric_client = metric_client
+
+    def execute_command(self, *args, **options):
+        deadline.remaining()
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(self.metric_client, _command_name(args)).observe(
+                time.perf_counter() - start
+            )
@@ -0,0 +1,377 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import uuid
+from asyncio.tasks import _current_tasks  # noqa: the running task of every loop, readable from another thread
+from types import FrameType
+from typing import Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.services.metrics import InstrumentedRedis
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = (
+    ("sql", ("sqlalchemy.", "asyncpg.")),
+    ("redis", ("redis.", "app.services.metrics:Instrumented")),
+    ("cloudinary", ("app.services.cloudinary:", "httpx.", "httpcore.")),
+    ("serialization", ("fastapi.encoders:", "fastapi.routing:serialize_response", "json:", "json.",
+                       "starlette.responses:JSONResponse.render")),
+)
+
+
+def frame_label(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def category(labels: list[str]) -> str:
+    """
+    The category function classifies a stack by the outermost frame of a known subsystem, so a query issued while
+    serializing a response counts as serialization.
+
+    :param labels: list[str]: Pass the labels of the frames, outermost first
+    :return: The name of the category, "other" for the application code
+    """
+    for label in labels:
+        for name, prefixes in CATEGORIES:
+            if label.startswith(prefixes):
+                return name
+    return "other"
+
+
+def task_stack(task: asyncio.Task, running_frame: Optional[FrameType] = None) -> list[FrameType]:
+    """
+    The task_stack function returns the frames of a task, outermost first.
+    A running task is read from the stack of its thread, a suspended one by following the awaited coroutines, which
+    ends where the task waits (e.g. for a database reply).
+
+    :param task: asyncio.Task: Pass the task
+    :param running_frame: Optional[FrameType]: Pass the current frame of the thread if the task is running
+    :return: The frames of the task
+    """
+    coro = task.get_coro()
+    root = getattr(coro, "cr_frame", None)
+    if root is None:
+        return []
+
+    frames = []
+    if running_frame is not None:
+        frame = running_frame
+        while frame is not None:
+            frames.append(frame)
+            if frame is root:
+                return frames[::-1]
+            frame = frame.f_back
+        return []
+
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+class Profile:
+    """
+    Wall-clock profile of a request: the time spent in every stack and in every category.
+    """
+
+    def __init__(self) -> None:
+        self.stacks: dict[tuple[str, ...], float] = {}
+        self.categories = dict.fromkeys([name for name, _ in CATEGORIES] + ["other"], 0.0)
+        self.duration = 0.0
+
+    def add(self, labels: list[str], weight: float) -> None:
+        """
+        The add function adds a sample to the profile.
+
+        :param self: Represent the instance of the object itself
+        :param labels: list[str]: Pass the labels of the frames, outermost first
+        :param weight: float: Pass the time represented by the sample in seconds
+        :return: Nothing
+        """
+        stack = tuple(labels)
+        self.stacks[stack] = self.stacks.get(stack, 0.0) + weight
+        self.categories[category(labels)] += weight
+
+    def folded(self) -> str:
+        """
+        The folded function renders the profile in the folded stacks format of flamegraph.pl and speedscope,
+        one line per stack with the time in microseconds.
+
+        :param self: Represent the instance of the object itself
+        :return: The folded stacks
+        """
+        return "".join(f"{';'.join(stack)} {round(weight * 1e6)}\n" for stack, weight in self.stacks.items())
+
+    def server_timing(self) -> str:
+        """
+        The server_timing function renders the time of the categories as a Server-Timing header value.
+
+        :param self: Represent the instance of the object itself
+        :return: The header value
+        """
+        metrics = [f"profile;dur={self.duration * 1000:.1f}"]
+        metrics += [f"{name};dur={weight * 1000:.1f}" for name, weight in self.categories.items() if weight]
+        return ", ".join(metrics)
+
+
+class RequestProfiler:
+    """
+    Sampling profiler of a single task.
+    A thread samples the stack of the task every ``interval`` seconds whether it runs or waits, so the time waiting
+    for the database or the network is profiled too; other tasks of the event loop are not sampled. Each sample is
+    weighted with the time since the previous one, which keeps the times right when the thread is late.
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float = 0.001) -> None:
+        """
+        The __init__ function prepares the profiler, it must be called on the thread of the event loop of the task.
+
+        :param self: Represent the instance of the object itself
+        :param task: asyncio.Task: Pass the task to profile
+        :param interval: float: Set the sampling interval in seconds
+        :return: Nothing
+        """
+        self.task = task
+        self.loop = task.get_loop()
+        self.thread_id = threading.get_ident()
+        self.interval = interval
+        self.profile = Profile()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._started = 0.0
+
+    def sample(self, weight: float) -> None:
+        running = _current_tasks.get(self.loop) is self.task
+        frame = sys._current_frames().get(self.thread_id) if running else None  # noqa
+        stack = task_stack(self.task, frame)
+        if stack:
+            self.profile.add([frame_label(frame) for frame in stack], weight)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stopped.wait(self.interval):
+            now = time.perf_counter()
+            self.sample(now - last)
+            last = now
+
+    def start(self) -> None:
+        """
+        The start function starts sampling.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> Profile:
+        """
+        The stop function stops sampling.
+
+        :param self: Represent the instance of the object itself
+        :return: The profile
+        """
+        self._stopped.set()
+        self._thread.join()
+        self.profile.duration = time.perf_counter() - self._started
+        return self.profile
+
+
+class ProfileStore:
+    """
+    Profiles kept in Redis for a while, so they can be downloaded from any worker.
+    """
+
+    def __init__(self, redis_client: redis.Redis, ttl: int = 3600, prefix: str = "profile:") -> None:
+        """
+        The __init__ function configures the store.
+
+        :param self: Represent the instance of the object itself
+        :param redis_client: redis.Redis: Pass the redis client
+        :param ttl: int: Set how long the profiles are kept in seconds
+        :param prefix: str: Set the prefix of the redis keys
+        :return: Nothing
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def save(self, profile: Profile) -> Optional[str]:
+        """
+        The save function stores a profile.
+
+        :param self: Represent the instance of the object itself
+        :param profile: Profile: Pass the profile
+        :return: The id of the profile or None if it could not be stored
+        """
+        profile_id = uuid.uuid4().hex
+        try:
+            await self.redis.set(f"{self.prefix}{profile_id}", profile.folded(), ex=self.ttl)
+        except (RedisError, OSError) as err:
+            logger.warning("Profile was not stored: %r", err)
+            return None
+        return profile_id
+
+    async def load(self, profile_id: str) -> Optional[str]:
+        """
+        The load function returns a stored profile.
+
+        :param self: Represent the instance of the object itself
+        :param profile_id: str: Specify the id of the profile
+        :return: The folded stacks of the profile or None if it does not exist (anymore)
+        """
+        content = await self.redis.get(f"{self.prefix}{profile_id}")
+        return content.decode() if content is not None else None
+
+    async def close(self) -> None:
+        """
+        The close function closes the connections to redis.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        await self.redis.close()
+
+
+profiles = ProfileStore(
+    InstrumentedRedis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password, db=0,
+                      metric_client="profiles"),
+    ttl=settings.profile_ttl,
+)
+
+
+class ContinuousProfiler:
+    """
+    Statistical profiler sampling the event loop thread of the worker all the time, at a low rate.
+    A sample is the stack of the running task, from its coroutine down, aggregated by the route of the request the
+    task handles; samples taken while the loop waits for events are only counted. Only the time spent running is
+    sampled, so the profile shows the hot spots of the worker, not the time waiting for the database or the network.
+    """
+
+    def __init__(self, interval: float = 0.01, max_stacks: int = 20000) -> None:
+        """
+        The __init__ function creates a stopped profiler.
+
+        :param self: Represent the instance of the object itself
+        :param interval: float: Set the sampling interval in seconds
+        :param max_stacks: int: Set the maximum number of distinct stacks kept, further ones are only counted
+        :return: Nothing
+        """
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.requests: dict[asyncio.Task, dict] = {}
+        self.stacks: dict[tuple[str, ...], int] = {}
+        self.samples = self.idle = self.dropped = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread_id = 0
+        self._labels: dict = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stack(self, task: asyncio.Task, frame: FrameType) -> tuple[str, ...]:
+        root = getattr(task.get_coro(), "cr_frame", None)
+        labels, stack = self._labels, []
+        while frame is not None:
+            label = labels.get(frame.f_code)
+            if label is None:
+                label = labels[frame.f_code] = frame_label(frame)
+            stack.append(label)
+            if frame is root:
+                break
+            frame = frame.f_back
+
+        scope = self.requests.get(task)
+        if scope is None:
+            stack.append("<background>")
+        else:
+            stack.append(getattr(scope.get("route"), "path", "<unmatched>"))
+        return tuple(reversed(stack))
+
+    def sample(self) -> None:
+        """
+        The sample function records the current stack of the event loop thread.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        task = _current_tasks.get(self.loop)
+        frame = sys._current_frames().get(self.thread_id)  # noqa
+        self.samples += 1
+        if task is None or frame is None:
+            self.idle += 1
+            return
+
+        stack = self._stack(task, frame)
+        with self._lock:
+            if stack in self.stacks:
+                self.stacks[stack] += 1
+            elif len(self.stacks) < self.max_stacks:
+                self.stacks[stack] = 1
+            else:
+                self.dropped += 1
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.sample()
+
+    def start(self) -> None:
+        """
+        The start function starts sampling the thread of the running event loop.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._thread is not None:
+            return
+
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="continuous-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        The stop function stops sampling, the samples are kept.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+
+    def folded(self, route: Optional[str] = None, reset: bool = False) -> str:
+        """
+        The folded function renders the samples in the folded stacks format, the route is the root frame and
+        the value of a stack is its number of samples.
+
+        :param self: Represent the instance of the object itself
+        :param route: Optional[str]: Keep only the samples of a route template, e.g. /api/images/{image_id}
+        :param reset: bool: Clear the samples after rendering them
+        :return: The folded stacks
+        """
+        with self._lock:
+            stacks = self.stacks
+            if reset:
+                self.stacks = {}
+                self.samples = self.idle = self.dropped = 0
+            else:
+                stacks = dict(stacks)
+
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items())
+                       if route is None or stack[0] == route)
+
+
+continuous_profiler = ContinuousProfiler(settings.profiler_interval)
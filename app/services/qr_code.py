@@ -1,6 +1,43 @@
+import asyncio
+import enum
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import lru_cache
+from importlib.metadata import version as package_version
 from io import BytesIO
+from typing import AsyncIterator, Iterable, Optional, TypeVar
 
 import qrcode
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.services import metrics
+from app.services.metrics import InstrumentedRedis
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+RENDERER = f"qrcode-{package_version('qrcode')}"
+
+T = TypeVar("T")
+
+
+class QRCodeFormat(enum.StrEnum):
+    """
+    Enum representing the image formats of QR codes
+    """
+    PNG: str = 'png'
+    SVG: str = 'svg'
+
+
+MEDIA_TYPES = {
+    QRCodeFormat.PNG: "image/png",
+    QRCodeFormat.SVG: "image/svg+xml",
+}
 
 
 def create_qr_for_url(
@@ -8,7 +45,8 @@ def create_qr_for_url(
         version: int,
         box_size: int,
         border: int,
-        fit: bool = True
+        fit: bool = True,
+        image_format: QRCodeFormat = QRCodeFormat.PNG
 ) -> BytesIO:
     """
     The create_qr_for_url function takes a URL and returns a QR code image of that URL.
@@ -18,6 +56,7 @@ def create_qr_for_url(
     :param box_size: int: Set the size of each box in the qr code
     :param border: int: Set the border width of the qr code
     :param fit: bool: Determine if the qr code should be fitted to the data
+    :param image_format: QRCodeFormat: Render the qr code as a png image or as a vector svg image
     :return: A bytesio object, which is a file-like
     """
     qr = qrcode.QRCode(
@@ -28,6 +67,10 @@ def create_qr_for_url(
     )
     qr.add_data(url)
     qr.make(fit=fit)
+
+    if image_format == QRCodeFormat.SVG:
+        return BytesIO(render_svg(qr.get_matrix(), box_size))
+
     qr_img = qr.make_image(fill_color="red", back_color="white")
 
     buffer = BytesIO()
@@ -35,3 +78,295 @@ def create_qr_for_url(
     buffer.seek(0)
 
     return buffer
+
+
+def render_svg(matrix: list[list[bool]], box_size: int) -> bytes:
+    """
+    The render_svg function writes a QR code matrix as an svg image.
+    Every run of dark modules in a row becomes one rectangle of a single path, which is much cheaper than rendering
+    a raster image.
+
+    :param matrix: list[list[bool]]: Pass the modules of the qr code including the border
+    :param box_size: int: Set the size of each box in pixels
+    :return: The svg document
+    """
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            path.append(f"M{start},{y}h{x - start}v1h-{x - start}z")
+
+    size = len(matrix)
+
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size * box_size}" height="{size * box_size}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="white"/>'
+        f'<path fill="red" d="{"".join(path)}"/></svg>'
+    ).encode()
+
+
+def qr_code_key(
+        url: str,
+        version: int,
+        box_size: int,
+        border: int,
+        fit: bool,
+        image_format: QRCodeFormat
+) -> str:
+    """
+    The qr_code_key function returns the cache key of a QR code.
+    The rendering is deterministic, so the key identifies the content and is also used as its ETag.
+
+    :param url: str: Pass in the url encoded into the qr code
+    :param version: int: Specify the size of the qr code
+    :param box_size: int: Set the size of each box in the qr code
+    :param border: int: Set the border width of the qr code
+    :param fit: bool: Determine if the qr code is fitted to the data
+    :param image_format: QRCodeFormat: Specify the format of the image
+    :return: The sha-256 hex digest of the rendering parameters
+    """
+    params = [RENDERER, url, version, box_size, border, fit, QRCodeFormat(image_format).value]
+
+    return hashlib.sha256(json.dumps(params).encode()).hexdigest()
+
+
+class QRCodeCache:
+    """
+    Two-level cache of rendered QR codes: an in-process LRU bounded by the total size of the images,
+    backed by Redis shared between the workers. Redis errors are treated as cache misses.
+    """
+
+    def __init__(self, max_size: int, redis_client: Optional[redis.Redis] = None, ttl: int = 86400,
+                 prefix: str = "qr:"):
+        """
+        The __init__ function creates an empty cache.
+
+        :param self: Represent the instance of the object itself
+        :param max_size: int: Set the maximum total size of the images kept in memory in bytes
+        :param redis_client: Optional[redis.Redis]: Pass the redis client, None keeps the images in memory only
+        :param ttl: int: Set the time to live of the images in redis in seconds
+        :param prefix: str: Set the prefix of the redis keys
+        :return: Nothing
+        """
+        self.max_size = max_size
+        self.redis = redis_client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.entries: OrderedDict[str, bytes] = OrderedDict()
+        self.size = 0
+        self.memory_hits = metrics.CACHE_REQUESTS.labels("qr_code_memory", "hit")
+        self.memory_misses = metrics.CACHE_REQUESTS.labels("qr_code_memory", "miss")
+        self.redis_hits = metrics.CACHE_REQUESTS.labels("qr_code_redis", "hit")
+        self.redis_misses = metrics.CACHE_REQUESTS.labels("qr_code_redis", "miss")
+
+    def _remember(self, key: str, content: bytes) -> None:
+        if len(content) > self.max_size:
+            return
+
+        self.size += len(content) - len(self.entries.pop(key, b""))
+        self.entries[key] = content
+
+        while self.size > self.max_size:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """
+        The get function returns a cached image, looking in memory first and then in redis.
+
+        :param self: Represent the instance of the object itself
+        :param key: str: Specify the key of the image
+        :return: The content of the image or None if it is not cached
+        """
+        content = self.entries.get(key)
+        if content is not None:
+            self.entries.move_to_end(key)
+            self.memory_hits.inc()
+            return content
+
+        self.memory_misses.inc()
+        if self.redis is None:
+            return
+
+        try:
+            content = await self.redis.get(f"{self.prefix}{key}")
+        except (RedisError, OSError) as err:
+            logger.warning("QR code cache is unavailable: %s", err)
+            self.redis_misses.inc()
+            return
+
+        if content is not None:
+            self._remember(key, content)
+            self.redis_hits.inc()
+        else:
+            self.redis_misses.inc()
+
+        return content
+
+    async def set(self, key: str, content: bytes) -> None:
+        """
+        The set function stores an image in memory and in redis.
+
+        :param self: Represent the instance of the object itself
+        :param key: str: Specify the key of the image
+        :param content: bytes: Pass the content of the image
+        :return: Nothing
+        """
+        self._remember(key, content)
+
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(f"{self.prefix}{key}", content, ex=self.ttl)
+        except (RedisError, OSError) as err:
+            logger.warning("QR code cache is unavailable: %s", err)
+
+    def clear(self) -> None:
+        """
+        The clear function removes all images kept in memory.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        self.entries.clear()
+        self.size = 0
+
+    async def close(self) -> None:
+        """
+        The close function closes the connections to redis.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self.redis is not None:
+            await self.redis.close()
+
+
+qr_cache = QRCodeCache(
+    max_size=settings.qr_cache_size,
+    redis_client=InstrumentedRedis(
+        host=settings.redis_host, port=settings.redis_port, password=settings.redis_password, db=0,
+        socket_connect_timeout=settings.qr_cache_redis_timeout, socket_timeout=settings.qr_cache_redis_timeout,
+        metric_client="qr_cache",
+    ),
+    ttl=settings.qr_cache_ttl,
+)
+
+
+@lru_cache
+def get_qr_executor() -> ProcessPoolExecutor:
+    """
+    The get_qr_executor function returns the process pool rendering QR codes in bulk.
+    The pool is created on first use.
+
+    :return: The process pool executor
+    """
+    return ProcessPoolExecutor(max_workers=settings.qr_workers)
+
+
+async def render_qr_code(
+        url: str,
+        version: int,
+        box_size: int,
+        border: int,
+        fit: bool = True,
+        image_format: QRCodeFormat = QRCodeFormat.PNG,
+        executor: Optional[Executor] = None
+) -> tuple[str, bytes]:
+    """
+    The render_qr_code function returns a QR code from the cache, rendering it in the executor on a miss.
+
+    :param url: str: Pass in the url that will be encoded into the qr code
+    :param version: int: Specify the size of the qr code
+    :param box_size: int: Set the size of each box in the qr code
+    :param border: int: Set the border width of the qr code
+    :param fit: bool: Determine if the qr code should be fitted to the data
+    :param image_format: QRCodeFormat: Render the qr code as a png image or as a vector svg image
+    :param executor: Optional[Executor]: Specify the executor rendering the qr code, the default one if None
+    :return: The key (ETag) and the content of the image
+    """
+    key = qr_code_key(url, version, box_size, border, fit, image_format)
+
+    content = await qr_cache.get(key)
+    if content is None:
+        loop = asyncio.get_running_loop()
+        buffer = await metrics.track_executor("qr_code", loop.run_in_executor(
+            executor, create_qr_for_url, url, version, box_size, border, fit, image_format
+        ))
+        content = buffer.getvalue()
+        await qr_cache.set(key, content)
+
+    return key, content
+
+
+async def render_qr_codes(
+        urls: Iterable[tuple[T, str]],
+        version: int,
+        box_size: int,
+        border: int,
+        fit: bool = True,
+        image_format: QRCodeFormat = QRCodeFormat.PNG,
+        window: Optional[int] = None
+) -> AsyncIterator[tuple[T, bytes]]:
+    """
+    The render_qr_codes function renders QR codes for many urls in parallel on the process pool.
+    The images are yielded as soon as they are rendered, at most ``window`` renderings are pending at a time,
+    so the memory used does not grow with the number of urls.
+
+    :param urls: Iterable[tuple[T, str]]: Pass pairs of a tag identifying the qr code and the url to encode
+    :param version: int: Specify the size of the qr codes
+    :param box_size: int: Set the size of each box in the qr codes
+    :param border: int: Set the border width of the qr codes
+    :param fit: bool: Determine if the qr codes should be fitted to the data
+    :param image_format: QRCodeFormat: Render the qr codes as png images or as vector svg images
+    :param window: Optional[int]: Set the maximum number of pending renderings, twice the pool size by default
+    :return: An async iterator of the tags and the contents of the images in completion order
+    """
+    executor = get_qr_executor()
+    window = window or 2 * (settings.qr_workers or os.cpu_count() or 1)
+    urls = iter(urls)
+    pending: dict[asyncio.Task, T] = {}
+
+    try:
+        while True:
+            for tag, url in urls:
+                task = asyncio.create_task(
+                    render_qr_code(url, version, box_size, border, fit, image_format, executor)
+                )
+                pending[task] = tag
+                if len(pending) >= window:
+                    break
+
+            if not pending:
+                return
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                _, content = task.result()
+                yield pending.pop(task), content
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def close() -> None:
+    """
+    The close function releases the connections of the qr code cache and the rendering processes.
+
+    :return: Nothing
+    """
+    await qr_cache.close()
+
+    if get_qr_executor.cache_info().currsize:
+        get_qr_executor().shutdown(wait=False, cancel_futures=True)
+        get_qr_executor.cache_clear()
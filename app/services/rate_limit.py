@@ -0,0 +1,343 @@
+import asyncio
+import logging
+import time
+import uuid
+from math import ceil
+from typing import Optional
+
+import redis.asyncio as redis
+from fastapi import Depends, HTTPException, Request, Response, status
+from redis.exceptions import RedisError
+
+from app.database.models import User
+from app.services.auth import AuthService
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Token bucket of a rate limit key in this process.
+    The bucket holds the share of the limit of this worker. Every synchronization with Redis resets its tokens to the
+    share of what is left of the limit across the workers; without Redis it refills at the share of the rate.
+    """
+
+    __slots__ = ("times", "window", "share", "tokens", "updated", "pending", "last_hit")
+
+    def __init__(self, times: int, window: float, share: float = 1.0) -> None:
+        self.times = times
+        self.window = window
+        self.share = share
+        self.tokens = times * share
+        self.updated = time.monotonic()
+        self.pending = 0
+        self.last_hit = self.updated
+
+    def take(self, now: float, refill: bool = True) -> float:
+        """
+        The take function takes a token from the bucket.
+
+        :param self: Represent the instance of the object itself
+        :param now: float: Pass the monotonic time of the request
+        :param refill: bool: Refill the bucket for the time since the last request
+        :return: 0 if a token was taken, otherwise the number of seconds until the next token
+        """
+        capacity = self.times * self.share
+        if refill:
+            self.tokens = min(capacity, self.tokens + (now - self.updated) * capacity / self.window)
+        self.updated = now
+        self.last_hit = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.pending += 1
+            return 0
+
+        return (1 - self.tokens) * self.window / (self.times * self.share)
+
+
+class RateLimits:
+    """
+    Rate limits checked against token buckets in process memory, so a request does not wait for a Redis round trip.
+
+    The consumption of the buckets is pushed to Redis periodically into per-window counters of every worker, and the
+    buckets are reset to the remaining limit of a sliding window, estimated from the current and the previous window,
+    divided by the number of workers using the key. A new key starts with the share of one of the running workers,
+    they are counted with a heartbeat. If Redis is unreachable every worker keeps enforcing its share locally.
+    """
+
+    def __init__(self, prefix: str = "rate-limit", sync_interval: float = 0.5, timeout: float = 0.2,
+                 batch_size: int = 500) -> None:
+        """
+        The __init__ function creates the rate limits, they only use the local buckets until started with Redis.
+
+        :param self: Represent the instance of the object itself
+        :param prefix: str: Set the prefix of the keys in Redis
+        :param sync_interval: float: Set the number of seconds between the synchronizations with Redis
+        :param timeout: float: Set the timeout of the synchronization of a new key in seconds
+        :param batch_size: int: Set the number of keys synchronized in one pipeline
+        :return: Nothing
+        """
+        self.prefix = prefix
+        self.sync_interval = sync_interval
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.worker = uuid.uuid4().hex
+        self.workers = 1
+        self.buckets: dict[str, TokenBucket] = {}
+        self.redis: Optional[redis.Redis] = None
+        self.available = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def hit(self, key: str, times: int, window: float) -> float:
+        """
+        The hit function counts a request of a key.
+        The first request of a key in this process reads its consumption from Redis, the next ones only use the
+        local bucket, refilled by the synchronizations or, while Redis is unreachable, over time.
+
+        :param self: Represent the instance of the object itself
+        :param key: str: Specify the key, e.g. the route and the user
+        :param times: int: Set the number of requests allowed in the window
+        :param window: float: Set the length of the window in seconds
+        :return: 0 if the request is allowed, otherwise the number of seconds to wait
+        """
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(times, window, 1 / self.workers)
+            if self.redis is not None and self.available:
+                try:
+                    await asyncio.wait_for(self.sync([key], initial=True), self.timeout)
+                except (RedisError, OSError, asyncio.TimeoutError) as err:
+                    self.available = False
+                    logger.warning("Rate limits are enforced locally, Redis is unreachable: %r", err)
+
+        return bucket.take(time.monotonic(), refill=not self.available)
+
+    def window_keys(self, key: str, window: float, now: float) -> tuple[str, str, float]:
+        index, elapsed = divmod(now, window)
+        return f"{self.prefix}:{key}:{index:.0f}", f"{self.prefix}:{key}:{index - 1:.0f}", elapsed / window
+
+    async def sync(self, keys: list[str], initial: bool = False) -> None:
+        """
+        The sync function pushes the local consumption of keys to Redis and resets their buckets to the limit left
+        in the sliding window of all the workers.
+
+        :param self: Represent the instance of the object itself
+        :param keys: list[str]: Specify the keys to synchronize
+        :param initial: bool: Keep the share of a new key until the other workers had a chance to use it
+        :return: Nothing
+        """
+        now = time.time()
+        pipe = self.redis.pipeline(transaction=False)
+        pushed = []
+
+        for key in keys:
+            bucket = self.buckets[key]
+            current, previous, _ = self.window_keys(key, bucket.window, now)
+            pushed.append(bucket.pending)
+            pipe.hincrby(current, self.worker, bucket.pending)
+            pipe.pexpire(current, ceil(bucket.window * 2000))
+            pipe.hgetall(current)
+            pipe.hgetall(previous)
+
+        try:
+            results = await pipe.execute()
+        except Exception:
+            # the consumption is dropped: a long outage would otherwise be counted in a later window
+            for key, count in zip(keys, pushed):
+                self.buckets[key].pending -= count
+            raise
+
+        monotonic = time.monotonic()
+        for i, (key, count) in enumerate(zip(keys, pushed)):
+            bucket = self.buckets[key]
+            _, _, elapsed = self.window_keys(key, bucket.window, now)
+            current, previous = results[4 * i + 2], results[4 * i + 3]
+            used = sum(map(int, previous.values())) * (1 - elapsed) + sum(map(int, current.values()))
+
+            bucket.pending -= count
+            bucket.share = 1 / max(len(current.keys() | previous.keys()), self.workers if initial else 1)
+            bucket.tokens = max(0.0, min(bucket.times, bucket.times - used) * bucket.share - bucket.pending)
+            bucket.updated = monotonic
+
+    async def sync_all(self) -> None:
+        """
+        The sync_all function synchronizes the keys used in the last window and the keys with a pending consumption.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        now = time.monotonic()
+        keys = [key for key, bucket in self.buckets.items() if bucket.pending or now - bucket.last_hit < bucket.window]
+
+        for i in range(0, len(keys), self.batch_size):
+            await self.sync(keys[i:i + self.batch_size])
+
+    def evict(self) -> None:
+        """
+        The evict function forgets the buckets not hit in their last window.
+        While Redis is available a bucket is kept until its consumption is pushed; while it is unreachable the
+        consumption is dropped, as by a failed synchronization, so the buckets of the clients of an outage do not
+        pile up.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        now = time.monotonic()
+
+        for key, bucket in list(self.buckets.items()):
+            if now - bucket.last_hit >= bucket.window and not (bucket.pending and self.available):
+                del self.buckets[key]
+
+    async def heartbeat(self) -> None:
+        """
+        The heartbeat function marks this worker as running and counts the running workers.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        now = time.time()
+        key = f"{self.prefix}:workers"
+
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(key, self.worker, now)
+        pipe.hgetall(key)
+        _, workers = await pipe.execute()
+
+        stale = [worker for worker, seen in workers.items() if now - float(seen) > 10 * self.sync_interval]
+        if stale:
+            await self.redis.hdel(key, *stale)
+
+        self.workers = max(1, len(workers) - len(stale))
+
+    async def run(self) -> None:
+        """
+        The run function synchronizes the buckets with Redis until it is cancelled.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        while True:
+            await self.tick()
+            await asyncio.sleep(self.sync_interval)
+
+    async def tick(self) -> None:
+        """
+        The tick function forgets the idle buckets and synchronizes the others with Redis, if it is reachable.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        self.evict()
+
+        try:
+            await self.heartbeat()
+            await self.sync_all()
+        except (RedisError, OSError, asyncio.TimeoutError) as err:
+            if self.available:
+                logger.warning("Rate limits are enforced locally, Redis is unreachable: %r", err)
+            self.available = False
+        else:
+            if not self.available:
+                logger.info("Rate limits are synchronized with Redis")
+            self.available = True
+
+    def start(self, client: redis.Redis) -> None:
+        """
+        The start function starts the synchronization with Redis as a task of the running event loop.
+
+        :param self: Represent the instance of the object itself
+        :param client: redis.Redis: Pass the Redis client
+        :return: Nothing
+        """
+        self.redis = client
+        self.available = True
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """
+        The stop function stops the synchronization and pushes the last consumption to Redis.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        try:
+            await self.sync_all()
+            await self.redis.hdel(f"{self.prefix}:workers", self.worker)
+        except (RedisError, OSError, asyncio.TimeoutError):
+            pass
+        await self.redis.close()
+        self.redis = None
+        self.available = False
+
+
+rate_limits = RateLimits(sync_interval=settings.rate_limit_sync_interval, timeout=settings.rate_limit_timeout)
+
+
+class RateLimiter:
+    """
+    Dependency limiting the number of requests to a route by client ip.
+    """
+
+    def __init__(self, times: int = 1, milliseconds: int = 0, seconds: int = 0, minutes: int = 0,
+                 hours: int = 0) -> None:
+        """
+        The __init__ function sets the limit.
+
+        :param self: Represent the instance of the object itself
+        :param times: int: Set the number of requests allowed in the window
+        :param milliseconds: int: Add milliseconds to the window
+        :param seconds: int: Add seconds to the window
+        :param minutes: int: Add minutes to the window
+        :param hours: int: Add hours to the window
+        :return: Nothing
+        """
+        self.times = times
+        self.window = milliseconds / 1000 + seconds + 60 * minutes + 3600 * hours
+
+    async def hit(self, request: Request, identifier: str) -> None:
+        """
+        The hit function counts the request and raises an HTTPException 429 when the limit is exceeded.
+        The key is made of the identifier of the client and of the endpoint, so it is the same in every worker.
+
+        :param self: Represent the instance of the object itself
+        :param request: Request: Get the endpoint of the request
+        :param identifier: str: Specify the client
+        :return: Nothing
+        """
+        endpoint = request.scope["endpoint"]
+        key = f"{identifier}:{endpoint.__module__}.{endpoint.__name__}"
+
+        retry_after = await rate_limits.hit(key, self.times, self.window)
+        if retry_after:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too Many Requests",
+                                headers={"Retry-After": str(ceil(retry_after))})
+
+    async def __call__(self, request: Request, response: Response) -> None:
+        forwarded = request.headers.get("X-Forwarded-For")
+        ip = forwarded.split(",")[0].strip() if forwarded else request.client.host
+
+        await self.hit(request, f"ip:{ip}")
+
+
+class UserRateLimiter(RateLimiter):
+    """
+    Dependency limiting the number of requests to a route by authenticated user, so the users behind a shared ip
+    do not share a limit. The user is resolved once per request, the route gets it from the dependency cache.
+    """
+
+    async def __call__(self, request: Request, response: Response,
+                       current_user: User = Depends(AuthService.get_current_user)) -> None:
+        await self.hit(request, f"user:{current_user.id}")
@@ -0,0 +1,228 @@
+import asyncio
+import contextvars
+import datetime
+import json
+import logging
+import time
+from typing import Any, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.database.statements import statement_stats
+from app.services.metrics import InstrumentedRedis
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def redact(value: Any) -> Any:
+    """
+    The redact function hides a bound parameter that may hold personal data or a secret (e.g. an email, a password
+    hash or a token). Numbers, booleans, dates and nulls are kept, they are needed to reproduce a plan.
+
+    :param value: Any: Pass the value of the parameter
+    :return: The value if it is safe to show, otherwise its type and length
+    """
+    if isinstance(value, (bool, int, float, type(None))):
+        return value
+    if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+        return str(value)
+    if isinstance(value, (list, tuple)):
+        return [redact(item) for item in value]
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    try:
+        return f"<{type(value).__name__}, {len(value)}>"
+    except TypeError:
+        return f"<{type(value).__name__}>"
+
+
+class SlowQuery:
+    """
+    A statement that took longer than the threshold, with its redacted parameters, the route of the request that
+    issued it, its plan once explained and, if it failed or was cancelled, the type of the error. Only the type is
+    kept, the message of a database error may quote the values of a row.
+    """
+    __slots__ = ("timestamp", "duration", "statement", "parameters", "route", "plan", "error")
+
+    def __init__(self, duration: float, statement: str, parameters: list, route: str,
+                 error: Optional[str] = None) -> None:
+        self.timestamp = datetime.datetime.now(datetime.timezone.utc)
+        self.duration = duration
+        self.statement = statement
+        self.parameters = parameters
+        self.route = route
+        self.plan: Optional[str] = None
+        self.error = error
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__} | {"timestamp": self.timestamp.isoformat()}
+
+
+class SlowQueryLog:
+    """
+    Log of the statements executed through an engine that took longer than a threshold, kept in a Redis list of the
+    latest ones so it holds the statements of every worker.
+    The statements are timed by cursor execution events: a fast statement costs two clock reads and a comparison.
+    A statement that raises, e.g. on a statement timeout or when its request is cancelled, never reaches the
+    ``after_cursor_execute`` event, it is timed by the ``handle_error`` event instead.
+    A slow statement is stored by a task, after its plan is explained on another connection of the pool. At most
+    ``max_explains`` plans are captured at a time, so a burst of slow queries does not exhaust the pool; plain EXPLAIN
+    does not run the statement.
+    """
+
+    def __init__(self, redis_client: redis.Redis, threshold: Optional[float] = 0.2, size: int = 100,
+                 explain: bool = True, max_explains: int = 1, key: str = "slow_queries") -> None:
+        """
+        The __init__ function configures the log.
+
+        :param self: Represent the instance of the object itself
+        :param redis_client: redis.Redis: Pass the redis client
+        :param threshold: Optional[float]: Set the duration in seconds from which a statement is logged, None to disable
+        :param size: int: Set how many slow statements are kept, the oldest are dropped
+        :param explain: bool: Capture the plans of the slow statements
+        :param max_explains: int: Set how many plans may be captured at the same time
+        :param key: str: Set the redis key of the log
+        :return: Nothing
+        """
+        self.redis = redis_client
+        self.threshold = threshold
+        self.size = size
+        self.explain = explain
+        self.max_explains = max_explains
+        self.key = key
+        self.engine: Optional[AsyncEngine] = None
+        self.tasks: set[asyncio.Task] = set()
+        self.explaining = 0
+
+    def install(self, engine: AsyncEngine) -> None:
+        """
+        The install function starts timing the statements of an engine.
+
+        :param self: Represent the instance of the object itself
+        :param engine: AsyncEngine: Pass the engine, its plans are also explained on it
+        :return: Nothing
+        """
+        if self.threshold is None or self.engine is not None:
+            return
+        self.engine = engine
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine.sync_engine, "handle_error", self._handle_error)
+
+    async def close(self) -> None:
+        """
+        The close function stops timing the statements, cancels the statements being stored and closes the
+        connections to redis.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        if self.engine is not None:
+            event.remove(self.engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+            event.remove(self.engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+            event.remove(self.engine.sync_engine, "handle_error", self._handle_error)
+            self.engine = None
+
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        await self.redis.close()
+
+    async def recent(self) -> list[dict]:
+        """
+        The recent function returns the logged statements, the slowest first.
+
+        :param self: Represent the instance of the object itself
+        :return: The slow statements as dictionaries
+        """
+        entries = [json.loads(entry) for entry in await self.redis.lrange(self.key, 0, -1)]
+        return sorted(entries, key=lambda entry: entry["duration"], reverse=True)
+
+    async def clear(self) -> None:
+        await self.redis.delete(self.key)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context.slow_query_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self._record(context, statement, parameters, executemany)
+
+    def _handle_error(self, exception_context: ExceptionContext) -> None:
+        context = exception_context.execution_context
+        if context is None or exception_context.statement is None:
+            return
+        # The asyncpg adapter raises a generic error from the error of the driver, e.g. QueryCanceledError
+        error = exception_context.original_exception
+        error = error.__cause__ or error
+        self._record(context, exception_context.statement, exception_context.parameters, context.executemany,
+                     type(error).__name__)
+
+    def _record(self, context, statement: str, parameters: Any, executemany: bool,
+                error: Optional[str] = None) -> None:
+        start = getattr(context, "slow_query_start", None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        if duration < self.threshold:
+            return
+
+        stats = statement_stats.get()
+        entry = SlowQuery(duration, statement, redact(parameters), stats.route if stats else "<background>", error)
+        if error is None:
+            logger.warning("Slow statement (%.3fs) from %s: %s", duration, entry.route, statement)
+        else:
+            logger.warning("Slow statement (%.3fs) from %s failed with %s: %s", duration, entry.route, error,
+                           statement)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        explain = (self.explain and not executemany and self.explaining < self.max_explains
+                   and statement.lstrip()[:6].upper().startswith(EXPLAINABLE))
+        if explain:
+            self.explaining += 1
+        # Out of the context of the request, its deadline does not apply to the storing of the statement
+        task = loop.create_task(self._save(entry, statement, parameters, explain), context=contextvars.Context())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _save(self, entry: SlowQuery, statement: str, parameters: Any, explain: bool) -> None:
+        if explain:
+            try:
+                await self._explain(self.engine, entry, statement, parameters)
+            finally:
+                self.explaining -= 1
+
+        pipe = self.redis.pipeline()
+        pipe.lpush(self.key, json.dumps(entry.as_dict()))
+        pipe.ltrim(self.key, 0, self.size - 1)
+        try:
+            await pipe.execute()
+        except (RedisError, OSError) as err:
+            logger.warning("Slow statement was not stored: %r", err)
+
+    @staticmethod
+    async def _explain(engine: AsyncEngine, entry: SlowQuery, statement: str, parameters: Any) -> None:
+        try:
+            async with engine.connect() as connection:
+                result = await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+                entry.plan = "\n".join(row[0] for row in result)
+                await connection.rollback()
+        except Exception as err:  # noqa: a plan is best effort
+            entry.plan = f"<not explained: {err!r}>"
+
+
+slow_queries = SlowQueryLog(
+    InstrumentedRedis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password, db=0,
+                      metric_client="slow_queries"),
+    settings.slow_query_threshold, settings.slow_query_log_size, settings.slow_query_explain,
+)
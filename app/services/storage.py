@@ -0,0 +1,159 @@
+import abc
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+from app.services import cloudinary
+from app.services.cloudinary import CroppingOrResizingTransformation
+from config import settings
+
+
+class StorageBackend(abc.ABC):
+    """
+    Interface of the storages keeping the uploaded images and delivering their transformations.
+
+    The storage is selected with the ``storage_backend`` setting and returned by ``get_storage``.
+    """
+    # Whether the clients can upload the images to the storage themselves with sign_upload and verify_upload
+    supports_direct_upload: bool = False
+
+    @abc.abstractmethod
+    async def upload_image(self, file: BinaryIO, public_id: Optional[str] = None) -> Optional[dict]:
+        """
+        The upload_image function stores an image.
+
+        :param self: Represent the instance of the object itself
+        :param file: BinaryIO: Pass the image file to be uploaded
+        :param public_id: Optional[str]: Set a custom name for the image
+        :return: A dictionary with the url, public_id and version of the image or None if the file is not an image
+        """
+
+    @abc.abstractmethod
+    def formatting_image_url(self,
+                             public_id: str,
+                             transformation: Optional[CroppingOrResizingTransformation | dict] = None,
+                             version: Optional[str] = None) -> dict:
+        """
+        The formatting_image_url function returns the url of the image with the transformation applied to it.
+
+        :param self: Represent the instance of the object itself
+        :param public_id: str: Specify the public_id of the image
+        :param transformation: Optional[CroppingOrResizingTransformation | dict]: Specify the transformation
+        :param version: Optional[str]: Specify the version of the image to be used
+        :return: A dictionary with the url and the transformation parameters
+        """
+
+    @abc.abstractmethod
+    async def remove_image(self, public_id: str) -> bool:
+        """
+        The remove_image function removes an image and all of its transformations.
+
+        :param self: Represent the instance of the object itself
+        :param public_id: str: Specify the public id of the image to be deleted
+        :return: A boolean value indicating whether the image was successfully removed
+        """
+
+    async def remove_images(self, public_ids: list[str]) -> list[str]:
+        """
+        The remove_images function removes several images.
+
+        :param self: Represent the instance of the object itself
+        :param public_ids: list[str]: Specify the public ids of the images to be deleted
+        :return: The public ids that were successfully removed
+        """
+        return [public_id for public_id in public_ids if await self.remove_image(public_id)]
+
+    def sign_upload(self, public_id: str) -> dict:
+        """
+        The sign_upload function creates signed parameters for uploading an image directly to the storage.
+        Only called if the storage supports direct uploads.
+
+        :param self: Represent the instance of the object itself
+        :param public_id: str: Specify the public id the image will be uploaded with
+        :return: A dictionary with the upload url and the signed upload parameters
+        """
+        raise NotImplementedError("Direct uploads are not supported by the storage backend")
+
+    def verify_upload(self, public_id: str, version: int, signature: str) -> bool:
+        """
+        The verify_upload function checks the signature of a direct upload.
+        Only called if the storage supports direct uploads.
+
+        :param self: Represent the instance of the object itself
+        :param public_id: str: Specify the public id of the uploaded image
+        :param version: int: Specify the version of the uploaded image
+        :param signature: str: Specify the signature of the upload response
+        :return: True if the signature is valid
+        """
+        raise NotImplementedError("Direct uploads are not supported by the storage backend")
+
+    async def open_image(self, path: str) -> Optional[Path]:
+        """
+        The open_image function returns the local file of an image url path, for storages that deliver the images
+        through the api. Remote storages deliver the images themselves and return None.
+
+        :param self: Represent the instance of the object itself
+        :param path: str: Specify the path of the image url relative to the media url
+        :return: The path of the file or None
+        """
+        return None
+
+    async def close(self) -> None:
+        """
+        The close function releases the resources of the storage.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+
+
+class CloudinaryStorage(StorageBackend):
+    """Storage keeping the images in Cloudinary"""
+    supports_direct_upload = True
+
+    async def upload_image(self, file: BinaryIO, public_id: Optional[str] = None) -> Optional[dict]:
+        return await cloudinary.upload_image(file, public_id)
+
+    def formatting_image_url(self,
+                             public_id: str,
+                             transformation: Optional[CroppingOrResizingTransformation | dict] = None,
+                             version: Optional[str] = None) -> dict:
+        return cloudinary.formatting_image_url(public_id, transformation, version)
+
+    async def remove_image(self, public_id: str) -> bool:
+        return await cloudinary.remove_image(public_id)
+
+    async def remove_images(self, public_ids: list[str]) -> list[str]:
+        return await cloudinary.remove_images(public_ids)
+
+    def sign_upload(self, public_id: str) -> dict:
+        return cloudinary.sign_upload(public_id)
+
+    def verify_upload(self, public_id: str, version: int, signature: str) -> bool:
+        return cloudinary.client.verify_response(public_id, version, signature)
+
+    async def close(self) -> None:
+        await cloudinary.client.close()
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    """
+    The get_storage function returns the storage selected with the storage_backend setting.
+    The storage is created once per process.
+
+    :return: The storage backend
+    """
+    if settings.storage_backend == "local":
+        from .local_storage import LocalStorage
+
+        return LocalStorage(
+            root=settings.storage_local_root,
+            base_url=settings.storage_local_url,
+            folder=settings.cloudinary_folder,
+            cache_size=settings.storage_local_cache_size,
+            workers=settings.storage_local_workers,
+            max_dimension=settings.storage_local_max_dimension,
+        )
+
+    return CloudinaryStorage()
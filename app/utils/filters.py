@@ -1,7 +1,8 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 
+from app.database.connect import get_db
 from app.database.models import UserRole, User
-from app.services.auth import get_current_active_user
+from app.services.auth import AuthService, get_current_active_user
 
 
 class UserRoleFilter:
@@ -40,3 +41,27 @@ class UserRoleFilter:
 
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
                             detail=f"Access denied. Access open to \"{current_user.role}\"")
+
+    async def allows(self, request: Request) -> bool:
+        """
+        The allows function checks the role of the user authenticated by a request outside of the dependency
+        injection, e.g. in a middleware. The database session is created like the get_db dependency, with the
+        overrides of the application.
+
+        :param self: Access the class attributes
+        :param request: Request: Pass the request carrying the access token
+        :return: True if the user has access
+        """
+        get_session = request.app.dependency_overrides.get(get_db, get_db)
+        try:
+            token = await AuthService.oauth2_scheme(request)
+            sessions = get_session()
+            db = await anext(sessions)
+            try:
+                await self(await get_current_active_user(await AuthService.get_current_user(token, db)))
+            finally:
+                await sessions.aclose()
+        except HTTPException:
+            return False
+
+        return True
@@ -0,0 +1,158 @@
+import os
+import re
+import zipfile
+from typing import AsyncIterable, AsyncIterator, Optional, Mapping
+
+import anyio
+from starlette.responses import FileResponse, StreamingResponse
+from starlette.types import Scope, Receive, Send
+
+
+class FileRangeResponse(FileResponse):
+    """
+    File response that supports single byte ranges (``Range: bytes=start-end``) and zero-copy sending.
+
+    When the server advertises the ``http.response.zerocopysend`` ASGI extension the file descriptor is handed to
+    the server, which can send it with ``sendfile``; otherwise the file is streamed in chunks.
+    """
+    RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+    def __init__(
+            self,
+            path: str | os.PathLike,
+            range_header: Optional[str] = None,
+            headers: Optional[Mapping[str, str]] = None,
+            media_type: Optional[str] = None,
+            method: Optional[str] = None,
+    ) -> None:
+        """
+        The __init__ function resolves the requested byte range of the file.
+
+        :param self: Represent the instance of the object itself
+        :param path: str | os.PathLike: Specify the path of the file
+        :param range_header: Optional[str]: Pass the value of the range header of the request
+        :param headers: Optional[Mapping[str, str]]: Add headers to the response
+        :param media_type: Optional[str]: Set the media type, guessed from the file name by default
+        :param method: Optional[str]: Pass the method of the request, HEAD responses have no body
+        :return: Nothing
+        """
+        stat_result = os.stat(path)
+        size = stat_result.st_size
+
+        self.start, self.end = 0, size - 1
+        status_code = 200
+        content_range = None
+
+        match = self.RANGE.match(range_header or "")
+        if match and any(match.groups()):
+            first, last = match.groups()
+            if first:
+                self.start, self.end = int(first), min(int(last), size - 1) if last else size - 1
+            else:
+                self.start = max(size - int(last), 0)
+
+            if self.start > self.end:
+                status_code, content_range = 416, f"bytes */{size}"
+                self.start, self.end = 0, -1
+            else:
+                status_code, content_range = 206, f"bytes {self.start}-{self.end}/{size}"
+
+        super().__init__(path, status_code, headers, media_type, method=method, stat_result=stat_result)
+
+        self.headers["content-length"] = str(self.end - self.start + 1)
+        self.headers["accept-ranges"] = "bytes"
+        if content_range:
+            self.headers["content-range"] = content_range
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        count = self.end - self.start + 1
+
+        if self.send_header_only or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, mode="rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                while count > 0:
+                    chunk = await file.read(min(self.chunk_size, count))
+                    count -= len(chunk)
+                    more_body = count > 0 and bool(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                    if not more_body:
+                        break
+
+
+class _ZipBuffer:
+    """
+    Write-only, unseekable file object collecting the bytes written by ``ZipFile`` until they are sent.
+    ``ZipFile`` writes data descriptors after the entries when the file cannot seek.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def pop(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def stream_zip(files: AsyncIterable[tuple[zipfile.ZipInfo, bytes]]) -> AsyncIterator[bytes]:
+    """
+    The stream_zip function builds a zip archive incrementally, yielding the bytes of every entry as soon as it is
+    written, so the archive is never kept in memory.
+
+    :param files: AsyncIterable[tuple[zipfile.ZipInfo, bytes]]: Pass the entries and their contents
+    :return: An async iterator of the bytes of the archive
+    """
+    buffer = _ZipBuffer()
+
+    with zipfile.ZipFile(buffer, mode="w") as archive:  # noqa
+        async for info, content in files:
+            archive.writestr(info, content)
+            yield buffer.pop()
+
+    yield buffer.pop()
+
+
+class ZipStreamingResponse(StreamingResponse):
+    """
+    Streaming response of a zip archive built from an async iterable of entries while it is sent.
+    """
+    media_type = "application/zip"
+
+    def __init__(
+            self,
+            files: AsyncIterable[tuple[zipfile.ZipInfo, bytes]],
+            filename: str,
+            headers: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """
+        The __init__ function prepares the response.
+
+        :param self: Represent the instance of the object itself
+        :param files: AsyncIterable[tuple[zipfile.ZipInfo, bytes]]: Pass the entries and their contents
+        :param filename: str: Specify the name of the downloaded archive
+        :param headers: Optional[Mapping[str, str]]: Add headers to the response
+        :return: Nothing
+        """
+        super().__init__(stream_zip(files), headers={
+            "Content-Disposition": f'attachment; filename="{filename}"', **(headers or {})
+        })
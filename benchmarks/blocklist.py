@@ -0,0 +1,63 @@
+"""
+Lookups in a blocklist of many IPv4 and IPv6 ranges.
+
+Builds the prefix tries of random networks and measures the lookup of random addresses (mostly misses) and of
+addresses inside the ranges (hits), from an address string as the middleware does. A linear scan of the networks,
+like checking a list such as ``BANNED_IPS``, is measured on a few addresses for comparison.
+
+Usage:
+    python -m benchmarks.blocklist --ranges 100000
+"""
+import argparse
+import random
+import time
+from ipaddress import IPv4Network, IPv6Network, ip_address
+
+import benchmarks  # noqa: F401 (offline settings)
+
+from app.services.blocklist import Blocklist
+
+
+def networks(count: int, rng: random.Random) -> list:
+    result = []
+    for _ in range(count * 9 // 10):
+        result.append(IPv4Network((rng.getrandbits(32), rng.randint(16, 32)), strict=False))
+    for _ in range(count - len(result)):
+        result.append(IPv6Network((rng.getrandbits(128), rng.randint(32, 128)), strict=False))
+    return result
+
+
+def measure(name: str, lookup, addresses: list[str]) -> None:
+    start = time.perf_counter()
+    found = sum(1 for address in addresses if lookup(address))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<22} {len(addresses):7} lookups {elapsed / len(addresses) * 1e6:10.2f} us/lookup  {found} found")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ranges", type=int, default=100_000, help="number of blocked networks")
+    parser.add_argument("--lookups", type=int, default=200_000, help="number of lookups")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    blocked = networks(args.ranges, rng)
+
+    start = time.perf_counter()
+    blocklist = Blocklist(str(network) for network in blocked)
+    print(f"built {len(blocklist)} prefixes from {args.ranges} ranges in {time.perf_counter() - start:.2f}s")
+
+    misses = [str(ip_address(rng.getrandbits(32))) for _ in range(args.lookups)]
+    hits = [str(network.network_address + rng.randrange(network.num_addresses))
+            for network in rng.choices(blocked, k=args.lookups)]
+    v6 = [str(ip_address(rng.getrandbits(128))) for _ in range(args.lookups)]
+
+    measure("trie, random ipv4", blocklist.__contains__, misses)
+    measure("trie, blocked", blocklist.__contains__, hits)
+    measure("trie, random ipv6", blocklist.__contains__, v6)
+    measure("linear scan, random", lambda address: any(ip_address(address) in network for network in blocked),
+            misses[:20])
+
+
+if __name__ == '__main__':
+    main()
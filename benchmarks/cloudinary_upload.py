@@ -0,0 +1,93 @@
+"""
+Throughput of concurrent image uploads to a local Cloudinary stand-in.
+
+Compares the synchronous SDK called through the default thread pool executor (the previous implementation of
+``upload_image``) with ``AsyncCloudinaryClient``, which keeps a pool of keep-alive connections on the event loop.
+
+Usage:
+    python -m benchmarks.cloudinary_upload --uploads 200 --latency 0.2
+"""
+import argparse
+import asyncio
+import io
+import time
+
+import benchmarks  # noqa: F401 (offline settings)
+import cloudinary
+import cloudinary.uploader
+
+from benchmarks import standins
+from app.services.cloudinary import AsyncCloudinaryClient
+from config import settings
+
+
+PAYLOAD = b"\x89PNG\r\n\x1a\n" + bytes(32 * 1024)
+
+
+async def sdk_in_executor(api_url: str, uploads: int) -> float:
+    cloudinary.config(
+        cloud_name=settings.cloudinary_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        upload_prefix=api_url,
+    )
+    loop = asyncio.get_running_loop()
+
+    def upload(i: int) -> dict:
+        return cloudinary.uploader.upload(
+            io.BytesIO(PAYLOAD), public_id=f"sdk_{i}", folder=settings.cloudinary_folder, overwrite=True
+        )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop.run_in_executor(None, upload, i) for i in range(uploads)))
+
+    return time.perf_counter() - start
+
+
+async def async_client(api_url: str, uploads: int) -> float:
+    client = AsyncCloudinaryClient(
+        cloud_name=settings.cloudinary_name,
+        api_key=settings.cloudinary_api_key,
+        api_secret=settings.cloudinary_api_secret,
+        api_url=api_url,
+        pool_size=uploads,
+    )
+
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client.upload(io.BytesIO(PAYLOAD), public_id=f"async_{i}", folder=settings.cloudinary_folder, overwrite=True)
+        for i in range(uploads)
+    ))
+    elapsed = time.perf_counter() - start
+
+    await client.close()
+
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=200, help="number of concurrent uploads")
+    parser.add_argument("--latency", type=float, default=0.2, help="artificial latency of the stand-in, seconds")
+    args = parser.parse_args()
+
+    port = standins.free_port()
+    server = standins.start(
+        "benchmarks.standins.cloudinary", port,
+        "--latency", str(args.latency),
+        "--api-key", str(settings.cloudinary_api_key),
+        "--api-secret", settings.cloudinary_api_secret,
+    )
+    api_url = f"http://127.0.0.1:{port}"
+
+    try:
+        for name, bench in (("sdk + executor", sdk_in_executor), ("async client", async_client)):
+            elapsed = asyncio.run(bench(api_url, args.uploads))
+            print(f"{name:<16} {args.uploads} uploads in {elapsed:6.2f}s  {args.uploads / elapsed:8.1f} uploads/s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
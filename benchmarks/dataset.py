@@ -0,0 +1,285 @@
+"""
+Synthetic dataset at benchmark scale: users, tags, images with their tags, comments and ratings.
+
+The rows are produced by generators and streamed to Postgres with binary ``COPY``, nothing is held in memory. The
+secondary indexes, unique and foreign key constraints of the loaded tables are dropped before the copy and created
+again afterwards, in the same transaction, so a failed load leaves the database as it was. The tables are then
+analyzed and their id sequences moved past the generated ids.
+
+Every table draws from its own random generator derived from ``--seed``, so a seed always produces the same data,
+whatever the order in which the tables are loaded. The distributions are skewed like real traffic:
+
+* image owners and tags follow a Zipf law (``--owner-skew``, ``--tag-skew``), the most popular ids scattered over
+  the whole range rather than being the first ones;
+* the comments and ratings of an image follow a Pareto popularity, so a few images get most of them;
+* the ratings of an image are given by distinct users, never its owner, like the API enforces.
+
+Every user has the password ``password`` and a confirmed email, the first one is an admin.
+
+Usage:
+    python -m benchmarks.dataset --users 100000 --images 1000000 --comments 2000000 --ratings 5000000 --truncate
+    python -m benchmarks.dataset --users 1000000 --images 10000000 --ratings 50000000 --seed 7 --truncate
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator
+
+import benchmarks  # noqa: F401 (offline settings)
+import asyncpg
+
+from benchmarks.loadtest import create_tables
+from app.database.models import Image, ImageComment, ImageRating, Tag, User, UserRole
+from app.database.models.images import image_m2m_tag
+from config import settings
+
+# bcrypt hash of "password", hashing it per user would cost minutes
+PASSWORD_HASH = "$2b$12$DFMdWnga7kct2ygic0rWJOW6vLbST0MEkTUcFuYAycBtchnuF4N3O"
+
+FIRST_NAMES = ("Olena", "Taras", "Iryna", "Andrii", "Sofia", "Maksym", "Daria", "Bohdan", "Anna", "Oleh")
+LAST_NAMES = ("Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko", "Melnyk", "Boiko", "Koval")
+WORDS = (
+    "sunset", "mountain", "river", "city", "night", "portrait", "street", "forest", "winter", "summer", "sea",
+    "bridge", "coffee", "garden", "cat", "dog", "old", "light", "shadow", "morning", "rain", "travel", "family",
+    "friends", "architecture", "nature", "sky", "flowers", "road", "lake",
+)
+
+# Shape of the popularity of the images, a Pareto law of mean ALPHA / (ALPHA - 1)
+ALPHA = 1.5
+MAX_TAGS = 5
+
+
+class Zipf:
+    """
+    Sampler of ranks 1..n with a probability proportional to rank ** -skew, by inverting the continuous law,
+    in constant time and memory. A rank is mapped to an id by a multiplicative permutation of 1..n, so the popular
+    ids are spread over the range.
+    """
+
+    def __init__(self, n: int, skew: float) -> None:
+        self.n = n
+        self.skew = skew
+        self.span = math.log(n + 1) if skew == 1 else (n + 1) ** (1 - skew) - 1
+        self.stride = next(p for p in range(n // 2 + 1, 2 * n + 3) if math.gcd(p, n) == 1)
+
+    def rank(self, rng: random.Random) -> int:
+        u = rng.random()
+        x = math.exp(u * self.span) if self.skew == 1 else (1 + u * self.span) ** (1 / (1 - self.skew))
+        return min(int(x), self.n)
+
+    def sample(self, rng: random.Random) -> int:
+        return (self.rank(rng) - 1) * self.stride % self.n + 1
+
+
+class Dataset:
+    """
+    Generators of the rows of every table, deterministic for a seed.
+    """
+
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.seed = args.seed
+        self.users = args.users
+        self.tags = args.tags
+        self.images = args.images
+        self.comments = args.comments
+        self.ratings = args.ratings
+        self.end = datetime(2023, 6, 1)
+        self.start = self.end - timedelta(days=args.days)
+        self.owners = Zipf(args.users, args.owner_skew)
+        self.tag_ranks = Zipf(args.tags, args.tag_skew)
+
+    def rng(self, stream: str) -> random.Random:
+        return random.Random(f"{self.seed}:{stream}")
+
+    def timestamp(self, position: float) -> datetime:
+        return self.start + (self.end - self.start) * position
+
+    @staticmethod
+    def text(rng: random.Random, low: int, high: int) -> str:
+        return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+    @staticmethod
+    def share(rng: random.Random, mean: float, weight: float) -> int:
+        """
+        The share function returns a count of mean ``mean * weight``, rounded up or down at random.
+        """
+        expected = mean * weight
+        count = int(expected)
+        return count + (rng.random() < expected - count)
+
+    def image_rows(self) -> Iterator[tuple[int, int, datetime, float]]:
+        """
+        The image_rows function yields the id, owner, creation time and popularity of every image, the same for
+        every table that depends on the images.
+        """
+        owners, popularity = self.rng("owners"), self.rng("popularity")
+        mean = ALPHA / (ALPHA - 1)
+        for image_id in range(1, self.images + 1):
+            yield (image_id, self.owners.sample(owners), self.timestamp(image_id / (self.images + 1)),
+                   popularity.paretovariate(ALPHA) / mean)
+
+    def user_records(self) -> Iterator[tuple]:
+        rng = self.rng("users")
+        for user_id in range(1, self.users + 1):
+            yield (
+                user_id, f"user{user_id}", f"user{user_id}@example.com", PASSWORD_HASH,
+                rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), None,
+                UserRole.admin.value if user_id == 1 else UserRole.user.value, None, True, True,
+                self.timestamp(rng.random() * 0.5), None,
+            )
+
+    def tag_records(self) -> Iterator[tuple]:
+        for tag_id in range(1, self.tags + 1):
+            yield tag_id, f"{WORDS[tag_id % len(WORDS)]}-{tag_id}", self.start, None
+
+    def image_records(self) -> Iterator[tuple]:
+        rng = self.rng("images")
+        for image_id, owner, created_at, _ in self.image_rows():
+            content_hash = f"{rng.getrandbits(256):064x}"
+            yield (image_id, f"{settings.cloudinary_folder}/{content_hash}", content_hash, self.text(rng, 3, 20),
+                   created_at, None, owner)
+
+    def image_tag_records(self) -> Iterator[tuple]:
+        rng = self.rng("image_tags")
+        row_id = 0
+        for image_id in range(1, self.images + 1):
+            count, tags = rng.randint(0, min(MAX_TAGS, self.tags)), set()
+            for _ in range(4 * count):
+                if len(tags) == count:
+                    break
+                tags.add(self.tag_ranks.sample(rng))
+            for tag_id in sorted(tags):
+                row_id += 1
+                yield row_id, image_id, tag_id
+
+    def comment_records(self) -> Iterator[tuple]:
+        rng = self.rng("comments")
+        mean = self.comments / self.images
+        comment_id = 0
+        for image_id, _, created_at, weight in self.image_rows():
+            for _ in range(self.share(rng, mean, weight)):
+                comment_id += 1
+                yield (comment_id, self.text(rng, 2, 30), rng.randint(1, self.users), image_id,
+                       created_at + (self.end - created_at) * rng.random(), None)
+
+    def rating_records(self) -> Iterator[tuple]:
+        rng = self.rng("ratings")
+        mean = self.ratings / self.images
+        rating_id = 0
+        for image_id, owner, created_at, weight in self.image_rows():
+            count = min(self.share(rng, mean, weight), self.users - 1)
+            users = [user_id for user_id in rng.sample(range(1, self.users + 1), count + 1) if user_id != owner]
+            for user_id in users[:count]:
+                rating_id += 1
+                yield (rating_id, rng.randint(1, 5), created_at + (self.end - created_at) * rng.random(), None,
+                       user_id, image_id)
+
+    def tables(self) -> list[tuple[str, list[str], Iterator[tuple]]]:
+        """
+        The tables function returns the name, the columns and the records of every table, in the order of their
+        foreign keys.
+        """
+        return [
+            (User.__tablename__, ["id", "username", "email", "password", "first_name", "last_name", "avatar", "role",
+                                  "refresh_token", "email_verified", "is_active", "created_at", "updated_at"],
+             self.user_records()),
+            (Tag.__tablename__, ["id", "name", "created_at", "updated_at"], self.tag_records()),
+            (Image.__tablename__, ["id", "public_id", "content_hash", "description", "created_at", "updated_at",
+                                   "user_id"], self.image_records()),
+            (image_m2m_tag.name, ["id", "image_id", "tag_id"], self.image_tag_records()),
+            (ImageComment.__tablename__, ["id", "data", "user_id", "image_id", "created_at", "updated_at"],
+             self.comment_records()),
+            (ImageRating.__tablename__, ["id", "rating", "created_at", "updated_at", "user_id", "image_id"],
+             self.rating_records()),
+        ]
+
+
+async def drop_indexes(connection: asyncpg.Connection, tables: list[str]) -> list[str]:
+    """
+    The drop_indexes function drops the secondary indexes, unique and foreign key constraints of the tables.
+
+    :param connection: asyncpg.Connection: Pass the connection of the transaction of the load
+    :param tables: list[str]: Specify the tables
+    :return: The statements creating them again, in order
+    """
+    constraints = await connection.fetch(
+        "SELECT conrelid::regclass::text AS relation, quote_ident(conname) AS name, contype, "
+        "pg_get_constraintdef(oid) AS definition FROM pg_constraint "
+        "WHERE conrelid = ANY($1::regclass[]) AND contype IN ('f', 'u') ORDER BY contype", tables
+    )
+    indexes = await connection.fetch(
+        "SELECT indexrelid::regclass::text AS name, pg_get_indexdef(indexrelid) AS definition FROM pg_index "
+        "WHERE indrelid = ANY($1::regclass[]) AND NOT indisprimary "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = indexrelid)", tables
+    )
+
+    # Foreign keys first, they depend on the unique constraints
+    for constraint in constraints:
+        await connection.execute(f"ALTER TABLE {constraint['relation']} DROP CONSTRAINT {constraint['name']}")
+    for index in indexes:
+        await connection.execute(f"DROP INDEX {index['name']}")
+
+    return [index["definition"] for index in indexes] + [
+        f"ALTER TABLE {constraint['relation']} ADD CONSTRAINT {constraint['name']} {constraint['definition']}"
+        for constraint in reversed(constraints)
+    ]
+
+
+async def load(db_url: str, dataset: Dataset, truncate: bool) -> None:
+    await create_tables(db_url)
+    connection = await asyncpg.connect(db_url.replace("+asyncpg", ""))
+    try:
+        tables = [name for name, _, _ in dataset.tables()]
+        async with connection.transaction():
+            if truncate:
+                await connection.execute(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE")
+            elif await connection.fetchval(f"SELECT EXISTS (SELECT 1 FROM {User.__tablename__})"):
+                raise SystemExit("The database already has users, pass --truncate to replace them")
+
+            start = time.perf_counter()
+            statements = await drop_indexes(connection, tables)
+
+            for name, columns, records in dataset.tables():
+                table_start = time.perf_counter()
+                await connection.copy_records_to_table(name, columns=columns, records=records)
+                count = await connection.fetchval(f"SELECT count(*) FROM {name}")
+                elapsed = time.perf_counter() - table_start
+                print(f"{name:<16} {count:>12,} rows in {elapsed:8.1f}s  {count / elapsed:>10,.0f} rows/s")
+                await connection.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', 'id'), GREATEST(max(id), 1)) FROM {name}"
+                )
+
+            index_start = time.perf_counter()
+            for statement in statements:
+                await connection.execute(statement)
+            print(f"{'indexes':<16} {len(statements):>12} created in {time.perf_counter() - index_start:8.1f}s")
+
+        await connection.execute(f"ANALYZE {', '.join(tables)}")
+        print(f"Loaded in {time.perf_counter() - start:.1f}s")
+    finally:
+        await connection.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--tags", type=int, default=1_000)
+    parser.add_argument("--images", type=int, default=100_000)
+    parser.add_argument("--comments", type=int, default=200_000, help="approximate number of comments")
+    parser.add_argument("--ratings", type=int, default=500_000, help="approximate number of ratings")
+    parser.add_argument("--owner-skew", type=float, default=0.8, help="Zipf exponent of the owners of the images")
+    parser.add_argument("--tag-skew", type=float, default=1.1, help="Zipf exponent of the tags of the images")
+    parser.add_argument("--days", type=int, default=3 * 365, help="period over which the rows are created")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db-url", default=settings.db_url)
+    parser.add_argument("--truncate", action="store_true", help="replace the users and everything depending on them")
+    args = parser.parse_args()
+
+    asyncio.run(load(args.db_url, Dataset(args), args.truncate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Throughput of sending emails to a local SMTP stand-in listening with implicit TLS.
+
+Compares ``FastMail.send_message`` (the previous implementation, a new connection, TLS handshake and login per
+message) with ``OutboxWorker.deliver`` over an ``SMTPPool``, which keeps the authenticated connections open.
+
+Usage:
+    python -m benchmarks.email_outbox --emails 200 --concurrency 4 --latency 0.005 --connect-latency 0.02
+"""
+import argparse
+import asyncio
+import time
+
+import benchmarks  # noqa: F401 (offline settings)
+from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+
+from benchmarks import standins
+from app.database.models import EmailOutbox
+from app.services.email_outbox import OutboxWorker, SMTPPool
+from config import Template
+
+
+BODY = {"host": "http://localhost:8000/", "username": "bench", "token": "x" * 160}
+
+
+def connection_config(port: int) -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="bench@example.com",
+        MAIL_PASSWORD="password",
+        MAIL_FROM="bench@example.com",
+        MAIL_PORT=port,
+        MAIL_SERVER="127.0.0.1",
+        MAIL_FROM_NAME="Benchmark",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=False,
+        TEMPLATE_FOLDER=Template.emails,
+    )
+
+
+async def fastmail(conf: ConnectionConfig, emails: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i: int) -> None:
+        message = MessageSchema(
+            subject="Confirm your email ", recipients=[f"user{i}@example.com"],
+            template_body=BODY, subtype=MessageType.html,
+        )
+        async with semaphore:
+            await FastMail(conf).send_message(message, template_name="confirmed_email.html")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(send(i) for i in range(emails)))
+
+    return time.perf_counter() - start
+
+
+async def pooled(conf: ConnectionConfig, emails: int, concurrency: int) -> float:
+    worker = OutboxWorker(SMTPPool(conf, size=concurrency), session_factory=None)  # noqa
+    outbox = [
+        EmailOutbox(id=i, recipient=f"user{i}@example.com", subject="Confirm your email ",
+                    template_name="confirmed_email.html", template_body=BODY, attempts=1)
+        for i in range(emails)
+    ]
+
+    start = time.perf_counter()
+    errors = await asyncio.gather(*(worker.deliver(message) for message in worker.render_all(outbox)))
+    elapsed = time.perf_counter() - start
+
+    await worker.pool.close()
+    assert errors.count(None) == emails, [error for error in errors if error is not None][:1]
+
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=200, help="number of emails sent")
+    parser.add_argument("--concurrency", type=int, default=4, help="number of concurrent smtp connections")
+    parser.add_argument("--latency", type=float, default=0.005, help="delay before the stand-in accepts a message")
+    parser.add_argument("--connect-latency", type=float, default=0.02, help="delay before the stand-in greets")
+    args = parser.parse_args()
+
+    port = standins.free_port()
+    process = standins.start(
+        "benchmarks.standins.smtp", port, "--tls",
+        "--latency", str(args.latency), "--connect-latency", str(args.connect_latency),
+    )
+    conf = connection_config(port)
+
+    try:
+        for name, run in (("fastmail", fastmail), ("smtp pool", pooled)):
+            elapsed = asyncio.run(run(conf, args.emails, args.concurrency))
+            print(f"{name:<10} {args.emails} emails in {elapsed:7.3f}s  {args.emails / elapsed:8.1f} emails/s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    main()
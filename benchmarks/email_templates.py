@@ -0,0 +1,86 @@
+"""
+Render throughput of the email templates for many recipients.
+
+Compares the fastapi-mail way (a new environment, template lookup and compilation per email), a shared jinja
+environment, and ``EmailTemplates`` which substitutes the recipient fields into the pre-rendered static parts.
+The last case builds the complete messages with ``OutboxWorker.render_all``.
+
+Usage:
+    python -m benchmarks.email_templates --recipients 10000
+"""
+import argparse
+import time
+from typing import Callable
+
+import benchmarks  # noqa: F401 (offline settings)
+from jinja2 import Environment, FileSystemLoader
+
+from app.database.models import EmailOutbox
+from app.services.email import conf
+from app.services.email_outbox import OutboxWorker, SMTPPool
+from app.services.email_templates import EmailTemplates
+from config import Template
+
+
+TEMPLATES = ("confirmed_email.html", "reset_password.html")
+
+
+def contexts(recipients: int) -> list[dict]:
+    return [
+        {"host": "http://localhost:8000/", "full_name": f"user{i}", "token": f"{i:0>160}"}
+        for i in range(recipients)
+    ]
+
+
+def fastmail(name: str) -> Callable[[dict], str]:
+    return lambda context: conf.template_engine().get_template(name).render(**context)
+
+
+def shared_environment(name: str) -> Callable[[dict], str]:
+    environment = Environment(loader=FileSystemLoader(Template.emails))
+    return lambda context: environment.get_template(name).render(**context)
+
+
+def email_templates(name: str) -> Callable[[dict], str]:
+    templates = EmailTemplates(Template.emails)
+    templates.compile()
+    return lambda context: templates.render(name, context)
+
+
+def messages(name: str, recipients: list[dict]) -> float:
+    worker = OutboxWorker(SMTPPool(conf, size=1), session_factory=None, templates=EmailTemplates(Template.emails))  # noqa
+    outbox = [
+        EmailOutbox(recipient=f"user{i}@example.com", subject="Subject", template_name=name, template_body=context)
+        for i, context in enumerate(recipients)
+    ]
+
+    start = time.perf_counter()
+    worker.render_all(outbox)
+
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=10_000, help="number of rendered emails")
+    args = parser.parse_args()
+    recipients = contexts(args.recipients)
+
+    for name in TEMPLATES:
+        for case, factory in (("fastmail", fastmail), ("shared env", shared_environment),
+                              ("precompiled", email_templates)):
+            render = factory(name)
+            start = time.perf_counter()
+            for context in recipients:
+                render(context)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<22} {case:<12} {args.recipients} renders in {elapsed:7.3f}s  "
+                  f"{args.recipients / elapsed:10.0f} renders/s")
+
+        elapsed = messages(name, recipients)
+        print(f"{name:<22} {'messages':<12} {args.recipients} messages in {elapsed:6.3f}s  "
+              f"{args.recipients / elapsed:10.0f} messages/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,411 @@
+"""
+Micro-benchmarks of the hot paths: authentication, JWT, image urls and serialization, the repositories and QR codes.
+
+Every case is calibrated to run enough iterations per round to last ``--min-time``, then timed over ``--rounds``
+rounds; the statistics are per call. The repository cases run against the database of ``DB_URL`` (the tables are
+created if missing) on rows they create and delete afterwards, the authentication cases against the Redis stand-in.
+``--no-db`` runs the other cases only.
+
+``--save`` writes the results as JSON, in the layout of pytest-benchmark. ``--compare`` reads such a file and flags
+the cases slower than it by more than ``--threshold`` on ``--stat``, exiting with status 1 if there is any, so a
+regression fails a CI job.
+
+Usage:
+    python -m benchmarks.micro --save baseline.json
+    python -m benchmarks.micro --compare baseline.json --threshold 0.15 --filter images.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from itertools import product
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+
+import benchmarks  # noqa: F401 (offline settings)
+from sqlalchemy import delete
+
+from benchmarks import standins
+from benchmarks.loadtest import create_tables
+from app.database.connect import AsyncSessionLocal, async_engine
+from app.database.models import Image, Tag, User
+from app.repository import comments as repository_comments
+from app.repository import image_ratings as repository_ratings
+from app.repository import images as repository_images
+from app.repository import tags as repository_tags
+from app.schemas.image import ImagePublic
+from app.services import qr_code
+from app.services.auth import AuthService
+from app.services.metrics import InstrumentedSyncRedis
+from app.services.qr_code import QRCodeCache, QRCodeFormat, render_qr_code
+from app.services.storage import get_storage
+from config import settings
+
+ROOT = Path(__file__).parent.parent
+IMAGES = 50
+TAGS = ("sunset", "mountain", "river", "city", "night")
+STATS = ("min", "max", "mean", "stddev", "median")
+
+Operation = Callable[[], Awaitable[Any]]
+Setup = Callable[["Context"], Awaitable[Operation]]
+CASES: dict[str, tuple[Setup, bool]] = {}
+
+
+def case(name: str, db: bool = False) -> Callable[[Setup], Setup]:
+    """
+    The case decorator registers the setup of a benchmark, a coroutine function returning the operation to time.
+
+    :param name: str: Specify the name of the case, dotted by area
+    :param db: bool: Mark the cases needing the database and Redis
+    :return: The decorator
+    """
+    def register(setup: Setup) -> Setup:
+        CASES[name] = (setup, db)
+        return setup
+
+    return register
+
+
+class Context:
+    """
+    Rows shared by the cases, a user with images, tags, a comment and a rating, created by ``setup``.
+    """
+
+    def __init__(self) -> None:
+        self.run = uuid.uuid4().hex[:8]
+        self.email = f"micro{self.run}@example.com"
+        self.db = None
+        self.user_id: Optional[int] = None
+        self.image_ids: list[int] = []
+        self.comment_id: Optional[int] = None
+        self.counter = 0
+
+    def unique(self) -> str:
+        self.counter += 1
+        return f"{self.run}-{self.counter}"
+
+    async def setup(self, redis_port: int) -> None:
+        await create_tables(settings.db_url)
+        AuthService.redis = InstrumentedSyncRedis(host="127.0.0.1", port=redis_port, db=0, metric_client="auth")
+
+        self.db = AsyncSessionLocal()
+        user = User(username=f"micro{self.run}", email=self.email, password=AuthService.get_password_hash("password"),
+                    first_name="Micro", last_name="Benchmark", email_verified=True)
+        self.db.add(user)
+        await self.db.commit()
+        await self.db.refresh(user)
+        self.user_id = user.id
+
+        for i in range(IMAGES):
+            image = await repository_images.create_image(
+                self.user_id, f"Image {i} of the micro benchmarks", [f"{TAGS[i % len(TAGS)]}-{self.run}"],
+                f"micro/{self.run}-{i}", None, self.db,
+            )
+            self.image_ids.append(image.id)
+
+        comment = await repository_comments.create_comment(self.user_id, self.image_ids[0],
+                                                           "A comment of the micro benchmarks", self.db)
+        self.comment_id = comment.id
+        await repository_ratings.create_rating(self.user_id, 3, self.image_ids[0], self.db)
+
+    async def close(self) -> None:
+        if self.db is None:
+            return
+        if self.user_id is not None:
+            await self.db.execute(delete(User).where(User.id == self.user_id))
+            await self.db.execute(delete(Tag).where(Tag.name.like(f"%-{self.run}%")))
+            await self.db.commit()
+        await self.db.close()
+        await async_engine.dispose()
+
+
+@case("auth.create_access_token")
+async def create_access_token(context: Context) -> Operation:
+    return lambda: AuthService.create_access_token({"sub": context.email})
+
+
+@case("auth.decode_refresh_token")
+async def decode_refresh_token(context: Context) -> Operation:
+    token = await AuthService.create_refresh_token({"sub": context.email})
+    return lambda: AuthService.decode_refresh_token(token)
+
+
+@case("auth.get_current_user[cache hit]", db=True)
+async def current_user_cached(context: Context) -> Operation:
+    token = await AuthService.create_access_token({"sub": context.email})
+    return lambda: AuthService.get_current_user(token, context.db)
+
+
+@case("auth.get_current_user[cache miss]", db=True)
+async def current_user_uncached(context: Context) -> Operation:
+    token = await AuthService.create_access_token({"sub": context.email})
+
+    async def operation() -> User:
+        AuthService.redis.delete(f"user:{context.email}")
+        return await AuthService.get_current_user(token, context.db)
+
+    return operation
+
+
+@case("storage.formatting_image_url")
+async def formatting_image_url(context: Context) -> Operation:
+    async def operation() -> dict:
+        return get_storage().formatting_image_url("media/micro")
+
+    return operation
+
+
+@case("storage.formatting_image_url[transformation]")
+async def formatting_image_url_transformed(context: Context) -> Operation:
+    transformation = {"width": 250, "height": 250, "crop": "fill", "gravity": "face"}
+
+    async def operation() -> dict:
+        return get_storage().formatting_image_url("media/micro", transformation)
+
+    return operation
+
+
+@case("schemas.ImagePublic[20 images]")
+async def image_public(context: Context) -> Operation:
+    now = datetime.now()
+
+    async def operation() -> list[dict]:
+        images = [Image(id=i, public_id=f"media/{i}", description="An image of the micro benchmarks", user_id=1,
+                        created_at=now, tags=[Tag(id=j, name=TAGS[j], created_at=now) for j in range(3)])
+                  for i in range(20)]
+        return [ImagePublic.from_orm(image).dict() for image in images]
+
+    return operation
+
+
+def get_images_case(description: bool, tags: bool, user_id: bool, image_id: bool) -> None:
+    filters = [name for name, used in zip(("description", "tags", "user_id", "image_id"),
+                                          (description, tags, user_id, image_id)) if used]
+
+    @case(f"images.get_images[{'+'.join(filters) or 'no filter'}]", db=True)
+    async def get_images(context: Context) -> Operation:
+        return lambda: repository_images.get_images(
+            0, 20, "micro" if description else None, [f"city-{context.run}"] if tags else None,
+            context.image_ids[-1] if image_id else None, context.user_id if user_id else None, context.db,
+        )
+
+
+for combination in product((False, True), repeat=4):
+    get_images_case(*combination)
+
+
+@case("tags.get_or_create_tags[existing]", db=True)
+async def existing_tags(context: Context) -> Operation:
+    async def operation() -> None:
+        await repository_tags.get_or_create_tags([f"{tag}-{context.run}" for tag in TAGS], context.db)
+        await context.db.commit()
+
+    return operation
+
+
+@case("tags.get_or_create_tags[new]", db=True)
+async def new_tags(context: Context) -> Operation:
+    async def operation() -> None:
+        await repository_tags.get_or_create_tags([f"{tag}-{context.unique()}" for tag in TAGS[:3]], context.db)
+        await context.db.commit()
+
+    return operation
+
+
+@case("comments.create+remove", db=True)
+async def create_comment(context: Context) -> Operation:
+    async def operation() -> None:
+        comment = await repository_comments.create_comment(context.user_id, context.image_ids[1],
+                                                           "A comment of the micro benchmarks", context.db)
+        await repository_comments.remove_comment(comment.id, context.db)
+
+    return operation
+
+
+@case("comments.get", db=True)
+async def get_comment(context: Context) -> Operation:
+    return lambda: repository_comments.get_comment_by_id(context.comment_id, context.db)
+
+
+@case("comments.list", db=True)
+async def list_comments(context: Context) -> Operation:
+    return lambda: repository_comments.get_comments_by_image_or_user_id(None, context.image_ids[0], 0, 20, context.db)
+
+
+@case("comments.update", db=True)
+async def update_comment(context: Context) -> Operation:
+    return lambda: repository_comments.update_comment(context.comment_id, f"Updated {context.unique()}", context.db)
+
+
+@case("ratings.create+remove", db=True)
+async def create_rating(context: Context) -> Operation:
+    async def operation() -> None:
+        rating = await repository_ratings.create_rating(context.user_id, 4, context.image_ids[1], context.db)
+        await repository_ratings.remove_rating(rating, context.db)
+
+    return operation
+
+
+@case("ratings.get", db=True)
+async def get_rating(context: Context) -> Operation:
+    return lambda: repository_ratings.get_rating_by_image_id_and_user(context.user_id, context.image_ids[0],
+                                                                      context.db)
+
+
+@case("ratings.list", db=True)
+async def list_ratings(context: Context) -> Operation:
+    return lambda: repository_ratings.get_all_image_ratings(context.image_ids[0], context.db)
+
+
+@case("ratings.update", db=True)
+async def update_rating(context: Context) -> Operation:
+    async def operation() -> None:
+        rating = await repository_ratings.get_rating_by_image_id_and_user(context.user_id, context.image_ids[0],
+                                                                          context.db)
+        await repository_ratings.update_rating(rating, context.counter % 5 + 1, context.db)
+        context.counter += 1
+
+    return operation
+
+
+@case("qr_code.render[cold]")
+async def qr_code_cold(context: Context) -> Operation:
+    qr_code.qr_cache = QRCodeCache(max_size=256 * 1024 ** 2)
+    return lambda: render_qr_code(f"https://res.cloudinary.com/micro/{context.unique()}", 1, 10, 5, True,
+                                  QRCodeFormat.PNG)
+
+
+@case("qr_code.render[cached]")
+async def qr_code_cached(context: Context) -> Operation:
+    qr_code.qr_cache = QRCodeCache(max_size=256 * 1024 ** 2)
+    return lambda: render_qr_code("https://res.cloudinary.com/micro/cached", 1, 10, 5, True, QRCodeFormat.PNG)
+
+
+async def measure(operation: Operation, min_time: float, rounds: int) -> dict:
+    """
+    The measure function calibrates the iterations of a round to last at least ``min_time``, then times ``rounds``
+    rounds after a warm up call.
+
+    :param operation: Operation: Pass the coroutine function to time
+    :param min_time: float: Set the minimal duration of a round in seconds
+    :param rounds: int: Set the number of rounds
+    :return: The statistics of a call in seconds, with the number of rounds and iterations
+    """
+    await operation()
+
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await operation()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        iterations *= max(2, min(10, int(min_time / max(elapsed, 1e-9)) + 1))
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await operation()
+        samples.append((time.perf_counter() - start) / iterations)
+
+    return {
+        "min": min(samples), "max": max(samples), "mean": statistics.mean(samples),
+        "stddev": statistics.stdev(samples) if rounds > 1 else 0.0, "median": statistics.median(samples),
+        "rounds": rounds, "iterations": iterations, "ops": 1 / statistics.mean(samples),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict]:
+    selected = {name: entry for name, entry in CASES.items()
+                if (not args.filter or args.filter in name) and not (args.no_db and entry[1])}
+    context = Context()
+    redis = None
+    try:
+        if any(db for _, db in selected.values()):
+            port = standins.free_port()
+            redis = standins.start("benchmarks.standins.redis", port)
+            await context.setup(port)
+
+        results = []
+        for name, (setup, _) in selected.items():
+            stats = await measure(await setup(context), args.min_time, args.rounds)
+            print(f"{name:<52} {stats['median'] * 1e6:>11.1f} us  (min {stats['min'] * 1e6:9.1f} us, "
+                  f"{stats['rounds']} x {stats['iterations']})")
+            results.append({"name": name, "stats": stats})
+        return results
+    finally:
+        await context.close()
+        await qr_code.close()
+        if redis is not None:
+            redis.terminate()
+            redis.wait()
+
+
+def compare(results: list[dict], baseline: dict, stat: str, threshold: float) -> bool:
+    """
+    The compare function prints the change of every case from the baseline.
+
+    :param results: list[dict]: Pass the results of the run
+    :param baseline: dict: Pass the saved results to compare with
+    :param stat: str: Specify the statistic compared
+    :param threshold: float: Set the relative slowdown above which a case regressed
+    :return: True if any case regressed
+    """
+    previous = {entry["name"]: entry["stats"] for entry in baseline["benchmarks"]}
+    regressed = False
+
+    print(f"\n{'case':<52} {'baseline':>11} {'current':>11} {'change':>8}  ({stat}, threshold {threshold:.0%})")
+    for entry in results:
+        if entry["name"] not in previous:
+            continue
+        before, after = previous[entry["name"]][stat], entry["stats"][stat]
+        change = after / before - 1
+        flag = "  REGRESSION" if change > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{entry['name']:<52} {before * 1e6:>9.1f}us {after * 1e6:>9.1f}us {change:>+8.1%}{flag}")
+
+    return regressed
+
+
+def commit_id() -> Optional[str]:
+    result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default=None, help="run the cases whose name contains this string only")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.01, help="minimal duration of a round in seconds")
+    parser.add_argument("--no-db", action="store_true", help="skip the cases needing the database and Redis")
+    parser.add_argument("--save", type=Path, default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", type=Path, default=None, help="compare with the results of this JSON file")
+    parser.add_argument("--stat", choices=STATS, default="median", help="statistic compared")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+
+    if args.save:
+        args.save.write_text(json.dumps({
+            "machine_info": {"python_version": platform.python_version(), "machine": platform.machine(),
+                             "system": platform.system(), "node": platform.node()},
+            "commit_info": {"id": commit_id()},
+            "datetime": datetime.utcnow().isoformat(),
+            "benchmarks": results,
+        }, indent=2))
+
+    if args.compare and compare(results, json.loads(args.compare.read_text()), args.stat, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
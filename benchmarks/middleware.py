@@ -0,0 +1,149 @@
+"""
+Overhead of the middlewares on a trivial endpoint, @app.middleware("http") versus plain ASGI middlewares.
+
+The same three concerns (blocklist filter, Server-Timing header, request id) are implemented both ways and wrapped
+around ``GET /`` of an otherwise empty FastAPI application, which is called in-process through ASGI so the network
+and the server do not blur the difference. A streaming endpoint sending chunks 10 ms apart shows when the first chunk
+reaches the server through each stack. The last stack adds the request metrics to the plain ASGI middlewares.
+
+Usage:
+    python -m benchmarks.middleware --requests 20000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import benchmarks  # noqa: F401 (offline settings)
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.middleware import IPFilterMiddleware, MetricsMiddleware, RequestIdMiddleware, TimingMiddleware
+from app.services.blocklist import BlocklistSource
+
+BLOCKLIST = BlocklistSource(["198.51.100.0/24", "2001:db8::/32"])
+
+
+def application() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/")
+    def read_root():
+        return {"message": "REST APP v-1.0"}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for _ in range(5):
+                yield b"chunk"
+                await asyncio.sleep(0.01)
+        return StreamingResponse(chunks())
+
+    return app
+
+
+def http_middleware() -> FastAPI:
+    app = application()
+
+    @app.middleware("http")
+    async def ban_ips(request: Request, call_next):
+        if request.client.host in BLOCKLIST:
+            return JSONResponse(status_code=403, content={"detail": "You are banned"})
+        return await call_next(request)
+
+    @app.middleware("http")
+    async def timing(request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        response.headers.append("Server-Timing", f"app;dur={(time.perf_counter() - start) * 1000:.1f}")
+        return response
+
+    @app.middleware("http")
+    async def request_id(request: Request, call_next):
+        request.state.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+        response = await call_next(request)
+        response.headers["X-Request-ID"] = request.state.request_id
+        return response
+
+    return app
+
+
+def asgi_middleware(metrics: bool = False) -> FastAPI:
+    app = application()
+    app.add_middleware(IPFilterMiddleware, blocklist=BLOCKLIST)
+    app.add_middleware(TimingMiddleware)
+    if metrics:
+        app.add_middleware(MetricsMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+    return app
+
+
+async def call(app: FastAPI, path: str) -> list[float]:
+    """
+    Calls the application like a server would, returns the times at which the body chunks were sent.
+    """
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"host", b"bench")], "client": ("203.0.113.7", 5000), "server": ("bench", 80),
+    }
+    received, chunks, complete = False, [], asyncio.Event()
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await complete.wait()  # like uvicorn, a disconnect is reported once the response is sent
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            if message.get("body"):
+                chunks.append(time.perf_counter())
+            if not message.get("more_body"):
+                complete.set()
+
+    await app(scope, receive, send)
+    return chunks
+
+
+async def run(requests: int) -> None:
+    stacks = (("no middleware", application()), ("@app.middleware", http_middleware()),
+              ("plain ASGI", asgi_middleware()), ("+ metrics", asgi_middleware(metrics=True)))
+    baseline = None
+
+    for name, app in stacks:
+        for _ in range(200):
+            await call(app, "/")
+
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            await call(app, "/")
+            samples.append(time.perf_counter() - start)
+
+        quantiles = statistics.quantiles(samples, n=100)
+        mean = statistics.fmean(samples)
+        baseline = mean if baseline is None else baseline
+        print(f"{name:<16} GET /       mean {mean * 1e6:7.1f} us  p50 {quantiles[49] * 1e6:7.1f} us  "
+              f"p99 {quantiles[98] * 1e6:7.1f} us  overhead {(mean - baseline) * 1e6:6.1f} us")
+
+    for name, app in stacks:
+        start = time.perf_counter()
+        chunks = await call(app, "/stream")
+        print(f"{name:<16} GET /stream first chunk after {(chunks[0] - start) * 1000:5.1f} ms, "
+              f"{len(chunks)} chunks in {(chunks[-1] - start) * 1000:5.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000, help="number of requests per middleware stack")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests))
+
+
+if __name__ == '__main__':
+    main()
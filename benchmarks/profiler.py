@@ -0,0 +1,114 @@
+"""
+Overhead of the continuous profiler.
+
+An endpoint doing the usual work of the api (unpickling the cached user, validating and serializing a page of
+pydantic models) is called in-process through ASGI, in rounds alternating the profiler stopped and running, so a
+drift of the machine affects both alike. The overhead is the difference of the median round times; since it is
+close to the noise of a shared machine, the time spent taking the samples is also measured, which is the cost of
+the profiler apart from the switches of the GIL. The hottest frames of the collected profile are printed at the end.
+
+Usage:
+    python -m benchmarks.profiler --requests 500 --rounds 15 --interval 0.01
+"""
+import argparse
+import asyncio
+import pickle
+import statistics
+import time
+from collections import Counter
+from datetime import datetime
+
+import benchmarks  # noqa: F401 (offline settings)
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from app.middleware import ContinuousProfilingMiddleware
+from app.services.profiler import ContinuousProfiler
+from benchmarks.middleware import call
+
+
+class Image(BaseModel):
+    id: int
+    url: str
+    description: str
+    tags: list[str]
+    created_at: datetime
+
+
+USER = pickle.dumps({"id": 1, "email": "user@example.com", "username": "user", "roles": ["user"] * 5})
+IMAGES = [{"id": i, "url": f"https://res.cloudinary.com/demo/image/upload/v1/media/{i}.jpg",
+           "description": "description " * 5, "tags": ["tag"] * 5, "created_at": datetime.now()}
+          for i in range(10)]
+
+
+def application(profiler: ContinuousProfiler) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/images", response_model=list[Image])
+    async def get_images():
+        pickle.loads(USER)
+        return IMAGES
+
+    app.add_middleware(ContinuousProfilingMiddleware, profiler=profiler)
+    return app
+
+
+async def round_time(app: FastAPI, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, "/api/images")
+    return time.perf_counter() - start
+
+
+class TimedProfiler(ContinuousProfiler):
+    sampling = 0.0
+
+    def sample(self) -> None:
+        start = time.perf_counter()
+        super().sample()
+        self.sampling += time.perf_counter() - start
+
+
+async def run(requests: int, rounds: int, interval: float) -> None:
+    profiler = TimedProfiler(interval)
+    app = application(profiler)
+    await round_time(app, requests // 10)
+
+    stopped, running = [], []
+    for _ in range(rounds):
+        stopped.append(await round_time(app, requests))
+        profiler.start()
+        running.append(await round_time(app, requests))
+        profiler.stop()
+    profiled = sum(running)
+
+    off, on = statistics.median(stopped), statistics.median(running)
+    print(f"profiler stopped  {off / requests * 1e6:8.1f} us/request")
+    print(f"profiler running  {on / requests * 1e6:8.1f} us/request  (interval {interval * 1000:g} ms, "
+          f"{profiler.samples} samples, {profiler.idle} idle)")
+    print(f"overhead          {(on - off) / off:8.2%}")
+    print(f"sampling          {profiler.sampling / profiler.samples * 1e6:8.1f} us/sample, "
+          f"{profiler.sampling / profiled:.2%} of the time")
+
+    leaves = Counter()
+    for line in profiler.folded().splitlines():
+        stack, _, count = line.rpartition(" ")
+        leaves[stack.rpartition(";")[2]] += int(count)
+    total = sum(leaves.values())
+    print("hottest frames")
+    for label, count in leaves.most_common(8):
+        print(f"  {count / total:6.1%}  {label}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="number of requests per round")
+    parser.add_argument("--rounds", type=int, default=15, help="number of rounds with and without the profiler")
+    parser.add_argument("--interval", type=float, default=0.01, help="sampling interval in seconds")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.requests, args.rounds, args.interval))
+
+
+if __name__ == '__main__':
+    main()
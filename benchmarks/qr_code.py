@@ -0,0 +1,51 @@
+"""
+Latency of QR code requests with a cold and a warm cache.
+
+Cold requests render every QR code (a distinct url each time), warm requests are served from the in-process LRU.
+PNG and SVG output are measured separately.
+
+Usage:
+    python -m benchmarks.qr_code --requests 500
+"""
+import argparse
+import asyncio
+import time
+
+import benchmarks  # noqa: F401 (offline settings)
+
+from app.services import qr_code
+from app.services.qr_code import QRCodeCache, QRCodeFormat, render_qr_code
+
+
+URL = "https://res.cloudinary.com/bench/image/upload/c_fill,h_250,w_250/media/{}"
+
+
+async def run(requests: int, image_format: QRCodeFormat, cached: bool) -> float:
+    qr_code.qr_cache = QRCodeCache(max_size=256 * 1024 ** 2)
+    urls = [URL.format(0 if cached else i) for i in range(requests)]
+
+    if cached:
+        await render_qr_code(urls[0], 1, 10, 5, True, image_format)
+
+    start = time.perf_counter()
+    for url in urls:
+        await render_qr_code(url, 1, 10, 5, True, image_format)
+
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500, help="number of sequential requests")
+    args = parser.parse_args()
+
+    for image_format in QRCodeFormat:
+        for cached in (False, True):
+            elapsed = asyncio.run(run(args.requests, image_format, cached))
+            name = f"{image_format.value} {'cached' if cached else 'cold'}"
+            print(f"{name:<12} {args.requests} requests in {elapsed:7.3f}s  "
+                  f"{elapsed / args.requests * 1e6:10.1f} us/request")
+
+
+if __name__ == '__main__':
+    main()
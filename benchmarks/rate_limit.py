@@ -0,0 +1,127 @@
+"""
+Latency and accuracy of the rate limits, fastapi-limiter versus the local token buckets synchronized to Redis.
+
+Latency: sequential checks of one key, every fastapi-limiter check is an EVALSHA round trip to the Redis stand-in.
+Accuracy: several workers (each with its own buckets and Redis connection) share a limit and send requests above it
+for a few windows; the admitted requests are compared with the limit. The same is repeated with Redis stopped.
+
+Usage:
+    python -m benchmarks.rate_limit --checks 5000 --latency 0.0005 --workers 4
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import benchmarks  # noqa: F401 (offline settings)
+import redis.asyncio as redis
+from fastapi_limiter import FastAPILimiter
+from fastapi_limiter.depends import RateLimiter as FastAPIRateLimiter
+from redis.exceptions import RedisError
+
+from benchmarks import standins
+from app.services.rate_limit import RateLimits
+
+
+def client(port: int) -> redis.Redis:
+    return redis.Redis(port=port, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+
+def percentiles(samples: list[float]) -> str:
+    quantiles = statistics.quantiles(samples, n=100)
+    return f"p50 {quantiles[49] * 1e6:8.1f} us  p99 {quantiles[98] * 1e6:8.1f} us"
+
+
+async def latency(port: int, checks: int) -> None:
+    await FastAPILimiter.init(client(port))
+    limiter = FastAPIRateLimiter(times=10 ** 9, seconds=60)
+    rate_limits = RateLimits()
+    rate_limits.start(client(port))
+
+    for name, check in (("fastapi-limiter", lambda: limiter._check("latency:fastapi")),
+                        ("token buckets", lambda: rate_limits.hit("latency:local", 10 ** 9, 60))):
+        samples = []
+        for _ in range(checks):
+            start = time.perf_counter()
+            await check()
+            samples.append(time.perf_counter() - start)
+        print(f"{name:<16} {percentiles(samples)}")
+
+    await rate_limits.stop()
+    await FastAPILimiter.close()
+
+
+async def offer(check, rate: float, duration: float) -> tuple[int, int]:
+    admitted = errors = 0
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        try:
+            admitted += await check()
+        except (RedisError, OSError, asyncio.TimeoutError):
+            errors += 1
+        await asyncio.sleep(1 / rate)
+    return admitted, errors
+
+
+async def accuracy(port: int, workers: int, times: int, window: float, windows: int, key: str) -> None:
+    duration, rate = window * windows, 5 * times / window / workers
+    expected = times * windows
+
+    try:
+        await FastAPILimiter.init(client(port))
+    except (RedisError, OSError):
+        pass  # every check fails, like a request to a worker started while redis is down
+    limiter = FastAPIRateLimiter(times=times, milliseconds=int(window * 1000))
+
+    async def fastapi_check() -> bool:
+        return await limiter._check(f"{key}:fastapi") == 0
+
+    instances = [RateLimits(sync_interval=0.5) for _ in range(workers)]
+    for instance in instances:
+        instance.start(client(port))
+
+    def local_check(instance: RateLimits):
+        async def check() -> bool:
+            return await instance.hit(f"{key}:local", times, window) == 0
+        return check
+
+    for name, checks in (("fastapi-limiter", [fastapi_check] * workers),
+                         ("token buckets", [local_check(instance) for instance in instances])):
+        results = await asyncio.gather(*(offer(check, rate, duration) for check in checks))
+        admitted, errors = sum(result[0] for result in results), sum(result[1] for result in results)
+        print(f"{name:<16} admitted {admitted:5} of {expected} allowed ({admitted / expected:6.1%}), "
+              f"{errors} errors")
+
+    for instance in instances:
+        await instance.stop()
+    await FastAPILimiter.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=5000, help="number of sequential checks")
+    parser.add_argument("--latency", type=float, default=0.0005, help="round trip of the redis stand-in")
+    parser.add_argument("--workers", type=int, default=4, help="number of workers sharing a limit")
+    parser.add_argument("--times", type=int, default=100, help="number of requests allowed in a window")
+    parser.add_argument("--window", type=float, default=2, help="length of the window in seconds")
+    parser.add_argument("--windows", type=int, default=3, help="number of windows of the accuracy run")
+    args = parser.parse_args()
+
+    port = standins.free_port()
+    process = standins.start("benchmarks.standins.redis", port, "--latency", str(args.latency))
+
+    try:
+        print(f"latency, {args.checks} checks")
+        asyncio.run(latency(port, args.checks))
+        print(f"accuracy, {args.workers} workers offering 5x {args.times} requests per {args.window}s")
+        asyncio.run(accuracy(port, args.workers, args.times, args.window, args.windows, "up"))
+    finally:
+        process.terminate()
+        process.wait()
+
+    print("accuracy with redis stopped")
+    asyncio.run(accuracy(port, args.workers, args.times, args.window, args.windows, "down"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Local stand-ins for the external services (Cloudinary, SMTP) that can be started in a separate process.
+"""
+import socket
+import subprocess
+import sys
+import time
+
+
+def free_port() -> int:
+    """
+    The free_port function asks the operating system for a free tcp port on localhost.
+
+    :return: A port number
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start(module: str, port: int, *args: str, timeout: float = 10) -> subprocess.Popen:
+    """
+    The start function runs a stand-in module in a subprocess and waits until it accepts connections.
+
+    :param module: str: Specify the module of the stand-in, e.g. benchmarks.standins.cloudinary
+    :param port: int: Specify the port the stand-in listens on
+    :param args: str: Pass additional command line arguments to the stand-in
+    :param timeout: float: Set how long to wait for the stand-in to start
+    :return: The process of the stand-in
+    """
+    process = subprocess.Popen([sys.executable, "-m", module, "--port", str(port), *args])
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return process
+        except OSError:
+            time.sleep(0.05)
+
+    process.kill()
+    raise RuntimeError(f"Stand-in {module} did not start on port {port}")
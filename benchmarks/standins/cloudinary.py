@@ -0,0 +1,111 @@
+"""
+Stand-in for the Cloudinary upload and admin APIs.
+
+Implements the endpoints used by ``app.services.cloudinary``: signed upload, destroy, bulk delete of resources and
+ping.
+Signatures are verified with the SDK, so a request accepted here is accepted by Cloudinary as well.
+
+Usage:
+    python -m benchmarks.standins.cloudinary --port 8100 --latency 0.05
+"""
+import argparse
+import asyncio
+import time
+
+import uvicorn
+from cloudinary.utils import api_sign_request
+from fastapi import FastAPI, Request, HTTPException, status
+from starlette.datastructures import UploadFile
+
+
+def create_app(api_key: str, api_secret: str, latency: float = 0.0) -> FastAPI:
+    """
+    The create_app function builds the stand-in application.
+
+    :param api_key: str: Specify the api key accepted by the stand-in
+    :param api_secret: str: Specify the api secret used to verify signatures
+    :param latency: float: Set an artificial delay of every response in seconds
+    :return: The fastapi application object
+    """
+    app = FastAPI(title="Cloudinary stand-in")
+    app.state.latency = latency
+    app.state.resources = {}
+
+    async def signed_params(request: Request) -> dict:
+        form = await request.form()
+        params = {key: value for key, value in form.items() if not isinstance(value, UploadFile)}
+
+        if params.pop("api_key", None) != api_key:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid api key")
+
+        signature = params.pop("signature", None)
+        if signature != api_sign_request(params, api_secret):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+
+        await asyncio.sleep(app.state.latency)
+
+        return {**params, "file": form.get("file")}
+
+    @app.post("/v1_1/{cloud_name}/image/upload")
+    async def upload(cloud_name: str, request: Request) -> dict:
+        params = await signed_params(request)
+        if params["file"] is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing required parameter - file")
+
+        data = await params["file"].read()
+        public_id = "/".join(filter(None, (params.get("folder"), params.get("public_id"))))
+        version = int(time.time())
+        app.state.resources[public_id] = len(data)
+
+        url = f"http://res.cloudinary.com/{cloud_name}/image/upload/v{version}/{public_id}"
+        return {
+            "public_id": public_id,
+            "version": version,
+            "signature": api_sign_request({"public_id": public_id, "version": version}, api_secret),
+            "bytes": len(data),
+            "resource_type": "image",
+            "url": url,
+            "secure_url": url.replace("http://", "https://", 1),
+        }
+
+    @app.post("/v1_1/{cloud_name}/image/destroy")
+    async def destroy(cloud_name: str, request: Request) -> dict:
+        params = await signed_params(request)
+        removed = app.state.resources.pop(params.get("public_id"), None)
+
+        return {"result": "ok" if removed is not None else "not found"}
+
+    @app.delete("/v1_1/{cloud_name}/resources/image/upload")
+    async def delete_resources(cloud_name: str, request: Request) -> dict:
+        await asyncio.sleep(app.state.latency)
+        public_ids = request.query_params.getlist("public_ids[]")
+
+        return {
+            "deleted": {
+                public_id: "deleted" if app.state.resources.pop(public_id, None) is not None else "not_found"
+                for public_id in public_ids
+            }
+        }
+
+    @app.get("/v1_1/{cloud_name}/ping")
+    async def ping(cloud_name: str) -> dict:
+        await asyncio.sleep(app.state.latency)
+
+        return {"status": "ok"}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--api-key", default="123456789")
+    parser.add_argument("--api-secret", default="bench_secret")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.api_key, args.api_secret, args.latency), port=args.port, log_level="warning")
+
+
+if __name__ == '__main__':
+    main()
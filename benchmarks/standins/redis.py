@@ -0,0 +1,250 @@
+"""
+Stand-in for a Redis server.
+
+Speaks RESP2 and keeps the keys in memory, with the commands used by the application and its dependencies:
+PING, AUTH, SELECT, CLIENT, GET, SET (EX/PX/NX), INCR, INCRBY, HSET, HDEL, HINCRBY, HGETALL, DEL, EXISTS,
+EXPIRE, PEXPIRE, TTL, PTTL, SCRIPT LOAD and EVALSHA. Lua is not interpreted: EVALSHA runs Python implementations of the known scripts
+(the one of fastapi-limiter). A latency is added once per batch of commands read, like a network round trip,
+so a pipeline pays it once.
+
+Usage:
+    python -m benchmarks.standins.redis --port 6390 --latency 0.0005
+"""
+import argparse
+import asyncio
+import hashlib
+import time
+from typing import Callable, Optional, Union
+
+Reply = Union[None, int, bytes, str, list, Exception]
+
+
+def limiter_script(server: "RedisStandIn", keys: list[bytes], args: list[bytes]) -> int:
+    key, limit, expire = keys[0], int(args[0]), int(args[1])
+    current = int(server.get(key) or 0)
+    if current > 0:
+        if current + 1 > limit:
+            return server.pttl(key)
+        server.set(key, str(current + 1).encode(), keep_ttl=True)
+        return 0
+    server.set(key, b"1", px=expire)
+    return 0
+
+
+def known_scripts() -> dict[str, Callable]:
+    from fastapi_limiter import FastAPILimiter
+
+    return {hashlib.sha1(FastAPILimiter.lua_script.encode()).hexdigest(): limiter_script}
+
+
+class RedisStandIn:
+    """
+    In-memory Redis server counting the connections and the commands.
+    """
+
+    def __init__(self, password: Optional[str] = None, latency: float = 0.0) -> None:
+        """
+        The __init__ function configures the server.
+
+        :param self: Represent the instance of the object itself
+        :param password: Optional[str]: Set the password, any client is accepted if None
+        :param latency: float: Set the delay before the replies of a batch of commands, in seconds
+        :return: Nothing
+        """
+        self.password = password
+        self.latency = latency
+        self.connections = 0
+        self.commands = 0
+        self.data: dict[bytes, Union[bytes, dict[bytes, bytes]]] = {}
+        self.expires: dict[bytes, float] = {}
+        self.scripts = known_scripts()
+
+    def alive(self, key: bytes) -> bool:
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        return self.data.get(key) if self.alive(key) else None
+
+    def set(self, key: bytes, value: bytes, px: Optional[int] = None, keep_ttl: bool = False) -> None:
+        self.data[key] = value
+        if px is not None:
+            self.expires[key] = time.monotonic() + px / 1000
+        elif not keep_ttl:
+            self.expires.pop(key, None)
+
+    def pttl(self, key: bytes) -> int:
+        if not self.alive(key):
+            return -2
+        expires = self.expires.get(key)
+        return -1 if expires is None else max(0, round((expires - time.monotonic()) * 1000))
+
+    def incrby(self, key: bytes, amount: int) -> Reply:
+        try:
+            value = int(self.get(key) or 0) + amount
+        except ValueError:
+            return ValueError("ERR value is not an integer or out of range")
+        self.set(key, str(value).encode(), keep_ttl=True)
+        return value
+
+    def expire(self, key: bytes, milliseconds: int) -> int:
+        if not self.alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + milliseconds / 1000
+        return 1
+
+    def execute(self, command: list[bytes]) -> Reply:
+        name, args = command[0].decode().upper(), command[1:]
+        self.commands += 1
+
+        if name == "PING":
+            return "PONG"
+        if name in ("SELECT", "CLIENT"):
+            return "OK"
+        if name == "AUTH":
+            return "OK" if self.password is None or args[-1].decode() == self.password else \
+                ValueError("WRONGPASS invalid username-password pair")
+        if name == "GET":
+            return self.get(args[0])
+        if name == "SET":
+            options = [arg.decode().upper() for arg in args[2:]]
+            if "NX" in options and self.alive(args[0]):
+                return None
+            px = None
+            for option, value in zip(options, args[3:]):
+                if option == "PX":
+                    px = int(value)
+                elif option == "EX":
+                    px = int(value) * 1000
+            self.set(args[0], args[1], px=px)
+            return "OK"
+        if name == "INCR":
+            return self.incrby(args[0], 1)
+        if name == "INCRBY":
+            return self.incrby(args[0], int(args[1]))
+        if name == "HINCRBY":
+            fields = self.get(args[0]) or {}
+            fields[args[1]] = str(int(fields.get(args[1], 0)) + int(args[2])).encode()
+            self.set(args[0], fields, keep_ttl=True)
+            return int(fields[args[1]])
+        if name == "HSET":
+            fields = self.get(args[0]) or {}
+            added = sum(field not in fields for field in args[1::2])
+            fields.update(zip(args[1::2], args[2::2]))
+            self.set(args[0], fields, keep_ttl=True)
+            return added
+        if name == "HDEL":
+            fields = self.get(args[0]) or {}
+            return sum(fields.pop(field, None) is not None for field in args[1:])
+        if name == "HGETALL":
+            return [item for field in (self.get(args[0]) or {}).items() for item in field]
+        if name == "DEL":
+            removed = [key for key in args if self.alive(key)]
+            for key in removed:
+                del self.data[key]
+                self.expires.pop(key, None)
+            return len(removed)
+        if name == "EXISTS":
+            return sum(self.alive(key) for key in args)
+        if name == "EXPIRE":
+            return self.expire(args[0], int(args[1]) * 1000)
+        if name == "PEXPIRE":
+            return self.expire(args[0], int(args[1]))
+        if name == "PTTL":
+            return self.pttl(args[0])
+        if name == "TTL":
+            ttl = self.pttl(args[0])
+            return ttl if ttl < 0 else ttl // 1000
+        if name == "SCRIPT" and args[0].upper() == b"LOAD":
+            sha = hashlib.sha1(args[1]).hexdigest()
+            if sha not in self.scripts:
+                return ValueError("ERR the stand-in can not run this script")
+            return sha.encode()
+        if name == "EVALSHA":
+            script = self.scripts.get(args[0].decode())
+            if script is None:
+                return ValueError("NOSCRIPT No matching script")
+            count = int(args[1])
+            return script(self, args[2:2 + count], args[2 + count:])
+
+        return ValueError(f"ERR unknown command '{name}'")
+
+    @staticmethod
+    def encode(reply: Reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return f"-{reply}\r\n".encode()
+        if isinstance(reply, str):
+            return f"+{reply}\r\n".encode()
+        if isinstance(reply, int):
+            return f":{reply}\r\n".encode()
+        if isinstance(reply, bytes):
+            return b"$%d\r\n%s\r\n" % (len(reply), reply)
+        return b"*%d\r\n" % len(reply) + b"".join(RedisStandIn.encode(item) for item in reply)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def read_command() -> list[bytes]:
+            header = await reader.readuntil(b"\r\n")
+            if not header.startswith(b"*"):
+                return header.split()
+            command = []
+            for _ in range(int(header[1:-2])):
+                length = int((await reader.readuntil(b"\r\n"))[1:-2])
+                command.append((await reader.readexactly(length + 2))[:-2])
+            return command
+
+        try:
+            while True:
+                replies = [self.execute(await read_command())]
+                while reader._buffer:  # noqa: the rest of a pipeline is answered with the same round trip
+                    replies.append(self.execute(await read_command()))
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                writer.write(b"".join(self.encode(reply) for reply in replies))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.Server:
+        """
+        The start function starts listening on the running event loop.
+
+        :param self: Represent the instance of the object itself
+        :param host: str: Specify the host to listen on
+        :param port: int: Specify the port to listen on, a free one if 0
+        :return: The server
+        """
+        return await asyncio.start_server(self.handle, host, port)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = await RedisStandIn(args.password, args.latency).start(port=args.port)
+
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency", type=float, default=0.0, help="delay of every round trip")
+    parser.add_argument("--password", default=None)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
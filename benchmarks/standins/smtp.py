@@ -0,0 +1,199 @@
+"""
+Stand-in for an SMTP server.
+
+Speaks the subset of ESMTP used by ``aiosmtplib``: EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP and QUIT.
+With ``--tls`` it listens with implicit TLS (like port 465) using a generated self-signed certificate, so the cost
+of the handshake is real. Recipients containing "reject" are refused with a permanent 550 reply.
+
+Usage:
+    python -m benchmarks.standins.smtp --port 8025 --tls --latency 0.005 --connect-latency 0.05
+"""
+import argparse
+import asyncio
+import base64
+import datetime
+import ssl
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+
+def self_signed_context() -> ssl.SSLContext:
+    """
+    The self_signed_context function creates a server TLS context with a new self-signed certificate for localhost.
+
+    :return: The ssl context
+    """
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.utcnow()
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(days=1))
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_file, key_file = Path(directory) / "cert.pem", Path(directory) / "key.pem"
+        cert_file.write_bytes(certificate.public_bytes(serialization.Encoding.PEM))
+        key_file.write_bytes(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        context.load_cert_chain(cert_file, key_file)
+
+    return context
+
+
+class SMTPStandIn:
+    """
+    In-memory SMTP server counting the connections, logins and accepted messages.
+    """
+
+    def __init__(self, username: Optional[str] = None, password: Optional[str] = None, latency: float = 0.0,
+                 connect_latency: float = 0.0, keep_messages: bool = False) -> None:
+        """
+        The __init__ function configures the server.
+
+        :param self: Represent the instance of the object itself
+        :param username: Optional[str]: Set the accepted username, any credentials are accepted if None
+        :param password: Optional[str]: Set the accepted password
+        :param latency: float: Set the delay before a message is accepted, in seconds
+        :param connect_latency: float: Set the delay before the greeting of a new connection, in seconds
+        :param keep_messages: bool: Keep the received messages in the messages list
+        :return: Nothing
+        """
+        self.username = username
+        self.password = password
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.keep_messages = keep_messages
+        self.connections = 0
+        self.logins = 0
+        self.received = 0
+        self.messages: list[bytes] = []
+
+    def authenticate(self, username: str, password: str) -> bool:
+        return self.username is None or (username, password) == (self.username, self.password)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(*lines: str) -> None:
+            writer.write("".join(
+                f"{line[:3]}{'-' if i < len(lines) - 1 else ' '}{line[4:]}\r\n" for i, line in enumerate(lines)
+            ).encode())
+            await writer.drain()
+
+        async def read_line() -> str:
+            return (await reader.readline()).decode(errors="replace").rstrip("\r\n")
+
+        try:
+            await asyncio.sleep(self.connect_latency)
+            await reply("220 standin ESMTP")
+
+            while line := await read_line():
+                command, _, argument = line.partition(" ")
+                command = command.upper()
+
+                if command in ("EHLO", "HELO"):
+                    await reply("250 standin", "250 AUTH PLAIN LOGIN", "250 8BITMIME")
+                elif command == "AUTH":
+                    mechanism, _, initial = argument.partition(" ")
+                    if mechanism.upper() == "PLAIN":
+                        if not initial:
+                            await reply("334 ")
+                            initial = await read_line()
+                        _, username, password = base64.b64decode(initial).decode().split("\0")
+                    else:
+                        await reply("334 VXNlcm5hbWU6")
+                        username = base64.b64decode(await read_line()).decode()
+                        await reply("334 UGFzc3dvcmQ6")
+                        password = base64.b64decode(await read_line()).decode()
+
+                    if self.authenticate(username, password):
+                        self.logins += 1
+                        await reply("235 2.7.0 Authentication successful")
+                    else:
+                        await reply("535 5.7.8 Authentication credentials invalid")
+                elif command == "MAIL":
+                    await reply("250 2.1.0 Ok")
+                elif command == "RCPT":
+                    if "reject" in argument:
+                        await reply("550 5.1.1 User unknown")
+                    else:
+                        await reply("250 2.1.5 Ok")
+                elif command == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while (chunk := await reader.readline()) not in (b".\r\n", b""):
+                        data.append(chunk)
+
+                    await asyncio.sleep(self.latency)
+                    self.received += 1
+                    if self.keep_messages:
+                        self.messages.append(b"".join(data))
+                    await reply("250 2.0.0 Ok: queued")
+                elif command in ("RSET", "NOOP"):
+                    await reply("250 2.0.0 Ok")
+                elif command == "QUIT":
+                    await reply("221 2.0.0 Bye")
+                    break
+                else:
+                    await reply("502 5.5.2 Command not recognized")
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0,
+                    ssl_context: Optional[ssl.SSLContext] = None) -> asyncio.Server:
+        """
+        The start function starts listening on the running event loop.
+
+        :param self: Represent the instance of the object itself
+        :param host: str: Specify the host to listen on
+        :param port: int: Specify the port to listen on, a free one if 0
+        :param ssl_context: Optional[ssl.SSLContext]: Pass a tls context to listen with implicit tls
+        :return: The server
+        """
+        return await asyncio.start_server(self.handle, host, port, ssl=ssl_context)
+
+
+async def serve(args: argparse.Namespace) -> None:
+    standin = SMTPStandIn(args.username, args.password, args.latency, args.connect_latency)
+    server = await standin.start(port=args.port, ssl_context=self_signed_context() if args.tls else None)
+
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--tls", action="store_true", help="listen with implicit tls")
+    parser.add_argument("--latency", type=float, default=0.0, help="delay before a message is accepted")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="delay before the greeting")
+    parser.add_argument("--username", default=None)
+    parser.add_argument("--password", default=None)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
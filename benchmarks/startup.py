@@ -0,0 +1,93 @@
+"""
+Cold start of a worker: importing the application and building it with the app factory.
+
+Every run imports ``main`` in a fresh interpreter with ``python -X importtime`` and reports the total import time and
+the wall time of the process, then the modules imported directly by ``main`` that cost the most in the fastest run.
+In-process, ``get_application`` is called repeatedly, and the first request through the middlewares, which FastAPI
+builds lazily, is timed on a fresh application.
+
+Usage:
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import benchmarks  # noqa: F401 (offline settings)
+
+ROOT = Path(__file__).parent.parent
+
+
+def import_times(output: str) -> dict[str, tuple[int, int]]:
+    """
+    Parses the output of -X importtime: the self and cumulative microseconds of the modules imported by ``main``
+    itself, and of ``main`` as a whole.
+    """
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        own, cumulative, name = line[12:].split("|")
+        if name.strip() == "main" or name.startswith("   ") and not name.startswith("     "):
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def cold_imports(runs: int, top: int) -> None:
+    totals, walls, fastest = [], [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        walls.append(time.perf_counter() - start)
+        times = import_times(result.stderr)
+        totals.append(times["main"][1] / 1e6)
+        if fastest is None or totals[-1] == min(totals):
+            fastest = times
+
+    print(f"import main     min {min(totals) * 1000:7.1f} ms  median {statistics.median(totals) * 1000:7.1f} ms  "
+          f"process wall time median {statistics.median(walls) * 1000:7.1f} ms  ({runs} runs)")
+    for name, (own, cumulative) in sorted(fastest.items(), key=lambda item: -item[1][1])[1:top + 1]:
+        print(f"  {name:<36} {cumulative / 1000:7.1f} ms  (self {own / 1000:6.1f} ms)")
+
+
+async def first_request(app) -> float:
+    from benchmarks.middleware import call
+
+    start = time.perf_counter()
+    await call(app, "/livez")
+    return time.perf_counter() - start
+
+
+def factory(runs: int) -> None:
+    start = time.perf_counter()
+    import main
+    print(f"import main in process          {(time.perf_counter() - start) * 1000:7.1f} ms")
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        app = main.get_application()
+        samples.append(time.perf_counter() - start)
+    print(f"get_application min {min(samples) * 1000:7.1f} ms  median {statistics.median(samples) * 1000:7.1f} ms  "
+          f"({len(app.routes)} routes)")
+
+    print(f"first request of a fresh app    {asyncio.run(first_request(main.get_application())) * 1000:7.1f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="number of cold imports and of factory calls")
+    parser.add_argument("--top", type=int, default=12, help="number of costliest imports listed")
+    args = parser.parse_args()
+
+    cold_imports(args.runs, args.top)
+    factory(args.runs)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from ipaddress import ip_address
+from typing import TYPE_CHECKING, Literal, Optional
 
 from pydantic import BaseSettings, EmailStr
-from fastapi.templating import Jinja2Templates
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
 
 
 PROJECT_NAME = "WEB-Project Team 3"
@@ -23,11 +27,42 @@ ORIGINS = [
 @dataclass(frozen=True)
 class Template:
     emails: Path = BASE_DIR / 'app' / 'templates' / 'emails'
-    html_response: Jinja2Templates = Jinja2Templates(directory=BASE_DIR / 'app' / 'templates' / 'response')
+    responses: Path = BASE_DIR / 'app' / 'templates' / 'response'
+
+
+@lru_cache
+def get_html_templates() -> "Jinja2Templates":
+    """
+    The get_html_templates function returns the templates of the html responses, created on first use.
+
+    :return: The templates
+    """
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(directory=Template.responses)
 
 
 class Settings(BaseSettings):
     db_url: str = "{DB_TYPE}+{DB_CONNECTOR}://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_repeated_statements: int = 5
+    slow_query_threshold: Optional[float] = 0.2
+    slow_query_log_size: int = 100
+    slow_query_explain: bool = True
+
+    debug: bool = False
+
+    deadline_default: Optional[float] = 10
+    deadline_images: Optional[float] = 15
+    deadline_image_formats: Optional[float] = 30
+
+    admission_enabled: bool = True
+    admission_latency_targets: dict[str, float] = {"auth": 1.0, "reads": 0.5, "uploads": 5.0, "qr": 1.0, "writes": 1.0}
+    admission_initial_limit: int = 20
+    admission_max_limit: int = 200
+    admission_queue_timeout: float = 0.5
+    admission_retry_after: int = 1
 
     secret_key_jwt: str = "secret_key_jwt"
     algorithm: str = "HS256"
@@ -38,15 +73,65 @@ class Settings(BaseSettings):
     mail_port: int
     mail_server: str
     mail_from_name: str
+    mail_validate_certs: bool = True
+    mail_pool_size: int = 4
+    mail_batch_size: int = 50
+    mail_max_attempts: int = 8
+    mail_retry_base: float = 5
+    mail_retry_max: float = 3600
+    mail_lease: int = 300
+    mail_poll_interval: float = 5
+    mail_outbox_worker: bool = True
+    mail_template_cache_dir: Optional[Path] = None
 
     redis_host: str
     redis_port: int
     redis_password: str
 
+    rate_limit_sync_interval: float = 0.5
+    rate_limit_timeout: float = 0.2
+
+    blocklist_file: Optional[Path] = None
+    blocklist_redis_key: Optional[str] = None
+    blocklist_channel: str = "blocklist:reload"
+
     cloudinary_name: str
     cloudinary_api_key: int
     cloudinary_api_secret: str
     cloudinary_folder: str = "media"
+    cloudinary_api_url: str = "https://api.cloudinary.com"
+    cloudinary_pool_size: int = 100
+    cloudinary_timeout: float = 60
+    cloudinary_upload_ttl: int = 600
+
+    storage_backend: Literal["cloudinary", "local"] = "cloudinary"
+    storage_local_root: Path = BASE_DIR / "media"
+    storage_local_url: str = f"{API_PREFIX}/media"
+    storage_local_cache_size: int = 1024 ** 3
+    storage_local_workers: Optional[int] = None
+    storage_local_max_dimension: int = 4096
+
+    qr_cache_size: int = 64 * 1024 ** 2
+    qr_cache_ttl: int = 7 * 24 * 3600
+    qr_cache_redis_timeout: float = 0.5
+    qr_workers: Optional[int] = None
+
+    profile_interval: float = 0.001
+    profile_ttl: int = 3600
+    profiler_enabled: bool = True
+    profiler_interval: float = 0.01
+
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None
+    server_graceful_timeout: float = 30
+    server_keep_alive: int = 5
+
+    health_interval: float = 5
+    health_timeout: float = 2
+    health_executor_backlog: int = 4
+
+    metrics_interval: float = 5
 
     class Config:
         env_file = BASE_DIR / '.env'
@@ -1,79 +1,154 @@
-from ipaddress import ip_address
-from typing import Callable
+from contextlib import asynccontextmanager
 
-import uvicorn
-import redis.asyncio as redis
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi_limiter import FastAPILimiter
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
-from app.database.connect import get_db
-from app.routes import router
+from app.database.connect import async_engine, get_db
+from app.database.models import UserRole
+from app.middleware import (
+    AdmissionMiddleware, ContinuousProfilingMiddleware, IPFilterMiddleware, MetricsMiddleware, ProfilingMiddleware,
+    RequestIdMiddleware, StatementsMiddleware, TimingMiddleware, log_config,
+)
+from app.routes import router, health as health_routes, metrics
+from app.services import email, health, qr_code
+from app.services.admission import admission
+from app.services.auth import AuthService
+from app.services.blocklist import blocklist
+from app.services.metrics import InstrumentedRedis, sampler
+from app.services.profiler import continuous_profiler, profiles
+from app.services.rate_limit import rate_limits
+from app.services.slow_queries import slow_queries
+from app.services.storage import get_storage
+from app.utils.filters import UserRoleFilter
 from config import (
     settings,
     PROJECT_NAME,
     VERSION,
     API_PREFIX,
-    BANNED_IPS,
     ORIGINS,
 )
 
 
-def get_application():
+async def startup():
     """
-    The get_application function is a factory function that returns an instance of the FastAPI application.
-    It also adds CORS middleware to the application, which allows it to accept requests from other origins.
+    The startup function is called by the lifespan of the application before it serves requests.
+    It's a good place to initialize things that are used by the app, like databases or caches.
 
-    :return: The fastapi application object
+    :return: A coroutine, so we need to call it with await
     """
-    app = FastAPI(title=PROJECT_NAME, version=VERSION)
-
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=ORIGINS,
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
+    rate_limits.start(
+        InstrumentedRedis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password, db=0,
+                          socket_timeout=settings.rate_limit_timeout,
+                          socket_connect_timeout=settings.rate_limit_timeout,
+                          metric_client="rate_limit")
     )
 
-    return app
+    await blocklist.start(
+        InstrumentedRedis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password, db=0,
+                          metric_client="blocklist")
+        if blocklist.reloadable else None
+    )
 
+    email.templates.compile()
+    slow_queries.install(async_engine)
+    health.start()
+    sampler.start(settings.metrics_interval)
+    if settings.profiler_enabled:
+        continuous_profiler.start()
+    if settings.mail_outbox_worker:
+        email.outbox.start()
 
-app = get_application()
 
+async def shutdown():
+    """
+    The shutdown function is called by the lifespan of the application when it shuts down.
+    It reports the worker not ready and stops the health checks and the sampling of the metrics, then stops the
+    continuous profiler, the email outbox worker, the synchronization of the rate limits and the reloads of the
+    blocklist, and releases the connections and workers of the image storage, of the profiles and of the qr code
+    rendering, stops the slow query log, and releases the redis pool of the authentication and the database pool.
 
-@app.middleware("http")
-async def ban_ips(request: Request, call_next: Callable):
+    :return: A coroutine, so we need to call it with await
+    """
+    await health.close()
+    await sampler.stop()
+    continuous_profiler.stop()
+    await email.outbox.stop()
+    await rate_limits.stop()
+    await blocklist.stop()
+    await get_storage().close()
+    await profiles.close()
+    await qr_code.close()
+    await slow_queries.close()
+    AuthService.redis.connection_pool.disconnect()
+    await async_engine.dispose()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     """
-    The ban_ips function is a middleware function that checks if the client's IP address is in the BANNED_IPS list.
-    If it is, then we return a JSONResponse with status code 403 and an error message. If not, then we call next() to
-    continue processing the request.
+    The lifespan function starts the background workers and connections of the application before it serves
+    requests and releases them when it shuts down. Nothing is started on import, so importing the application
+    (e.g. in the tests or to build the openapi schema) needs neither Redis nor the mail server.
 
-    :param request: Request: Access the request object
-    :param call_next: Callable: Pass the next function in the middleware chain
-    :return: The response from the next function in the pipeline
+    :param app: FastAPI: Pass the application
+    :return: An async context manager running the application
     """
-    # if ip_address(request.client.host) in BANNED_IPS:
-    #     return JSONResponse(status_code=status.HTTP_403_FORBIDDEN, content={"detail": "You are banned"})
-    response = await call_next(request)
-    return response
+    await startup()
+    try:
+        yield
+    finally:
+        await shutdown()
 
 
-@app.on_event("startup")
-async def startup():
+def get_application():
     """
-    The startup function is called when the application starts up.
-    It's a good place to initialize things that are used by the app, like databases or caches.
+    The get_application function is a factory function that returns an instance of the FastAPI application with
+    the routes of the api, of the metrics and of the health probes.
+    It also adds CORS middleware to the application, which allows it to accept requests from other origins,
+    the profiling of the requests of admins sending the X-Profile header and the routes of the continuous profiler,
+    the admission control shedding the requests of overloaded route classes, the filter rejecting the clients of the
+    blocklist, the counting of the sql statements of the requests (returned in the headers in debug mode), the
+    Server-Timing header, the request ids and the request metrics.
+    The middlewares are plain ASGI: unlike @app.middleware("http") they do not run the endpoint in a separate task
+    or pass the response body through a stream, and the last one added is the outermost.
 
-    :return: A coroutine, so we need to call it with await
+    :return: The fastapi application object
     """
-    await FastAPILimiter.init(
-        await redis.Redis(host=settings.redis_host, port=settings.redis_port, password=settings.redis_password,
-                          db=0, encoding="utf-8", decode_responses=True)
+    app = FastAPI(title=PROJECT_NAME, version=VERSION, lifespan=lifespan)
+
+    app.add_middleware(
+        ProfilingMiddleware,
+        authorize=UserRoleFilter(UserRole.admin).allows,
+        store=profiles,
+        interval=settings.profile_interval,
     )
+    app.add_middleware(ContinuousProfilingMiddleware, profiler=continuous_profiler)
+    # Inside CORS, so browsers can read the 503 of a rejected request
+    if settings.admission_enabled:
+        app.add_middleware(AdmissionMiddleware, admission=admission, retry_after=settings.admission_retry_after)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(IPFilterMiddleware, blocklist=blocklist)
+    app.add_middleware(StatementsMiddleware, debug=settings.debug, repeated=settings.db_repeated_statements)
+    app.add_middleware(TimingMiddleware)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+
+    app.include_router(router, prefix=API_PREFIX)
+    app.include_router(metrics.router)
+    app.include_router(health_routes.router)
+
+    return app
+
+
+app = get_application()
 
 
 @app.get("/", name="Images app team_3_project")
@@ -112,8 +187,7 @@ async def healthchecker(db: Session = Depends(get_db)):
                             detail="Error connecting to the database")
 
 
-app.include_router(router, prefix=API_PREFIX)
-
-
 if __name__ == '__main__':
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    import uvicorn
+
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True, log_config=log_config())
@@ -0,0 +1,260 @@
+"""
+Production entry point: a pre-fork supervisor of uvicorn workers sharing one listening socket.
+
+The application is imported once in the supervisor and the workers are forked from it, so they share the memory of
+the imported code and objects. The garbage collector is disabled while importing and everything allocated so far is
+frozen before forking, which keeps the collections of the workers from writing to, and so copying, those pages.
+Importing the application opens no connection, the pools of the database and of Redis are filled in each worker.
+The workers run uvloop and httptools when they are installed, the asyncio loop and h11 otherwise.
+The logs of the server, of the access log and of the application carry the id of the request they were written in.
+The workers write their metrics to files in PROMETHEUS_MULTIPROC_DIR (a temporary directory if unset), so the metrics
+served by any worker are those of the whole server.
+
+SIGTERM or SIGINT stops the workers gracefully: they stop accepting connections, finish the requests in flight and
+run the shutdown of the application. Workers still running after the graceful timeout are killed. A worker that
+dies is replaced, while a worker failing to start stops the server.
+
+Usage:
+    python server.py --workers 4 --port 8000
+"""
+import argparse
+import gc
+import glob
+import logging
+import os
+import shutil
+import signal
+import tempfile
+import time
+from importlib import import_module
+from importlib.util import find_spec
+from typing import Callable, Optional
+
+import uvicorn
+
+from config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+WORKER_BOOT_ERROR = 3
+
+
+def worker_count(workers: Optional[int] = None) -> int:
+    """
+    The worker_count function returns the number of workers to start, the number of cpus available by default.
+
+    :param workers: Optional[int]: Specify the number of workers
+    :return: The number of workers
+    """
+    if workers:
+        return workers
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+
+
+def prepare_metrics() -> Optional[str]:
+    """
+    The prepare_metrics function sets the directory where the workers write their metrics, cleared of the files of a
+    previous run. It must run before prometheus_client is imported, which chooses the multiprocess mode on import.
+
+    :return: The temporary directory created when PROMETHEUS_MULTIPROC_DIR is unset, None otherwise
+    """
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory is None:
+        directory = os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="metrics-")
+        return directory
+
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+    return None
+
+
+def load_app(target: str):
+    """
+    The load_app function imports the application with the garbage collector disabled and freezes the objects
+    allocated so far, so the workers forked afterwards share them without copying.
+
+    :param target: str: Specify the application as module:attribute
+    :return: The application
+    """
+    module, _, attribute = target.partition(":")
+    gc.disable()
+    app = getattr(import_module(module), attribute or "app")
+    gc.freeze()
+    return app
+
+
+class Arbiter:
+    """
+    Supervisor forking the workers, replacing the ones that die and stopping them on SIGTERM or SIGINT.
+    """
+
+    def __init__(self, config: uvicorn.Config, workers: int, graceful_timeout: float = 30,
+                 on_exit: Optional[Callable[[int], None]] = None) -> None:
+        """
+        The __init__ function binds the listening socket shared by the workers.
+
+        :param self: Represent the instance of the object itself
+        :param config: uvicorn.Config: Pass the configuration of the workers, with the application loaded
+        :param workers: int: Set the number of workers
+        :param graceful_timeout: float: Set how long the workers may take to stop before they are killed in seconds
+        :param on_exit: Optional[Callable[[int], None]]: Pass the function called with the pid of an exited worker
+        :return: Nothing
+        """
+        self.config = config
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.on_exit = on_exit
+        self.socket = config.bind_socket()
+        self.children: set[int] = set()
+        self.stopping = False
+        self.exit_code = 0
+
+    def spawn(self) -> None:
+        """
+        The spawn function forks a worker.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+
+        code = 1
+        try:
+            code = self.run_worker()
+        except BaseException:  # noqa: the worker must never return into the loop of the supervisor
+            logger.exception("Worker %s crashed", os.getpid())
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def run_worker(self) -> int:
+        """
+        The run_worker function serves the application in a forked worker until it is stopped.
+
+        :param self: Represent the instance of the object itself
+        :return: The exit code of the worker
+        """
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        gc.enable()
+
+        server = uvicorn.Server(self.config)
+        server.run(sockets=[self.socket])
+        return 0 if server.started else WORKER_BOOT_ERROR
+
+    def stop(self, signum: int, frame) -> None:
+        self.stopping = True
+
+    def exited(self, pid: int) -> None:
+        self.children.discard(pid)
+        if self.on_exit is not None:
+            self.on_exit(pid)
+
+    def reap(self) -> None:
+        """
+        The reap function collects the workers that exited and replaces them, unless one failed to start.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        while self.children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                return
+            self.exited(pid)
+            code = os.waitstatus_to_exitcode(status)
+
+            if self.stopping:
+                continue
+            if code == WORKER_BOOT_ERROR:
+                logger.error("Worker %s failed to start, stopping", pid)
+                self.stopping, self.exit_code = True, WORKER_BOOT_ERROR
+            else:
+                logger.warning("Worker %s exited with %s, starting a new one", pid, code)
+                self.spawn()
+
+    def terminate(self) -> None:
+        """
+        The terminate function stops the workers gracefully and kills the ones exceeding the graceful timeout.
+
+        :param self: Represent the instance of the object itself
+        :return: Nothing
+        """
+        for pid in list(self.children):
+            os.kill(pid, signal.SIGTERM)
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+
+        for pid in list(self.children):
+            logger.warning("Worker %s did not stop in %ss, killing it", pid, self.graceful_timeout)
+            os.kill(pid, signal.SIGKILL)
+        while self.children:
+            pid, _ = os.waitpid(-1, 0)
+            self.exited(pid)
+
+    def run(self) -> int:
+        """
+        The run function starts the workers and supervises them until the server is stopped.
+
+        :param self: Represent the instance of the object itself
+        :return: The exit code of the server
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        logger.info("Starting %s workers (loop %s, http %s) on %s:%s, supervisor %s", self.workers,
+                    self.config.loop, self.config.http, self.config.host, self.config.port, os.getpid())
+
+        for _ in range(self.workers):
+            self.spawn()
+
+        while not self.stopping:
+            self.reap()
+            time.sleep(0.2)
+
+        logger.info("Stopping %s workers", len(self.children))
+        self.terminate()
+        self.socket.close()
+        return self.exit_code
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app", default="main:app", help="application to serve as module:attribute")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="the number of cpus if unset")
+    parser.add_argument("--graceful-timeout", type=float, default=settings.server_graceful_timeout)
+    args = parser.parse_args()
+
+    metrics_dir = prepare_metrics()
+    # Imported once the directory of the metrics is set
+    from app.middleware import log_config
+    from app.services import metrics
+
+    config = uvicorn.Config(
+        load_app(args.app),
+        host=args.host,
+        port=args.port,
+        loop="uvloop" if find_spec("uvloop") else "asyncio",
+        http="httptools" if find_spec("httptools") else "h11",
+        lifespan="on",
+        timeout_keep_alive=settings.server_keep_alive,
+        log_config=log_config(),
+    )
+    try:
+        code = Arbiter(config, worker_count(args.workers), args.graceful_timeout, metrics.worker_exited).run()
+    finally:
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+    raise SystemExit(code)
+
+
+if __name__ == '__main__':
+    main()
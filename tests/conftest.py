@@ -1,18 +1,20 @@
 import asyncio
+from contextlib import contextmanager
 from unittest import mock
 
 import pytest
 import pytest_asyncio
 from fastapi import status
 from fastapi.testclient import TestClient
-from fastapi_limiter.depends import RateLimiter
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from app.database.connect import get_db
 from app.database.models import Base, User
+from app.middleware import StatementsMiddleware
 from app.services.auth import AuthService
+from app.services.rate_limit import RateLimiter
 from config import settings
 from main import app
 from sqlalchemy.pool import NullPool
@@ -78,7 +80,7 @@ def user() -> dict:
 
 @pytest.fixture(scope="function")
 def mock_rate_limit(mocker):
-    mock_rate_limit = mocker.patch.object(RateLimiter, '__call__', autospec=True)
+    mock_rate_limit = mocker.patch.object(RateLimiter, 'hit', autospec=True)
     mock_rate_limit.return_value = False
 
 
@@ -88,6 +90,49 @@ async def mock_auth_redis(mocker):
     mock_redis.get.return_value = None
 
 
+@pytest.fixture(scope="function")
+def missing_id(session):
+    """
+    Returns an id that no row of a model has, for the requests of missing objects:
+
+        image_id = await missing_id(Image)
+    """
+    async def missing(model) -> int:
+        return await session.scalar(select(func.coalesce(func.max(model.id), 0) + 1))
+
+    return missing
+
+
+@pytest.fixture(scope="function")
+def statement_budget(mocker):
+    """
+    Fails the test when a request sent in the block executes more sql statements than the budget declared for it,
+    e.g. when a lazy loaded relationship turns a list into N+1 queries:
+
+        with statement_budget(3):
+            client.get("/api/images/")
+    """
+    @contextmanager
+    def budget(statements: int):
+        observe = mocker.patch.object(StatementsMiddleware, "observe", autospec=True,
+                                      side_effect=StatementsMiddleware.observe)
+        try:
+            yield
+        finally:
+            mocker.stop(observe)
+
+        assert observe.call_args_list, "no request was sent"
+        for (_, scope, stats), _ in observe.call_args_list:
+            if stats.count > statements:
+                pytest.fail(
+                    f"{scope['method']} {scope['path']} executed {stats.count} sql statements, "
+                    f"its budget is {statements}:\n"
+                    + "\n".join(f"{count} x {statement}" for statement, count in stats.statements.most_common())
+                )
+
+    return budget
+
+
 @pytest_asyncio.fixture(scope="class")
 async def access_token(client, user, session) -> dict:
     mock.patch('app.routes.auth.send_email_confirmed')
@@ -0,0 +1,340 @@
+import difflib
+import inspect
+import json
+import os
+import pkgutil
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+import app.repository
+from app.database.models import ImageRating, User, UserRole
+from app.repository import comments as repository_comments
+from app.repository import email_outbox as repository_outbox
+from app.repository import image_formats as repository_formats
+from app.repository import image_ratings as repository_ratings
+from app.repository import images as repository_images
+from app.repository import tags as repository_tags
+from app.repository import users as repository_users
+from app.schemas.tag import TagBase
+from app.schemas.user import ProfileUpdate, UserCreate
+from config import settings
+
+# Expected shape of the plans: node types, tables and indexes. Run with UPDATE_QUERY_PLANS=1 to rewrite it.
+SNAPSHOT = Path(__file__).parent / "query_plans.json"
+UPDATE = os.environ.get("UPDATE_QUERY_PLANS") == "1"
+
+# Tables seeded with enough rows that a sequential scan on them is a missing index
+LARGE_TABLES = {"users", "images", "image_m2m_tag", "image_comments", "image_ratings", "image_formats", "email_outbox"}
+MAX_COST = 2000
+
+# Sequential scans no index avoids, with the reason
+ALLOWED_SEQ_SCANS = {
+    ("images.get_images[description]", "images"): "LIKE '%...%' matches anywhere in the description",
+    ("outbox.get_outbox_stats", "email_outbox"): "counts the whole outbox",
+}
+
+SEED = """
+INSERT INTO users (username, email, password, first_name, last_name, role, email_verified, is_active, created_at)
+SELECT 'plan_' || i, 'plan_' || i || '@example.com', 'password', 'First', 'Last', 'user', i < 20000, true, now()
+FROM generate_series(1, 20000) AS i;
+
+INSERT INTO images (public_id, content_hash, description, created_at, user_id)
+SELECT 'plan/' || i, md5(i::text) || md5(i::text), 'Plan image ' || i, now(),
+       (SELECT min(id) FROM users WHERE username LIKE 'plan\\_%') + i % 20000
+FROM generate_series(1, 50000) AS i;
+
+INSERT INTO tags (name, created_at) SELECT 'plan-tag-' || i, now() FROM generate_series(1, 2000) AS i;
+
+INSERT INTO image_m2m_tag (image_id, tag_id)
+SELECT image.id, (SELECT min(id) FROM tags WHERE name LIKE 'plan-tag-%') + (image.id * k) % 2000
+FROM images AS image, generate_series(1, 2) AS k WHERE image.public_id LIKE 'plan/%';
+
+INSERT INTO image_comments (data, user_id, image_id, created_at)
+SELECT 'Plan comment', image.user_id, image.id, now()
+FROM images AS image, generate_series(1, 2) AS k WHERE image.public_id LIKE 'plan/%';
+
+INSERT INTO image_ratings (rating, user_id, image_id, created_at)
+SELECT 1 + image.id % 5, (SELECT min(id) FROM users WHERE username LIKE 'plan\\_%') + (image.id + 7 * k) % 20000,
+       image.id, now()
+FROM images AS image, generate_series(1, 2) AS k WHERE image.public_id LIKE 'plan/%';
+
+INSERT INTO image_formats (format, user_id, image_id, created_at)
+SELECT jsonb_build_object('width', 100 + k), image.user_id, image.id, now()
+FROM images AS image, generate_series(1, 2) AS k WHERE image.public_id LIKE 'plan/%';
+
+INSERT INTO email_outbox (recipient, subject, template_name, template_body, status, attempts, next_attempt_at,
+                          created_at)
+SELECT 'plan_' || i || '@example.com', 'Subject', 'confirmed_email.html', '{}',
+       CASE WHEN i % 100 = 0 THEN 'pending' ELSE 'failed' END::outbox_status, 1, now(), now()
+FROM generate_series(1, 20000) AS i;
+
+ANALYZE users, images, tags, image_m2m_tag, image_comments, image_ratings, image_formats, email_outbox;
+"""
+
+SEQUENCES = "SELECT quote_ident(schemaname) || '.' || quote_ident(sequencename), last_value FROM pg_sequences"
+
+IDS = """
+SELECT (SELECT max(id) FROM users WHERE username LIKE 'plan\\_%') AS user,
+       (SELECT max(id) FROM images WHERE public_id LIKE 'plan/%') AS image,
+       (SELECT max(id) FROM tags WHERE name LIKE 'plan-tag-%') AS tag,
+       (SELECT max(id) FROM image_comments) AS comment,
+       (SELECT max(id) FROM image_ratings) AS rating,
+       (SELECT max(id) FROM image_formats) AS format,
+       (SELECT max(id) FROM email_outbox) AS email
+"""
+
+
+async def update_token(ids: dict, db: AsyncSession) -> None:
+    user = await repository_users.get_user_by_id(ids["user"], db)
+    await repository_users.update_token(user, "token", db)
+
+
+async def confirmed_email(ids: dict, db: AsyncSession) -> None:
+    user = await repository_users.get_user_by_id(ids["user"], db)
+    await repository_users.confirmed_email(user, db)
+
+
+async def update_is_active(ids: dict, db: AsyncSession) -> User:
+    user = await repository_users.get_user_by_id(ids["user"], db)
+    return await repository_users.user_update_is_active(user, False, db)
+
+
+async def delete_image(ids: dict, db: AsyncSession) -> int:
+    image = await repository_images.get_image_by_id(ids["image"], db)
+    return await repository_images.delete_image(image, db)
+
+
+async def remove_rating(ids: dict, db: AsyncSession) -> None:
+    rating = await repository_ratings.get_rating_by_id(ids["rating"], db)
+    await repository_ratings.remove_rating(rating, db)
+
+
+async def remove_image_format(ids: dict, db: AsyncSession) -> None:
+    image_format = await repository_formats.get_image_format_by_id(ids["format"], db)
+    await repository_formats.remove_image_format(image_format, db)
+
+
+async def update_rating(ids: dict, db: AsyncSession) -> ImageRating:
+    rating = await repository_ratings.get_rating_by_id(ids["rating"], db)
+    return await repository_ratings.update_rating(rating, rating.rating % 5 + 1, db)
+
+
+async def update_role(ids: dict, db: AsyncSession) -> User:
+    user = await repository_users.get_user_by_id(ids["user"], db)
+    return await repository_users.user_update_role(user, UserRole.moderator, db)
+
+
+# The repository modules by the prefix of their functions in QUERIES
+MODULES = {
+    "users": repository_users,
+    "images": repository_images,
+    "tags": repository_tags,
+    "comments": repository_comments,
+    "ratings": repository_ratings,
+    "formats": repository_formats,
+    "outbox": repository_outbox,
+}
+
+# The calls of the repository functions, every statement they execute is explained.
+# A function called in several ways has a key per call, suffixed with the variant in brackets.
+QUERIES = {
+    "users.create_user": lambda ids, db: repository_users.create_user(UserCreate(
+        username="plan_new", email="plan_new@example.com", first_name="First", last_name="Last", password="password"
+    ), db),
+    "users.get_user_by_email": lambda ids, db: repository_users.get_user_by_email("plan_7@example.com", db),
+    "users.get_user_by_email_or_username": lambda ids, db: repository_users.get_user_by_email_or_username(
+        "plan_7@example.com", "plan_8", db),
+    "users.get_user_by_username": lambda ids, db: repository_users.get_user_by_username("plan_7", db),
+    "users.get_user_by_id": lambda ids, db: repository_users.get_user_by_id(ids["user"], db),
+    "users.update_token": update_token,
+    "users.update_avatar": lambda ids, db: repository_users.update_avatar(ids["user"], "https://avatar", db),
+    "users.update_password": lambda ids, db: repository_users.update_password(ids["user"], "password", db),
+    "users.update_email": lambda ids, db: repository_users.update_email(ids["user"], "plan_new@example.com", db),
+    "users.confirmed_email": confirmed_email,
+    "users.update_user_profile": lambda ids, db: repository_users.update_user_profile(
+        ids["user"], ProfileUpdate(first_name="Renamed"), db),
+    "users.user_update_role": update_role,
+    "users.user_update_is_active": update_is_active,
+    "users.get_user_profile_by_username": lambda ids, db: repository_users.get_user_profile_by_username("plan_7", db),
+    "images.get_image_by_id": lambda ids, db: repository_images.get_image_by_id(ids["image"], db),
+    "images.get_image_by_public_id": lambda ids, db: repository_images.get_image_by_public_id("plan/7", db),
+    "images.get_image_by_content_hash": lambda ids, db: repository_images.get_image_by_content_hash("0" * 64, db),
+    "images.lock_content_hash": lambda ids, db: repository_images.lock_content_hash("0" * 64, db),
+    "images.count_images_by_public_id": lambda ids, db: repository_images.count_images_by_public_id("plan/7", db),
+    "images.create_image": lambda ids, db: repository_images.create_image(
+        ids["user"], "Plan image", ["plan-tag-7", "plan-new-tag"], "plan/new", "0" * 64, db),
+    "images.update_description": lambda ids, db: repository_images.update_description(
+        ids["image"], "Updated", ["plan-tag-7", "plan-new-tag"], db),
+    "images.delete_image": delete_image,
+    "images.get_images": lambda ids, db: repository_images.get_images(0, 20, None, None, None, None, db),
+    "images.get_images[user_id]": lambda ids, db: repository_images.get_images(
+        0, 20, None, None, None, ids["user"], db),
+    "images.get_images[image_id]": lambda ids, db: repository_images.get_images(
+        0, 20, None, None, ids["image"], None, db),
+    "images.get_images[description]": lambda ids, db: repository_images.get_images(
+        0, 20, "image 7", None, None, None, db),
+    "images.get_images[tags]": lambda ids, db: repository_images.get_images(
+        0, 20, None, ["plan-tag-7"], None, None, db),
+    "tags.get_tags": lambda ids, db: repository_tags.get_tags(0, 20, db),
+    "tags.get_tags_by_list_values": lambda ids, db: repository_tags.get_tags_by_list_values(
+        ["plan-tag-7", "plan-tag-8"], db),
+    "tags.get_tag_by_id": lambda ids, db: repository_tags.get_tag_by_id(ids["tag"], db),
+    "tags.get_or_create_tags": lambda ids, db: repository_tags.get_or_create_tags(
+        ["plan-tag-7", "plan-new-tag"], db),
+    "tags.update_tag": lambda ids, db: repository_tags.update_tag(ids["tag"], TagBase(name="plan-renamed"), db),
+    "tags.remove_tag": lambda ids, db: repository_tags.remove_tag(ids["tag"], db),
+    "comments.create_comment": lambda ids, db: repository_comments.create_comment(
+        ids["user"], ids["image"], "Plan comment", db),
+    "comments.get_comments_by_image_or_user_id[image_id]":
+        lambda ids, db: repository_comments.get_comments_by_image_or_user_id(None, ids["image"], 0, 20, db),
+    "comments.get_comments_by_image_or_user_id[user_id]":
+        lambda ids, db: repository_comments.get_comments_by_image_or_user_id(ids["user"], None, 0, 20, db),
+    "comments.get_comment_by_id": lambda ids, db: repository_comments.get_comment_by_id(ids["comment"], db),
+    "comments.update_comment": lambda ids, db: repository_comments.update_comment(ids["comment"], "Updated", db),
+    "comments.remove_comment": lambda ids, db: repository_comments.remove_comment(ids["comment"], db),
+    "ratings.create_rating": lambda ids, db: repository_ratings.create_rating(ids["user"], 5, ids["image"], db),
+    "ratings.get_all_image_ratings": lambda ids, db: repository_ratings.get_all_image_ratings(ids["image"], db),
+    "ratings.get_rating_by_id": lambda ids, db: repository_ratings.get_rating_by_id(ids["rating"], db),
+    "ratings.update_rating": update_rating,
+    "ratings.get_rating_by_image_id_and_user": lambda ids, db: repository_ratings.get_rating_by_image_id_and_user(
+        ids["user"], ids["image"], db),
+    "ratings.remove_rating": remove_rating,
+    "formats.create_image_format": lambda ids, db: repository_formats.create_image_format(
+        ids["user"], ids["image"], {"width": 50}, db),
+    "formats.get_image_formats_by_image_id": lambda ids, db: repository_formats.get_image_formats_by_image_id(
+        ids["user"], ids["image"], db),
+    "formats.get_image_format_by_id": lambda ids, db: repository_formats.get_image_format_by_id(ids["format"], db),
+    "formats.remove_image_format": remove_image_format,
+    "outbox.add_email": lambda ids, db: repository_outbox.add_email(
+        "plan_new@example.com", "Subject", "confirmed_email.html", {}, db),
+    "outbox.claim_emails": lambda ids, db: repository_outbox.claim_emails(10, 300, db),
+    "outbox.retry_email": lambda ids, db: repository_outbox.retry_email(ids["email"], 5, "error", db),
+    "outbox.fail_email": lambda ids, db: repository_outbox.fail_email(ids["email"], "error", db),
+    "outbox.delete_emails": lambda ids, db: repository_outbox.delete_emails([ids["email"]], db),
+    "outbox.get_outbox_stats": lambda ids, db: repository_outbox.get_outbox_stats(db),
+}
+
+
+def plan_shape(node: dict, depth: int = 0) -> list[str]:
+    line = node["Node Type"]
+    if "Relation Name" in node:
+        line += f" on {node['Relation Name']}"
+    if "Index Name" in node:
+        line += f" using {node['Index Name']}"
+
+    lines = ["  " * depth + line]
+    for child in node.get("Plans", []):
+        lines += plan_shape(child, depth + 1)
+    return lines
+
+
+def seq_scans(node: dict, limited: bool = False) -> set[str]:
+    """
+    Tables scanned sequentially in a plan, except unfiltered scans right under a Limit, which read the first rows.
+    """
+    tables = set()
+    if node["Node Type"] == "Seq Scan" and not (limited and "Filter" not in node):
+        tables.add(node["Relation Name"])
+
+    children = node.get("Plans", [])
+    for child in children:
+        tables |= seq_scans(child, node["Node Type"] == "Limit" or limited and len(children) == 1)
+    return tables
+
+
+@pytest_asyncio.fixture(scope="module")
+async def plans() -> dict[str, list[dict]]:
+    """
+    Seeds the database in a transaction that is rolled back, runs every query of QUERIES in a savepoint and
+    explains the statements it executed.
+    """
+    engine = create_async_engine(settings.db_url, poolclass=NullPool)
+    statements, explained = [], {}
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    async with engine.connect() as connection:
+        # Sequences are not transactional, their values are put back after the rollback for the other tests
+        sequences = (await connection.execute(text(SEQUENCES))).all()
+        await connection.commit()
+        transaction = await connection.begin()
+        try:
+            for statement in SEED.split(";\n\n"):
+                await connection.exec_driver_sql(statement)
+            ids = (await connection.execute(text(IDS))).mappings().one()
+
+            for name, query in QUERIES.items():
+                event.listen(connection.sync_connection, "before_cursor_execute", record)
+                async with AsyncSession(bind=connection, join_transaction_mode="create_savepoint") as db:
+                    await query(ids, db)
+                event.remove(connection.sync_connection, "before_cursor_execute", record)
+
+                explained[name] = []
+                for statement, parameters in statements:
+                    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+                    plan = result.scalar()
+                    explained[name].append((json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"])
+                statements.clear()
+        finally:
+            await transaction.rollback()
+            for sequence, last_value in sequences:
+                await connection.execute(
+                    text("SELECT setval(:sequence, :value, :is_called)"),
+                    {"sequence": sequence, "value": last_value or 1, "is_called": last_value is not None},
+                )
+            await connection.commit()
+    await engine.dispose()
+
+    yield explained
+
+    if UPDATE:
+        SNAPSHOT.write_text(json.dumps(
+            {name: [plan_shape(plan) for plan in explained[name]] for name in sorted(explained)}, indent=2
+        ) + "\n")
+
+
+def test_every_repository_function_is_explained():
+    modules = {module.__name__ for module in MODULES.values()}
+    assert modules == {f"{app.repository.__name__}.{module.name}" for module in pkgutil.iter_modules(
+        app.repository.__path__)}
+
+    functions = {f"{prefix}.{name}" for prefix, module in MODULES.items()
+                 for name, function in inspect.getmembers(module, inspect.iscoroutinefunction)
+                 if function.__module__ == module.__name__}
+    assert functions == {name.split("[")[0] for name in QUERIES}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", QUERIES)
+class TestQueryPlans:
+    async def test_no_sequential_scan_on_large_tables(self, name, plans):
+        assert plans[name], f"{name} executed no query"
+        for plan in plans[name]:
+            for table in seq_scans(plan) & LARGE_TABLES:
+                assert (name, table) in ALLOWED_SEQ_SCANS, \
+                    f"{name} scans {table} sequentially:\n" + "\n".join(plan_shape(plan))
+
+    async def test_estimated_cost_is_bounded(self, name, plans):
+        for plan in plans[name]:
+            assert plan["Total Cost"] <= MAX_COST, \
+                f"{name} costs {plan['Total Cost']}:\n" + "\n".join(plan_shape(plan))
+
+    async def test_plan_is_unchanged(self, name, plans):
+        if UPDATE:
+            pytest.skip("updating the snapshot")
+        expected = json.loads(SNAPSHOT.read_text()).get(name) if SNAPSHOT.exists() else None
+        assert expected is not None, f"no plan recorded for {name}, run with UPDATE_QUERY_PLANS=1"
+
+        actual = [plan_shape(plan) for plan in plans[name]]
+        if actual != expected:
+            diff = difflib.unified_diff([line for plan in expected for line in plan + [""]],
+                                        [line for plan in actual for line in plan + [""]],
+                                        "recorded", "current", lineterm="")
+            pytest.fail(f"The plan of {name} changed:\n" + "\n".join(diff))
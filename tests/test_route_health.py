@@ -0,0 +1,27 @@
+from app.services.health import CheckResult, health_checks
+
+
+def test_livez(client):
+    response = client.get("/livez")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+def test_readyz_not_checked(client):
+    response = client.get("/readyz")
+
+    assert response.status_code == 503
+    assert response.json()["checks"]["postgres"]["detail"] == "not checked yet"
+
+
+def test_readyz(client, mocker):
+    results = {name: CheckResult(True, "ok", 0.001, 0) for name in health_checks.checks}
+    mocker.patch.object(health_checks, "results", results)
+    mocker.patch("app.services.health.time.monotonic", return_value=1)
+
+    response = client.get("/readyz")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+    assert response.json()["checks"]["db_pool"]["ok"]
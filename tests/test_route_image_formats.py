@@ -0,0 +1,169 @@
+import io
+import zipfile
+
+import pytest_asyncio
+from fastapi import status
+from pytest import fixture, mark
+from sqlalchemy import select
+
+from app.database.models import Image, ImageFormat, User
+from app.services.qr_code import QRCodeCache
+
+
+@fixture(scope="function")
+def mock_qr_cache(mocker):
+    return mocker.patch("app.services.qr_code.qr_cache", QRCodeCache(max_size=1024 ** 2))
+
+
+@mark.asyncio
+class TestQrCode:
+    url_path = "api/images/formats/qr-code"
+
+    @pytest_asyncio.fixture(scope="class")
+    async def image_format_id(self, access_token, user, session) -> int:
+        current_user = await session.scalar(select(User).filter(User.email == user['email']))
+
+        image = Image(user_id=current_user.id, description="Image with qr code", public_id="media/qr_code")
+        session.add(image)
+        await session.flush()
+
+        image_format = ImageFormat(
+            user_id=current_user.id, image_id=image.id,
+            format={"width": 250, "height": 250, "crop": "fill", "gravity": None}
+        )
+        session.add(image_format)
+        await session.flush()
+        image_format_id = image_format.id
+        await session.commit()
+
+        yield image_format_id
+
+        await session.delete(image)
+        await session.commit()
+
+    @mark.usefixtures('mock_qr_cache')
+    async def test_png(self, client, access_token, image_format_id):
+        response = client.get(
+            f"{self.url_path}/{image_format_id}", headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "image/png"
+        assert response.headers["etag"].startswith('"')
+        assert "max-age" in response.headers["cache-control"]
+        assert response.content.startswith(b"\x89PNG")
+
+    @mark.usefixtures('mock_qr_cache')
+    async def test_svg(self, client, access_token, image_format_id):
+        response = client.get(
+            f"{self.url_path}/{image_format_id}", params={"format": "svg"},
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "image/svg+xml"
+        assert b"<svg" in response.content
+
+    async def test_not_modified(self, client, access_token, image_format_id, mock_qr_cache, mocker):
+        headers = {"Authorization": f"Bearer {access_token}"}
+        etag = client.get(f"{self.url_path}/{image_format_id}", headers=headers).headers["etag"]
+        mock_render_qr_code = mocker.patch("app.routes.image_formats.render_qr_code")
+
+        response = client.get(f"{self.url_path}/{image_format_id}", headers={**headers, "If-None-Match": etag})
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        assert response.content == b""
+        assert len(mock_qr_cache.entries) == 1
+        mock_render_qr_code.assert_not_called()
+
+    @mark.usefixtures('mock_qr_cache')
+    async def test_etag_depends_on_parameters(self, client, access_token, image_format_id):
+        headers = {"Authorization": f"Bearer {access_token}"}
+
+        first = client.get(f"{self.url_path}/{image_format_id}", headers=headers)
+        second = client.get(f"{self.url_path}/{image_format_id}", params={"box_size": 5}, headers=headers)
+
+        assert first.headers["etag"] != second.headers["etag"]
+
+    async def test_not_found(self, client, access_token, missing_id):
+        image_format_id = await missing_id(ImageFormat)
+
+        response = client.get(f"{self.url_path}/{image_format_id}", headers={"Authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@mark.asyncio
+class TestQrCodesZip:
+    @pytest_asyncio.fixture(scope="class")
+    async def image(self, access_token, user, session) -> dict:
+        current_user = await session.scalar(select(User).filter(User.email == user['email']))
+
+        image = Image(user_id=current_user.id, description="Image with qr codes", public_id="media/qr_codes")
+        session.add(image)
+        await session.flush()
+
+        image_formats = [
+            ImageFormat(user_id=current_user.id, image_id=image.id, format={"width": width, "crop": "scale"})
+            for width in (100, 200, 300)
+        ]
+        session.add_all(image_formats)
+        await session.flush()
+        result = {"id": image.id, "format_ids": [image_format.id for image_format in image_formats]}
+        await session.commit()
+
+        yield result
+
+        await session.delete(image)
+        await session.commit()
+
+    @mark.usefixtures('mock_qr_cache')
+    async def test_all_formats(self, client, access_token, image):
+        response = client.get(
+            f"api/images/formats/{image['id']}/qr-codes.zip", headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"] == "application/zip"
+        assert "attachment" in response.headers["content-disposition"]
+
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            assert archive.testzip() is None
+            assert sorted(archive.namelist()) == sorted(f"{format_id}.png" for format_id in image['format_ids'])
+            assert all(archive.read(name).startswith(b"\x89PNG") for name in archive.namelist())
+
+    @mark.usefixtures('mock_qr_cache')
+    async def test_selected_formats_svg(self, client, access_token, image):
+        format_id = image['format_ids'][0]
+        response = client.get(
+            f"api/images/formats/{image['id']}/qr-codes.zip", params={"format_ids": [format_id], "format": "svg"},
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            assert archive.namelist() == [f"{format_id}.svg"]
+            assert archive.getinfo(f"{format_id}.svg").compress_type == zipfile.ZIP_DEFLATED
+            assert b"<svg" in archive.read(f"{format_id}.svg")
+
+    async def test_unknown_formats(self, client, access_token, image, missing_id):
+        format_id = await missing_id(ImageFormat)
+
+        response = client.get(
+            f"api/images/formats/{image['id']}/qr-codes.zip", params={"format_ids": [format_id]},
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    async def test_not_found_image(self, client, access_token, missing_id):
+        image_id = await missing_id(Image)
+
+        response = client.get(
+            f"api/images/formats/{image_id}/qr-codes.zip", headers={"Authorization": f"Bearer {access_token}"}
+        )
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()["detail"] == "Not found image"
@@ -0,0 +1,15 @@
+def test_metrics(client):
+    client.get("/")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_request_duration_seconds_count{method="GET",route="/",status="200"}' in response.text
+    assert "# TYPE http_requests_in_progress gauge" in response.text
+
+
+def test_unmatched_route(client):
+    client.get("/does-not-exist")
+    response = client.get("/metrics")
+
+    assert 'http_request_duration_seconds_count{method="GET",route="<unmatched>",status="404"} ' in response.text
@@ -0,0 +1,72 @@
+from fastapi import status
+from pytest import mark
+from sqlalchemy import delete, select
+
+from app.database.models import EmailOutbox, User
+from app.repository import email_outbox as repository_outbox
+
+
+@mark.asyncio
+class TestOutbox:
+    @mark.usefixtures('mock_rate_limit')
+    async def test_reset_password_is_queued(self, client, access_token, user, session, mocker):
+        mock_notify = mocker.patch("app.services.email.outbox.notify")
+        await session.execute(delete(EmailOutbox))
+        await session.commit()
+
+        response = client.post("api/auth/reset_password", json={"email": user['email']})
+
+        emails = (await session.scalars(select(EmailOutbox))).all()
+
+        assert response.status_code == status.HTTP_200_OK
+        assert [email.recipient for email in emails] == [user['email']]
+        assert emails[0].template_name == "reset_password.html"
+        assert emails[0].template_body["full_name"] == user['username']
+        mock_notify.assert_called_once()
+
+    async def test_stats(self, client, access_token):
+        response = client.get("api/outbox/stats", headers={"Authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["pending"] == 1
+        assert response.json()["due"] == 1
+        assert response.json()["worker"]["sent"] == 0
+
+    async def test_claim_leases_emails(self, session):
+        claimed = await repository_outbox.claim_emails(10, 300, session)
+
+        assert len(claimed) == 1
+        assert claimed[0].attempts == 1
+        assert await repository_outbox.claim_emails(10, 300, session) == []
+
+        await repository_outbox.retry_email(claimed[0].id, -1, "error", session)
+        assert [email.id for email in await repository_outbox.claim_emails(10, 300, session)] == [claimed[0].id]
+
+        await repository_outbox.fail_email(claimed[0].id, "error", session)
+        stats = await repository_outbox.get_outbox_stats(session)
+
+        assert (stats["pending"], stats["failed"]) == (0, 1)
+
+    async def test_stats_forbidden(self, client):
+        response = client.get("api/outbox/stats")
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    async def test_signup_queues_confirmation_with_the_user(self, client, session, mocker):
+        mock_notify = mocker.patch("app.services.email.outbox.notify")
+        user = {"email": "outbox@test.com", "username": "outbox_user", "password": "test_pwd",
+                "first_name": "Outbox", "last_name": "User"}
+
+        response = client.post("api/auth/signup", json=user)
+        conflict = client.post("api/auth/signup", json=user)
+
+        emails = (await session.scalars(select(EmailOutbox).filter(EmailOutbox.recipient == user['email']))).all()
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert conflict.status_code == status.HTTP_409_CONFLICT
+        assert [email.template_name for email in emails] == ["confirmed_email.html"]
+        assert emails[0].template_body["username"] == user['username']
+        mock_notify.assert_called_once()
+
+        await session.execute(delete(User).where(User.email == user['email']))
+        await session.commit()
@@ -0,0 +1,55 @@
+from unittest.mock import AsyncMock
+
+from fastapi import status
+from pytest import mark
+
+from app.services.profiler import profiles
+
+
+@mark.asyncio
+class TestProfiles:
+    async def test_profile_request(self, client, access_token, mocker):
+        redis = mocker.patch.object(profiles, "redis", AsyncMock())
+
+        response = client.get("api/users/me/", headers={"Authorization": f"Bearer {access_token}", "X-Profile": "1"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "profile;dur=" in response.headers["Server-Timing"]
+        profile_id = response.headers["X-Profile-Id"]
+        redis.set.assert_awaited_once()
+        assert redis.set.await_args.args[0] == f"profile:{profile_id}"
+
+    async def test_profile_requires_admin(self, client, mocker):
+        redis = mocker.patch.object(profiles, "redis", AsyncMock())
+
+        response = client.get("/", headers={"X-Profile": "1"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert "X-Profile-Id" not in response.headers
+        redis.set.assert_not_awaited()
+
+    async def test_download(self, client, access_token, mocker):
+        redis = mocker.patch.object(profiles, "redis", AsyncMock())
+        redis.get.return_value = b"main:app 500\n"
+
+        response = client.get(f"api/profiles/{'a' * 32}", headers={"Authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.text == "main:app 500\n"
+        redis.get.assert_awaited_once_with(f"profile:{'a' * 32}")
+
+    async def test_download_not_found(self, client, access_token, mocker):
+        mocker.patch.object(profiles, "redis", AsyncMock(get=AsyncMock(return_value=None)))
+
+        response = client.get(f"api/profiles/{'a' * 32}", headers={"Authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.json()["detail"] == "Profile not found"
+
+    async def test_continuous_profile(self, client, access_token):
+        response = client.get("api/profiles/continuous", params={"route": "/api/users/me/"},
+                              headers={"Authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert int(response.headers["X-Profile-Samples"]) >= 0
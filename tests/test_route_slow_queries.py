@@ -0,0 +1,46 @@
+import json
+from unittest.mock import AsyncMock
+
+from fastapi import status
+from pytest import fixture, mark
+
+from app.services.slow_queries import SlowQuery, slow_queries
+
+
+@fixture
+def redis(mocker):
+    return mocker.patch.object(slow_queries, "redis", AsyncMock())
+
+
+@fixture
+def slow_query(redis):
+    entry = SlowQuery(0.5, "SELECT images.id FROM images WHERE images.user_id = $1", [1], "/api/images/")
+    entry.plan = "Seq Scan on images"
+    redis.lrange.return_value = [json.dumps(entry.as_dict()).encode()]
+    return entry
+
+
+@mark.asyncio
+class TestSlowQueries:
+    url_path = "api/slow-queries/"
+
+    async def test_list(self, client, access_token, slow_query):
+        response = client.get(self.url_path, headers={"Authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()[0]["statement"] == slow_query.statement
+        assert response.json()[0]["parameters"] == [1]
+        assert response.json()[0]["route"] == "/api/images/"
+        assert response.json()[0]["plan"] == "Seq Scan on images"
+        assert response.json()[0]["error"] is None
+
+    async def test_clear(self, client, access_token, redis):
+        response = client.delete(self.url_path, headers={"Authorization": f"Bearer {access_token}"})
+
+        assert response.status_code == status.HTTP_204_NO_CONTENT
+        redis.delete.assert_awaited_once_with("slow_queries")
+
+    async def test_forbidden(self, client):
+        response = client.get(self.url_path)
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
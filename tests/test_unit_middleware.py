@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import unittest
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from uvicorn.logging import DefaultFormatter
+
+from app.middleware import (
+    AdmissionMiddleware, RequestIdFilter, RequestIdMiddleware, StatementsMiddleware, TimingMiddleware, log_config,
+    request_id,
+)
+from app.services.admission import AdmissionControl
+
+engine = create_engine("sqlite://")
+
+
+async def endpoint(request: Request):
+    return JSONResponse({"state": request.state.request_id, "context": request_id.get()})
+
+
+async def stream(request: Request):
+    async def chunks():
+        yield b"first"
+        yield b"second"
+    return StreamingResponse(chunks())
+
+
+async def queries(n: int):
+    with engine.connect() as connection:
+        for number in range(n):
+            connection.execute(text("SELECT :number"), {"number": number})
+    return {}
+
+
+def client() -> TestClient:
+    app = Starlette(routes=[Route("/", endpoint), Route("/stream", stream)])
+    app.add_middleware(TimingMiddleware)
+    app.add_middleware(RequestIdMiddleware)
+    return TestClient(app)
+
+
+class TestRequestIdMiddleware(unittest.TestCase):
+    def test_generates_request_id(self):
+        response = client().get("/")
+
+        request_id_header = response.headers["X-Request-ID"]
+        self.assertEqual(len(request_id_header), 32)
+        self.assertEqual(response.json(), {"state": request_id_header, "context": request_id_header})
+
+    def test_keeps_client_request_id(self):
+        response = client().get("/", headers={"X-Request-ID": "abc-123"})
+
+        self.assertEqual(response.headers["X-Request-ID"], "abc-123")
+        self.assertEqual(response.json()["context"], "abc-123")
+
+    def test_replaces_invalid_request_id(self):
+        response = client().get("/", headers={"X-Request-ID": "<script>" * 40})
+
+        self.assertEqual(len(response.headers["X-Request-ID"]), 32)
+
+    def test_logging_filter(self):
+        record = logging.LogRecord("test", logging.INFO, __file__, 1, "message", None, None)
+        token = request_id.set("abc-123")
+        try:
+            RequestIdFilter().filter(record)
+        finally:
+            request_id.reset(token)
+
+        self.assertEqual(record.request_id, "abc-123")
+
+    def test_log_config(self):
+        config = log_config()
+        formatter = DefaultFormatter(config["formatters"]["default"]["fmt"], use_colors=False)
+        record = logging.LogRecord("app", logging.WARNING, __file__, 1, "message", None, None)
+        token = request_id.set("abc-123")
+        try:
+            RequestIdFilter().filter(record)
+        finally:
+            request_id.reset(token)
+
+        self.assertEqual(formatter.format(record), "WARNING:  [abc-123] message")
+        self.assertEqual([handler["filters"] for handler in config["handlers"].values()], [["request_id"]] * 2)
+        self.assertIn("[%(request_id)s]", config["formatters"]["access"]["fmt"])
+        self.assertEqual(config["root"]["handlers"], ["default"])
+
+
+class TestTimingMiddleware(unittest.TestCase):
+    def test_server_timing(self):
+        response = client().get("/")
+
+        self.assertRegex(response.headers["Server-Timing"], r"^app;dur=\d+\.\d$")
+
+    def test_streaming_response(self):
+        response = client().get("/stream")
+
+        self.assertEqual(response.content, b"firstsecond")
+        self.assertIn("Server-Timing", response.headers)
+        self.assertIn("X-Request-ID", response.headers)
+
+
+class TestAdmissionMiddleware(unittest.TestCase):
+    def test_latency_until_the_response_starts(self):
+        async def slow_stream(request: Request):
+            async def chunks():
+                yield b"first"
+                await asyncio.sleep(0.2)
+                yield b"second"
+            return StreamingResponse(chunks())
+
+        admission = AdmissionControl({"reads": 0.1})
+        app = Starlette(routes=[Route("/api/images/", slow_stream)])
+        app.add_middleware(AdmissionMiddleware, admission=admission)
+        limit = admission.limits["reads"]
+
+        with patch.object(limit, "release", wraps=limit.release) as release:
+            response = TestClient(app).get("/api/images/")
+
+        self.assertEqual(response.content, b"firstsecond")
+        [(latency,), kwargs] = release.call_args
+        self.assertLess(latency, 0.1)
+        self.assertEqual(kwargs, {"dropped": False})
+        self.assertEqual(limit.in_flight, 0)
+
+
+def statements_client(debug: bool) -> TestClient:
+    app = FastAPI()
+    app.get("/queries")(queries)
+    app.add_middleware(StatementsMiddleware, debug=debug, repeated=3)
+    return TestClient(app)
+
+
+class TestStatementsMiddleware(unittest.TestCase):
+    def test_headers_in_debug(self):
+        response = statements_client(debug=True).get("/queries", params={"n": 2})
+
+        self.assertEqual(response.headers["X-DB-Statements"], "2")
+        self.assertRegex(response.headers["Server-Timing"], r"^db;dur=\d+\.\d$")
+
+    def test_no_headers_in_production(self):
+        response = statements_client(debug=False).get("/queries", params={"n": 2})
+
+        self.assertNotIn("X-DB-Statements", response.headers)
+        self.assertNotIn("Server-Timing", response.headers)
+
+    def test_metrics(self):
+        labels = {"method": "GET", "route": "/queries"}
+        requests = REGISTRY.get_sample_value("db_statements_per_request_count", labels) or 0
+        statements = REGISTRY.get_sample_value("db_statements_per_request_sum", labels) or 0
+
+        statements_client(debug=False).get("/queries", params={"n": 2})
+
+        self.assertEqual(REGISTRY.get_sample_value("db_statements_per_request_count", labels), requests + 1)
+        self.assertEqual(REGISTRY.get_sample_value("db_statements_per_request_sum", labels), statements + 2)
+
+    def test_repeated_statements(self):
+        def repeated():
+            labels = {"method": "GET", "route": "/queries"}
+            return REGISTRY.get_sample_value("db_repeated_statements_total", labels) or 0
+
+        count = repeated()
+
+        with self.assertLogs("app.middleware.statements", logging.WARNING) as logs:
+            statements_client(debug=False).get("/queries", params={"n": 3})
+
+        self.assertEqual(repeated(), count + 1)
+        self.assertIn("GET /queries executed 3 times the statement: SELECT ?", logs.output[0])
+
+        statements_client(debug=False).get("/queries", params={"n": 2})
+        self.assertEqual(repeated(), count + 1)
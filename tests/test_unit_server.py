@@ -0,0 +1,98 @@
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+import unittest
+import urllib.request
+from pathlib import Path
+
+from server import worker_count
+
+ROOT = Path(__file__).parent.parent
+
+
+def children(pid: int) -> set[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as file:
+        return {int(child) for child in file.read().split()}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestWorkerCount(unittest.TestCase):
+    def test_worker_count(self):
+        self.assertEqual(worker_count(3), 3)
+        self.assertGreaterEqual(worker_count(None), 1)
+
+
+@unittest.skipUnless(os.path.exists(f"/proc/{os.getpid()}/task/{os.getpid()}/children"), "needs the Linux procfs")
+class TestServer(unittest.TestCase):
+    def wait_for(self, condition, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                if condition():
+                    return
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.fail("Condition not met in time")
+
+    def test_workers_are_replaced_and_stopped_gracefully(self):
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "server.py", "--workers", "2", "--host", "127.0.0.1", "--port", str(port),
+             "--graceful-timeout", "20"],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            livez = f"http://127.0.0.1:{port}/livez"
+            self.wait_for(lambda: urllib.request.urlopen(livez, timeout=2).status == 200)
+            workers = children(process.pid)
+            self.assertEqual(len(workers), 2)
+
+            killed = workers.pop()
+            os.kill(killed, signal.SIGKILL)
+            self.wait_for(lambda: len(children(process.pid) - {killed}) == 2)
+
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(process.wait(timeout=30), 0)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+    def test_metrics_are_aggregated_across_workers(self):
+        port = free_port()
+        process = subprocess.Popen(
+            [sys.executable, "server.py", "--workers", "2", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            base = f"http://127.0.0.1:{port}"
+            self.wait_for(lambda: urllib.request.urlopen(f"{base}/livez", timeout=2).status == 200)
+            for _ in range(20):
+                urllib.request.urlopen(f"{base}/livez", timeout=2).read()
+
+            pattern = re.compile(r'^http_request_duration_seconds_count\{.*route="/livez".*\} (\S+)$', re.MULTILINE)
+            scrapes = set()
+            for _ in range(10):
+                body = urllib.request.urlopen(f"{base}/metrics", timeout=2).read().decode()
+                scrapes.add(sum(float(count) for count in pattern.findall(body)))
+
+            # Every worker serving a scrape reports the requests of both
+            self.assertEqual(len(scrapes), 1)
+            self.assertGreaterEqual(scrapes.pop(), 20)
+
+            process.send_signal(signal.SIGTERM)
+            self.assertEqual(process.wait(timeout=30), 0)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
@@ -0,0 +1,104 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from app.services.admission import AdaptiveLimit, AdmissionControl, Rejected
+
+
+class TestAdaptiveLimit(unittest.IsolatedAsyncioTestCase):
+    async def test_admits_up_to_the_limit(self):
+        limit = AdaptiveLimit("test", target=1, initial=2, queue_timeout=0.01)
+        await limit.acquire()
+        await limit.acquire()
+
+        with self.assertRaises(Rejected):
+            await limit.acquire()
+        self.assertEqual(limit.in_flight, 2)
+        self.assertEqual(len(limit.waiters), 0)
+
+    async def test_queued_request_gets_the_released_slot(self):
+        limit = AdaptiveLimit("test", target=1, initial=2, queue_timeout=1)
+        await limit.acquire()
+        await limit.acquire()
+
+        waiting = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(len(limit.waiters), 1)
+
+        limit.release(0.01, dropped=False)
+        await waiting
+        self.assertEqual(limit.in_flight, 2)
+        self.assertEqual(len(limit.waiters), 0)
+
+    async def test_full_queue_is_rejected(self):
+        limit = AdaptiveLimit("test", target=1, initial=2, queue_timeout=1)
+        await limit.acquire()
+        await limit.acquire()
+        waiting = [asyncio.create_task(limit.acquire()) for _ in range(2)]
+        await asyncio.sleep(0)
+
+        with self.assertRaises(Rejected):
+            await limit.acquire()
+
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        self.assertEqual(len(limit.waiters), 0)
+        self.assertEqual(limit.in_flight, 2)
+
+    async def test_additive_increase_when_saturated(self):
+        limit = AdaptiveLimit("test", target=1, initial=2)
+        await limit.acquire()
+        limit.release(0.01, dropped=False)
+        self.assertEqual(limit.limit, 2)
+
+        await limit.acquire()
+        await limit.acquire()
+        limit.release(0.01, dropped=False)
+        self.assertEqual(limit.limit, 2.5)
+
+    async def test_multiplicative_decrease_once_per_target(self):
+        limit = AdaptiveLimit("test", target=1, initial=10, backoff=0.5)
+        for _ in range(3):
+            await limit.acquire()
+        limit.release(2, dropped=False)
+        limit.release(0.01, dropped=True)
+        self.assertEqual(limit.limit, 5)
+
+        with patch("app.services.admission.time.monotonic", return_value=limit.last_decrease + 1):
+            limit.release(0.01, dropped=True)
+        self.assertEqual(limit.limit, 2.5)
+        self.assertEqual(limit.in_flight, 0)
+
+    async def test_min_limit(self):
+        limit = AdaptiveLimit("test", target=0, initial=2, min_limit=2)
+        await limit.acquire()
+        limit.release(1, dropped=False)
+
+        self.assertEqual(limit.limit, 2)
+
+
+class TestAdmissionControl(unittest.TestCase):
+    def test_classify(self):
+        admission = AdmissionControl({"auth": 1, "uploads": 5, "qr": 1, "reads": 0.5, "writes": 1})
+
+        cases = {
+            ("POST", "/api/auth/login"): "auth",
+            ("POST", "/api/images/"): "uploads",
+            ("PATCH", "/api/users/avatar"): "uploads",
+            ("GET", "/api/images/formats/qr-code/1"): "qr",
+            ("GET", "/api/images/formats/1/qr-codes.zip"): "qr",
+            ("GET", "/api/images/1"): "reads",
+            ("POST", "/api/images/comments/"): "writes",
+        }
+        for (method, path), name in cases.items():
+            self.assertEqual(admission.classify(method, path).name, name, path)
+
+        self.assertIsNone(admission.classify("GET", "/readyz"))
+        self.assertIsNone(admission.classify("GET", "/metrics"))
+
+    def test_classes_without_target_fall_through(self):
+        admission = AdmissionControl({"reads": 0.5})
+
+        self.assertEqual(admission.classify("GET", "/api/images/formats/qr-code/1").name, "reads")
+        self.assertIsNone(admission.classify("POST", "/api/images/"))
@@ -0,0 +1,167 @@
+import asyncio
+import random
+import tempfile
+import unittest
+from ipaddress import ip_address, ip_network
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+from app.middleware import IPFilterMiddleware
+from app.services.blocklist import Blocklist, BlocklistSource, PrefixTrie, read_networks
+
+
+class TestPrefixTrie(unittest.TestCase):
+    def test_matches_networks(self):
+        rng = random.Random(7)
+        networks = [ip_network((rng.getrandbits(32), rng.randint(8, 32)), strict=False) for _ in range(500)]
+        addresses = [ip_address(rng.getrandbits(32)) for _ in range(2000)]
+        addresses += [network.network_address + 1 for network in networks if network.prefixlen < 32]
+
+        for stride in (16, 4):
+            trie = PrefixTrie(32, stride)
+            for network in networks:
+                trie.add(int(network.network_address), network.prefixlen)
+
+            for address in addresses:
+                self.assertEqual(int(address) in trie, any(address in network for network in networks), address)
+
+    def test_shorter_prefix_covers_longer(self):
+        trie = PrefixTrie(32)
+        trie.add(int(ip_address("10.1.2.0")), 24)
+        trie.add(int(ip_address("10.1.3.4")), 32)
+        trie.add(int(ip_address("10.0.0.0")), 8)
+
+        self.assertEqual(len(trie), 1)
+        self.assertIn(int(ip_address("10.200.0.1")), trie)
+        self.assertNotIn(int(ip_address("11.0.0.0")), trie)
+
+    def test_default_route(self):
+        trie = PrefixTrie(32)
+        trie.add(0, 0)
+
+        self.assertIn(int(ip_address("203.0.113.9")), trie)
+
+
+class TestBlocklist(unittest.TestCase):
+    def test_contains(self):
+        blocklist = Blocklist(["192.168.1.1", "10.0.0.0/8", "2001:db8::/32", "not a network", "172.16.5.7/12"])
+
+        self.assertEqual(len(blocklist), 4)
+        self.assertIn("192.168.1.1", blocklist)
+        self.assertNotIn("192.168.1.2", blocklist)
+        self.assertIn("10.20.30.40", blocklist)
+        self.assertIn("172.31.255.255", blocklist)
+        self.assertIn("2001:db8:1::1", blocklist)
+        self.assertNotIn("2001:db9::1", blocklist)
+        self.assertIn("::ffff:10.0.0.1", blocklist)
+        self.assertNotIn("testclient", blocklist)
+
+    def test_read_networks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "blocklist.txt")
+            path.write_text("# scanners\n198.51.100.0/24\n\n203.0.113.7  # abuse\n")
+
+            self.assertEqual(read_networks(path), ["198.51.100.0/24", "203.0.113.7"])
+
+
+class FakePubSub:
+    def __init__(self):
+        self.messages = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def subscribe(self, channel):
+        self.messages.put_nowait({"type": "subscribe", "channel": channel})
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+
+class TestBlocklistSource(unittest.IsolatedAsyncioTestCase):
+    async def test_load_sources(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "blocklist.txt")
+            path.write_text("198.51.100.0/24\n")
+            redis = AsyncMock(smembers=AsyncMock(return_value={b"2001:db8::/32"}))
+            source = BlocklistSource(["192.168.1.1"], path=path, redis_key="blocklist")
+
+            await source.start(redis)
+            await source.stop()
+
+            self.assertIn("198.51.100.7", source)
+            self.assertIn("2001:db8::1", source)
+            self.assertIn("192.168.1.1", source)
+
+            path.write_text("203.0.113.0/24\n")
+            await source.load()
+
+            self.assertNotIn("198.51.100.7", source)
+            self.assertIn("203.0.113.1", source)
+
+    async def test_reload_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "blocklist.txt")
+            path.write_text("198.51.100.0/24\n")
+            pubsub = FakePubSub()
+            source = BlocklistSource(path=path)
+
+            await source.start(MagicMock(pubsub=lambda: pubsub, close=AsyncMock()))
+            path.write_text("203.0.113.0/24\n")
+            pubsub.messages.put_nowait({"type": "message", "data": b"reload"})
+            for _ in range(100):
+                if "203.0.113.1" in source:
+                    break
+                await asyncio.sleep(0.01)
+            await source.stop()
+
+            self.assertNotIn("198.51.100.7", source)
+            self.assertIn("203.0.113.1", source)
+
+    async def test_static_networks_are_not_reloaded(self):
+        source = BlocklistSource(["198.51.100.0/24"])
+
+        await source.start(MagicMock(close=AsyncMock()))
+
+        self.assertIsNone(source._task)
+        await source.stop()
+
+    async def test_missing_file_keeps_blocklist(self):
+        source = BlocklistSource(path=Path("/nonexistent/blocklist.txt"))
+        source.blocklist = Blocklist(["198.51.100.0/24"])
+
+        await source.load()
+
+        self.assertIn("198.51.100.7", source)
+
+
+class TestIPFilterMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def request(self, host):
+        app = AsyncMock()
+        middleware = IPFilterMiddleware(app, BlocklistSource(["198.51.100.0/24"]))
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "client": (host, 5000), "method": "GET", "path": "/", "headers": []}
+        await middleware(scope, AsyncMock(), send)
+
+        return app, messages
+
+    async def test_blocked(self):
+        app, messages = await self.request("198.51.100.7")
+
+        app.assert_not_awaited()
+        self.assertEqual(messages[0]["status"], 403)
+        self.assertEqual(messages[1]["body"], b'{"detail":"You are banned"}')
+
+    async def test_allowed(self):
+        app, messages = await self.request("203.0.113.7")
+
+        app.assert_awaited_once()
+        self.assertEqual(messages, [])
@@ -0,0 +1,100 @@
+import json
+import unittest
+from io import BytesIO
+from urllib.parse import parse_qs
+
+import httpx
+from cloudinary.utils import api_sign_request
+
+from app.services.cloudinary import AsyncCloudinaryClient
+from app.services.deadline import DeadlineExceeded, deadline
+
+
+class TestAsyncCloudinaryClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = []
+        self.client = AsyncCloudinaryClient(
+            cloud_name="cloud",
+            api_key="123",
+            api_secret="secret",
+            transport=httpx.MockTransport(self.handler),
+        )
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        self.requests.append(request)
+
+        if request.url.path == "/v1_1/cloud/resources/image/upload":
+            public_ids = request.url.params.get_list("public_ids[]")
+            return httpx.Response(200, json={"deleted": {public_id: "deleted" for public_id in public_ids}})
+        if request.url.path == "/v1_1/cloud/image/upload":
+            return httpx.Response(200, json={"public_id": "media/image", "version": 1, "secure_url": "https://url"})
+        if request.url.path == "/v1_1/cloud/image/destroy":
+            return httpx.Response(200, json={"result": "ok"})
+        if request.url.path == "/v1_1/cloud/ping":
+            return httpx.Response(200, json={"status": "ok"})
+
+        return httpx.Response(404, json={"error": {"message": "Not found"}})
+
+    def test_sign(self):
+        params = self.client.sign({"public_id": "image", "overwrite": True, "folder": None})
+        signature = params.pop("signature")
+
+        self.assertEqual(params.pop("api_key"), "123")
+        self.assertEqual(signature, api_sign_request(params, "secret"))
+        self.assertNotIn("folder", params)
+
+    async def test_upload(self):
+        result = await self.client.upload(BytesIO(b"image"), public_id="image", folder="media")
+
+        self.assertEqual(result["public_id"], "media/image")
+        self.assertEqual(str(self.requests[0].url), "https://api.cloudinary.com/v1_1/cloud/image/upload")
+        self.assertIn(b"image", self.requests[0].content)
+
+    async def test_destroy(self):
+        result = await self.client.destroy("media/image")
+
+        self.assertEqual(result, {"result": "ok"})
+        self.assertEqual(parse_qs(self.requests[0].content.decode())["public_id"], ["media/image"])
+
+    async def test_ping(self):
+        result = await self.client.ping()
+
+        self.assertEqual(result, {"status": "ok"})
+        self.assertTrue(self.requests[0].headers["authorization"].startswith("Basic "))
+
+    async def test_timeout_is_shortened_to_the_deadline(self):
+        await self.client.ping()
+        with deadline(2):
+            await self.client.ping()
+
+        self.assertEqual(self.requests[0].extensions["timeout"]["read"], 60)
+        self.assertLessEqual(self.requests[1].extensions["timeout"]["read"], 2)
+
+    async def test_deadline_exceeded(self):
+        with deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                await self.client.ping()
+
+        self.assertEqual(self.requests, [])
+
+    async def test_delete_resources_in_chunks(self):
+        public_ids = [f"media/{i}" for i in range(250)]
+
+        result = await self.client.delete_resources(public_ids)
+
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(list(result["deleted"]), public_ids)
+
+    async def test_error_status(self):
+        self.client.cloud_name = "invalid"
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            await self.client.destroy("media/image")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import redis.asyncio as aioredis
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, status
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.services import deadline as deadline_service
+from app.services.deadline import DeadlineExceeded, deadline, deadline_route, remaining, timeout
+from app.services.metrics import InstrumentedRedis
+from config import settings
+
+engine = create_async_engine(settings.db_url, poolclass=NullPool)
+
+
+async def get_db():
+    async with AsyncSession(engine) as session:
+        yield session
+
+
+router = APIRouter(route_class=deadline_route(0.3))
+
+
+@router.get("/fast")
+async def fast(db: AsyncSession = Depends(get_db)):
+    return {"statement_timeout": await db.scalar(text("SHOW statement_timeout"))}
+
+
+@router.get("/sleep")
+async def sleep():
+    await asyncio.sleep(5)
+
+
+@router.get("/query")
+async def query(db: AsyncSession = Depends(get_db)):
+    await db.execute(text("SELECT pg_sleep(5)"))
+
+
+@router.get("/not-found")
+async def not_found():
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+
+
+def client() -> TestClient:
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+class TestDeadline(unittest.TestCase):
+    def test_no_deadline(self):
+        self.assertIsNone(remaining())
+        self.assertEqual(timeout(5), 5)
+
+    def test_timeout_is_shortened(self):
+        with deadline(1):
+            self.assertLessEqual(timeout(5), 1)
+            self.assertEqual(timeout(0.5), 0.5)
+            self.assertLessEqual(timeout(None), 1)
+
+    def test_earlier_deadline_is_kept(self):
+        with deadline(1) as outer:
+            with deadline(10) as inner:
+                self.assertEqual(inner, outer)
+        self.assertIsNone(remaining())
+
+    def test_exceeded(self):
+        with deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                remaining()
+
+    def test_no_deadline_route(self):
+        self.assertIs(deadline_route(None), deadline_route(None))
+        self.assertIsNone(getattr(deadline_route(None), "deadline", None))
+
+
+class TestDeadlineRoute(unittest.TestCase):
+    def test_statement_timeout(self):
+        response = client().get("/fast")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response.json()["statement_timeout"], r"^(2\d\d|300)ms$")
+
+    def test_handler_is_cancelled(self):
+        response = client().get("/sleep")
+
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+        self.assertEqual(response.json()["detail"], "Request deadline exceeded")
+
+    def test_statement_is_cancelled_by_postgres(self):
+        with patch.object(deadline_service, "GRACE", 5):
+            response = client().get("/query")
+
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+        self.assertEqual(response.json()["detail"], "Request deadline exceeded")
+
+    def test_http_exceptions_are_kept(self):
+        response = client().get("/not-found")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestRedisDeadline(unittest.IsolatedAsyncioTestCase):
+    async def test_command_is_cancelled(self):
+        async def hanging(*args, **options):
+            await asyncio.sleep(5)
+
+        redis_client = InstrumentedRedis()
+        with patch.object(aioredis.Redis, "execute_command", hanging):
+            with deadline(0.05):
+                with self.assertRaises(TimeoutError):
+                    await redis_client.get("key")
@@ -0,0 +1,188 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+
+from app.database.models import EmailOutbox
+from app.services import email_outbox
+from app.services.email_outbox import OutboxWorker, SMTPPool, is_permanent
+from config import Template
+
+
+conf = ConnectionConfig(
+    MAIL_USERNAME="user@example.com",
+    MAIL_PASSWORD="password",
+    MAIL_FROM="user@example.com",
+    MAIL_PORT=465,
+    MAIL_SERVER="localhost",
+    MAIL_FROM_NAME="Test",
+    MAIL_STARTTLS=False,
+    MAIL_SSL_TLS=True,
+    USE_CREDENTIALS=True,
+    VALIDATE_CERTS=True,
+    TEMPLATE_FOLDER=Template.emails,
+)
+
+
+class FakeSMTP:
+    instances = []
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+        self.sent = []
+        self.fail_with = None
+        FakeSMTP.instances.append(self)
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def login(self, username, password):
+        pass
+
+    async def send_message(self, message):
+        if self.fail_with is not None:
+            error, self.fail_with = self.fail_with, None
+            raise error
+        self.sent.append(message)
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+class TestSMTPPool(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        FakeSMTP.instances = []
+        patcher = patch.object(aiosmtplib, "SMTP", FakeSMTP)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = SMTPPool(conf, size=2)
+
+    async def test_reuses_connections(self):
+        for _ in range(10):
+            await self.pool.send(MagicMock())
+
+        self.assertEqual(self.pool.connects, 1)
+        self.assertEqual(len(FakeSMTP.instances[0].sent), 10)
+
+    async def test_reconnects_when_disconnected(self):
+        await self.pool.send(MagicMock())
+        FakeSMTP.instances[0].fail_with = aiosmtplib.SMTPServerDisconnected("closed")
+
+        await self.pool.send(MagicMock())
+
+        self.assertEqual(self.pool.connects, 2)
+        self.assertFalse(FakeSMTP.instances[0].is_connected)
+        self.assertEqual(len(FakeSMTP.instances[1].sent), 1)
+
+    async def test_close(self):
+        await self.pool.send(MagicMock())
+        await self.pool.close()
+
+        self.assertFalse(FakeSMTP.instances[0].is_connected)
+
+
+class TestOutboxWorker(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.pool = MagicMock(conf=conf, send=AsyncMock())
+        self.session = MagicMock()
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = self.session
+
+        self.worker = OutboxWorker(self.pool, session_factory, batch_size=10, max_attempts=3, retry_base=10)
+        self.repository = MagicMock(
+            claim_emails=AsyncMock(), delete_emails=AsyncMock(), retry_email=AsyncMock(), fail_email=AsyncMock()
+        )
+        patcher = patch.object(email_outbox, "repository_outbox", self.repository)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def email(email_id, attempts=1):
+        return EmailOutbox(
+            id=email_id, recipient="user@example.com", subject="Confirm your email ",
+            template_name="confirmed_email.html", attempts=attempts,
+            template_body={"host": "http://test/", "username": "user", "token": "token"},
+        )
+
+    def test_render(self):
+        message = self.worker.render(self.email(1))
+
+        self.assertEqual(message["To"], "user@example.com")
+        self.assertEqual(message["Subject"], "Confirm your email ")
+        self.assertIn("http://test/api/auth/confirmed_email/token", message.get_payload(decode=True).decode())
+
+    async def test_sent_emails_are_deleted(self):
+        self.repository.claim_emails.return_value = [self.email(1), self.email(2)]
+
+        self.assertEqual(await self.worker.drain_once(), 2)
+
+        self.repository.delete_emails.assert_awaited_once_with([1, 2], self.session)
+        self.assertEqual(self.pool.send.await_count, 2)
+        self.assertEqual(self.worker.stats["sent"], 2)
+
+    async def test_temporary_error_is_retried(self):
+        self.repository.claim_emails.return_value = [self.email(1, attempts=2)]
+        self.pool.send.side_effect = aiosmtplib.SMTPConnectError("refused")
+
+        await self.worker.drain_once()
+
+        email_id, delay, _, _ = self.repository.retry_email.await_args.args
+        self.assertEqual(email_id, 1)
+        self.assertTrue(10 <= delay <= 20)
+        self.repository.fail_email.assert_not_awaited()
+        self.assertEqual(self.worker.stats["retried"], 1)
+
+    async def test_permanent_error_fails(self):
+        self.repository.claim_emails.return_value = [self.email(1)]
+        self.pool.send.side_effect = aiosmtplib.SMTPRecipientsRefused([])
+
+        await self.worker.drain_once()
+
+        self.repository.fail_email.assert_awaited_once()
+        self.repository.retry_email.assert_not_awaited()
+
+    async def test_invalid_message_does_not_abort_the_batch(self):
+        self.repository.claim_emails.return_value = [self.email(1), self.email(2), self.email(3)]
+        self.pool.send.side_effect = [None, ValueError("Invalid header"), None]
+
+        self.assertEqual(await self.worker.drain_once(), 3)
+
+        self.repository.delete_emails.assert_awaited_once_with([1, 3], self.session)
+        self.repository.fail_email.assert_awaited_once()
+        self.assertEqual(self.repository.fail_email.await_args.args[0], 2)
+        self.repository.retry_email.assert_not_awaited()
+
+    async def test_unrenderable_message_fails(self):
+        self.repository.claim_emails.return_value = [self.email(1), self.email(2)]
+
+        with patch.object(self.worker, "render", side_effect=[MagicMock(), ValueError("Invalid address")]):
+            await self.worker.drain_once()
+
+        self.repository.delete_emails.assert_awaited_once_with([1], self.session)
+        self.assertEqual(self.repository.fail_email.await_args.args[0], 2)
+
+    async def test_last_attempt_fails(self):
+        self.repository.claim_emails.return_value = [self.email(1, attempts=3)]
+        self.pool.send.side_effect = aiosmtplib.SMTPConnectError("refused")
+
+        await self.worker.drain_once()
+
+        self.repository.fail_email.assert_awaited_once()
+        self.assertEqual(self.worker.stats["failed"], 1)
+
+    async def test_empty_outbox(self):
+        self.repository.claim_emails.return_value = []
+
+        self.assertEqual(await self.worker.drain_once(), 0)
+        self.repository.delete_emails.assert_not_awaited()
+
+    def test_is_permanent(self):
+        self.assertTrue(is_permanent(aiosmtplib.SMTPResponseException(554, "Rejected")))
+        self.assertFalse(is_permanent(aiosmtplib.SMTPResponseException(451, "Try again later")))
+        self.assertFalse(is_permanent(aiosmtplib.SMTPServerDisconnected("closed")))
+        self.assertFalse(is_permanent(ConnectionResetError()))
+        self.assertTrue(is_permanent(ValueError("Invalid address")))
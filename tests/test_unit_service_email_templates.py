@@ -0,0 +1,55 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+
+from app.services.email_templates import EmailTemplates, static_parts, substitute
+from config import Template
+
+
+class TestEmailTemplates(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        self.addCleanup(self.cache_dir.cleanup)
+
+        Path(self.folder.name, "plain.html").write_text("<p>Hello {{ name }}!</p>\n<a href=\"{{host}}x/{{token}}\">")
+        Path(self.folder.name, "logic.html").write_text("{% if name %}Hello {{ name | upper }}{% endif %}")
+
+        self.templates = EmailTemplates(self.folder.name, self.cache_dir.name)
+
+    def test_static_parts(self):
+        statics, names = static_parts(self.templates.environment, "plain.html")
+
+        self.assertEqual(statics, ("<p>Hello ", "!</p>\n<a href=\"", "x/", "\">"))
+        self.assertEqual(names, ("name", "host", "token"))
+        self.assertIsNone(static_parts(self.templates.environment, "logic.html"))
+
+    def test_substitute(self):
+        parts = static_parts(self.templates.environment, "plain.html")
+
+        self.assertEqual(substitute(*parts, {"name": "Bob", "token": 1}), "<p>Hello Bob!</p>\n<a href=\"x/1\">")
+
+    def test_render_matches_jinja(self):
+        environment = Environment(loader=FileSystemLoader(Template.emails))
+        templates = EmailTemplates(Template.emails, self.cache_dir.name)
+        templates.compile()
+        context = {"host": "http://test/", "full_name": "<b>Bob</b>", "token": "token"}
+
+        for name in environment.list_templates():
+            self.assertEqual(templates.render(name, context), environment.get_template(name).render(**context))
+
+    def test_render_with_logic(self):
+        self.assertEqual(self.templates.render("logic.html", {"name": "bob"}), "Hello BOB")
+        self.assertEqual(self.templates.render("logic.html", {}), "")
+
+    def test_compile_writes_bytecode_cache(self):
+        self.templates.compile()
+
+        self.assertEqual(len(list(Path(self.cache_dir.name).iterdir())), 2)
+
+    def test_template_not_found(self):
+        with self.assertRaises(TemplateNotFound):
+            self.templates.render("missing.html", {})
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from app.services.health import HealthChecks, executor_saturation
+from app.services.metrics import pending_tasks
+
+
+class TestHealthChecks(unittest.IsolatedAsyncioTestCase):
+    async def test_not_ready_until_checked(self):
+        checks = HealthChecks()
+        checks.add_check("postgres", self.healthy)
+
+        ready, report = checks.readiness()
+
+        self.assertFalse(ready)
+        self.assertEqual(report["postgres"]["detail"], "not checked yet")
+
+    async def test_cached_results(self):
+        calls = []
+
+        async def check():
+            calls.append(1)
+
+        checks = HealthChecks(timeout=0.05)
+        checks.add_check("postgres", check)
+        checks.add_check("redis", self.hanging)
+        checks.add_check("cloudinary", self.failing, critical=False)
+        await checks.run_checks()
+
+        ready, report = checks.readiness()
+        checks.readiness()
+
+        self.assertEqual(len(calls), 1)
+        self.assertFalse(ready)
+        self.assertTrue(report["postgres"]["ok"])
+        self.assertEqual(report["redis"]["detail"], "timed out after 0.05s")
+        self.assertIn("ConnectionError", report["cloudinary"]["detail"])
+
+        del checks.checks["redis"]
+        self.assertTrue(checks.readiness()[0])
+
+    async def test_stale_results(self):
+        checks = HealthChecks(stale_after=10)
+        checks.add_check("postgres", self.healthy)
+        await checks.run_checks()
+
+        with patch("app.services.health.time.monotonic", return_value=checks.results["postgres"].checked_at + 11):
+            ready, report = checks.readiness()
+
+        self.assertFalse(ready)
+        self.assertTrue(report["postgres"]["detail"].startswith("stale"))
+
+    async def test_background_loop_and_draining(self):
+        checks = HealthChecks(interval=0.01)
+        checks.add_check("postgres", self.healthy)
+
+        checks.start()
+        await asyncio.sleep(0.05)
+        self.assertTrue(checks.readiness()[0])
+
+        await checks.stop()
+        self.assertFalse(checks.readiness()[0])
+
+    async def test_saturation(self):
+        checks = HealthChecks()
+        check = executor_saturation("test_executor", workers=2)
+        checks.add_saturation("executor", check)
+
+        self.assertTrue(checks.readiness()[0])
+
+        pending_tasks["test_executor"] += 100
+        ready, report = checks.readiness()
+        pending_tasks["test_executor"] -= 100
+
+        self.assertFalse(ready)
+        self.assertIn("tasks pending", report["executor"]["detail"])
+
+    @staticmethod
+    async def healthy():
+        pass
+
+    @staticmethod
+    async def hanging():
+        await asyncio.sleep(1)
+
+    @staticmethod
+    async def failing():
+        raise ConnectionError("unreachable")
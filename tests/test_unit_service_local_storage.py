@@ -0,0 +1,229 @@
+import tempfile
+import unittest
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.services.cloudinary import CroppingOrResizingTransformation, FORMAT_AVATAR
+from app.services.local_storage import LocalStorage, VariantCache, transform_image
+from app.utils.responses import FileRangeResponse
+
+
+def image_file(size=(400, 200), image_format="PNG") -> BytesIO:
+    file = BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(file, format=image_format)
+    file.seek(0)
+    return file
+
+
+class TestTransformImage(unittest.TestCase):
+    def setUp(self):
+        self.image = Image.new("RGB", (400, 200))
+
+    def transform(self, **params):
+        return transform_image(self.image, CroppingOrResizingTransformation(**params)).size
+
+    def test_fill(self):
+        self.assertEqual(self.transform(width=100, height=100, crop="fill"), (100, 100))
+
+    def test_scale_keeps_aspect_ratio(self):
+        self.assertEqual(self.transform(width=100), (100, 50))
+
+    def test_fit(self):
+        self.assertEqual(self.transform(width=100, height=100, crop="fit"), (100, 50))
+
+    def test_limit_does_not_enlarge(self):
+        self.assertEqual(self.transform(width=800, height=800, crop="limit"), (400, 200))
+
+    def test_pad(self):
+        self.assertEqual(self.transform(width=100, height=100, crop="pad"), (100, 100))
+
+    def test_crop(self):
+        self.assertEqual(self.transform(width=100, height=500, crop="crop", gravity="north"), (100, 200))
+
+
+class TestVariantCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.root = Path(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, size):
+        path = self.root / name
+        path.write_bytes(b"0" * size)
+        return path
+
+    def test_evicts_least_recently_used(self):
+        cache = VariantCache(self.root, max_size=20)
+        first, second = self.write("first", 10), self.write("second", 10)
+        cache.add(first, 10)
+        cache.add(second, 10)
+
+        self.assertTrue(cache.get(first))
+
+        third = self.write("third", 10)
+        cache.add(third, 10)
+
+        self.assertFalse(second.exists())
+        self.assertFalse(cache.get(second))
+        self.assertTrue(cache.get(first))
+        self.assertEqual(cache.size, 20)
+
+    def test_discard(self):
+        cache = VariantCache(self.root, max_size=100)
+        (self.root / "image").mkdir()
+        cache.add(self.write("image/variant", 10), 10)
+
+        cache.discard(self.root / "image")
+
+        self.assertEqual(cache.size, 0)
+        self.assertFalse((self.root / "image").exists())
+
+
+class TestLocalStorage(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(Path(self.directory.name), "/api/media", "media", cache_size=1024 ** 2, workers=1)
+
+    async def asyncTearDown(self):
+        await self.storage.close()
+        self.directory.cleanup()
+
+    async def test_upload_image(self):
+        result = await self.storage.upload_image(image_file(), "image")
+
+        self.assertEqual(result["public_id"], "media/image")
+        self.assertTrue(result["url"].startswith("/api/media/media/image?v="))
+        self.assertTrue((self.storage.originals / "media" / "image.png").exists())
+
+    async def test_upload_in_progress_is_not_served(self):
+        (self.storage.originals / "media").mkdir()
+        (self.storage.originals / "media" / "image.0123.tmp").write_bytes(b"partial")
+
+        self.assertIsNone(await self.storage.open_image("media/image"))
+
+        await self.storage.upload_image(image_file(), "image")
+
+        self.assertEqual(await self.storage.open_image("media/image"), self.storage.originals / "media" / "image.png")
+
+    async def test_upload_replaces_original_of_another_format(self):
+        (self.storage.originals / "media").mkdir()
+        (self.storage.originals / "media" / "image.0123.tmp").write_bytes(b"partial")
+        (self.storage.originals / "media" / "image.jpeg").write_bytes(b"previous")
+
+        await self.storage.upload_image(image_file(), "image")
+
+        self.assertEqual(sorted(path.name for path in (self.storage.originals / "media").iterdir()),
+                         ["image.0123.tmp", "image.png"])
+
+    async def test_upload_invalid_image(self):
+        result = await self.storage.upload_image(BytesIO(b"not an image"), "image")
+
+        self.assertIsNone(result)
+        self.assertEqual(list((self.storage.originals / "media").iterdir()), [])
+
+    async def test_upload_outside_root(self):
+        self.assertIsNone(await self.storage.upload_image(image_file(), "../../image"))
+
+    def test_formatting_image_url(self):
+        result = self.storage.formatting_image_url("media/image", FORMAT_AVATAR)
+
+        self.assertEqual(result["url"], "/api/media/c_fill,h_250,w_250/media/image")
+
+    async def test_open_variant(self):
+        await self.storage.upload_image(image_file(), "image")
+        url = self.storage.formatting_image_url("media/image", FORMAT_AVATAR)["url"]
+
+        path = await self.storage.open_image(url.removeprefix("/api/media/"))
+
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (250, 250))
+        self.assertTrue(self.storage.cache.get(path))
+
+    async def test_open_invalid_transformation(self):
+        await self.storage.upload_image(image_file(), "image")
+
+        with self.assertRaises(ValueError):
+            await self.storage.open_image("c_unknown/media/image")
+
+    async def test_open_non_canonical_transformation(self):
+        await self.storage.upload_image(image_file(), "image")
+
+        for segment in ("w_250,c_fill,h_250", "c_fill,h_250,w_250,x_1", "c_fill,h_0250,w_250"):
+            with self.assertRaises(ValueError):
+                await self.storage.open_image(f"{segment}/media/image")
+
+        self.assertEqual(self.storage.cache.entries, {})
+
+    async def test_open_oversized_transformation(self):
+        await self.storage.upload_image(image_file(), "image")
+
+        with self.assertRaises(ValueError):
+            await self.storage.open_image("h_60000,w_60000/media/image")
+
+        self.assertEqual(self.storage.cache.entries, {})
+
+    async def test_open_missing_image(self):
+        self.assertIsNone(await self.storage.open_image("c_fill,w_10/media/missing"))
+        self.assertIsNone(await self.storage.open_image("media/../../secret"))
+
+    async def test_remove_image(self):
+        await self.storage.upload_image(image_file(), "image")
+        await self.storage.open_image("w_10/media/image")
+
+        self.assertTrue(await self.storage.remove_image("media/image"))
+        self.assertFalse((self.storage.variants / "media" / "image").exists())
+        self.assertFalse(await self.storage.remove_image("media/image"))
+
+
+class TestFileRangeResponse(unittest.TestCase):
+    def setUp(self):
+        self.file = tempfile.NamedTemporaryFile(suffix=".txt")
+        self.file.write(b"0123456789")
+        self.file.flush()
+
+        async def endpoint(request):
+            return FileRangeResponse(self.file.name, request.headers.get("range"), method=request.method)
+
+        self.client = TestClient(Starlette(routes=[Route("/", endpoint, methods=["GET", "HEAD"])]))
+
+    def tearDown(self):
+        self.file.close()
+
+    def test_full(self):
+        response = self.client.get("/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"0123456789")
+        self.assertEqual(response.headers["accept-ranges"], "bytes")
+
+    def test_range(self):
+        response = self.client.get("/", headers={"Range": "bytes=2-5"})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"2345")
+        self.assertEqual(response.headers["content-range"], "bytes 2-5/10")
+
+    def test_suffix_range(self):
+        response = self.client.get("/", headers={"Range": "bytes=-3"})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, b"789")
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get("/", headers={"Range": "bytes=20-"})
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers["content-range"], "bytes */10")
+
+    def test_head(self):
+        response = self.client.head("/")
+
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response.headers["content-length"], "10")
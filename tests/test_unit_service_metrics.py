@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+from prometheus_client import REGISTRY
+from redis.exceptions import ConnectionError
+
+from app.services import metrics
+from app.services.metrics import InstrumentedRedis, Sampler, pending_tasks, track_executor
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class TestSampler(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.sampler = Sampler()
+        self.values = {("idle",): 4}
+        self.gauge = self.sampler.gauge("test_pool_connections", "Connections", ["state"], lambda: self.values)
+
+    def tearDown(self):
+        REGISTRY.unregister(self.gauge)
+
+    def test_sampled_when_exposed(self):
+        with patch.object(metrics, "sampler", self.sampler):
+            self.assertIn(b'test_pool_connections{state="idle"} 4.0\n', metrics.expose())
+
+    async def test_sampled_in_background(self):
+        self.sampler.start(0.01)
+        await asyncio.sleep(0.02)
+        self.values = {("idle",): 3}
+        await asyncio.sleep(0.05)
+        await self.sampler.stop()
+
+        self.assertEqual(sample("test_pool_connections", state="idle"), 3)
+
+
+class TestInstrumentation(unittest.IsolatedAsyncioTestCase):
+    async def test_track_executor(self):
+        event = asyncio.Event()
+        future = track_executor("test", asyncio.ensure_future(event.wait()))
+
+        self.assertEqual(sample("executor_tasks", executor="test"), 1)
+        self.assertEqual(pending_tasks["test"], 1)
+        event.set()
+        await future
+        self.assertEqual(sample("executor_tasks", executor="test"), 0)
+        self.assertEqual(pending_tasks["test"], 0)
+
+    async def test_redis_failures_are_timed(self):
+        client = InstrumentedRedis(port=1, socket_connect_timeout=0.1, metric_client="test")
+
+        with self.assertRaises(ConnectionError):
+            await client.get("key")
+        with self.assertRaises(ConnectionError):
+            await client.pipeline().get("key").execute()
+        await client.close()
+
+        self.assertEqual(sample("redis_command_duration_seconds_count", client="test", command="GET"), 1)
+        self.assertEqual(sample("redis_command_duration_seconds_count", client="test", command="PIPELINE"), 1)
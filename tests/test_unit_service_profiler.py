@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from redis.exceptions import ConnectionError
+
+from app.middleware import ContinuousProfilingMiddleware, ProfilingMiddleware
+from app.services.profiler import ContinuousProfiler, Profile, ProfileStore, RequestProfiler, category
+
+
+def blocking():
+    time.sleep(0.05)
+
+
+async def waiting():
+    await asyncio.sleep(0.05)
+
+
+async def profiled() -> Profile:
+    profiler = RequestProfiler(asyncio.current_task(), 0.001)
+    profiler.start()
+    blocking()
+    await waiting()
+    return profiler.stop()
+
+
+class TestRequestProfiler(unittest.IsolatedAsyncioTestCase):
+    async def test_samples_running_and_waiting_task(self):
+        profile = await asyncio.create_task(profiled())
+
+        def time_in(name):
+            return sum(weight for stack, weight in profile.stacks.items()
+                       if any(label.endswith(name) for label in stack))
+
+        self.assertGreater(time_in(":blocking"), 0.03)
+        self.assertGreater(time_in(":waiting"), 0.03)
+        self.assertTrue(all(stack[0].endswith(":profiled") for stack in profile.stacks))
+        self.assertAlmostEqual(profile.duration, 0.1, delta=0.05)
+
+    async def test_other_tasks_are_not_sampled(self):
+        other = asyncio.create_task(asyncio.to_thread(time.sleep, 0))
+        profile = await asyncio.create_task(profiled())
+        await other
+
+        self.assertFalse([stack for stack in profile.stacks if "to_thread" in ";".join(stack)])
+
+
+class TestContinuousProfiler(unittest.IsolatedAsyncioTestCase):
+    async def test_samples_by_route(self):
+        profiler = ContinuousProfiler(interval=0.001)
+
+        async def handler():
+            profiler.requests[asyncio.current_task()] = {"route": SimpleNamespace(path="/api/images/{image_id}")}
+            blocking()
+
+        profiler.start()
+        await asyncio.create_task(handler())
+        await asyncio.sleep(0.02)
+        profiler.stop()
+
+        lines = profiler.folded("/api/images/{image_id}").splitlines()
+        self.assertTrue(lines)
+        self.assertTrue(all(line.startswith("/api/images/{image_id};") for line in lines))
+        stacks = {stack: int(count) for stack, count in (line.rsplit(" ", 1) for line in lines)}
+        self.assertGreater(sum(count for stack, count in stacks.items()
+                               if stack.endswith(":blocking") and ".handler;" in stack), 10)
+        self.assertGreater(profiler.idle, 0)
+        self.assertEqual(profiler.folded("/api/users/me/"), "")
+
+        lines = profiler.folded().splitlines()
+
+        self.assertEqual(profiler.folded(reset=True).splitlines(), lines)
+        self.assertEqual((profiler.folded(), profiler.samples), ("", 0))
+
+    async def test_max_stacks(self):
+        profiler = ContinuousProfiler(interval=0.001, max_stacks=0)
+        profiler.loop, profiler.thread_id = asyncio.get_running_loop(), threading.get_ident()
+
+        profiler.sample()
+
+        self.assertEqual((profiler.samples, profiler.dropped, profiler.stacks), (1, 1, {}))
+
+    async def test_middleware_registers_requests(self):
+        profiler = ContinuousProfiler()
+        registered = []
+
+        async def app(scope, receive, send):
+            registered.append(profiler.requests[asyncio.current_task()])
+
+        scope = {"type": "http"}
+        await ContinuousProfilingMiddleware(app, profiler)(scope, AsyncMock(), AsyncMock())
+
+        self.assertEqual(registered, [scope])
+        self.assertEqual(profiler.requests, {})
+
+
+class TestProfile(unittest.TestCase):
+    def test_category(self):
+        self.assertEqual(category(["app.routes.images:get_image", "sqlalchemy.orm.session:Session.execute"]), "sql")
+        self.assertEqual(category(["app.services.auth:AuthService.get_current_user", "redis.client:Redis.get"]),
+                         "redis")
+        self.assertEqual(category(["fastapi.routing:serialize_response", "sqlalchemy.orm:load"]), "serialization")
+        self.assertEqual(category(["app.routes.images:get_image"]), "other")
+
+    def test_formats(self):
+        profile = Profile()
+        profile.add(["main:app", "sqlalchemy.engine:execute"], 0.002)
+        profile.add(["main:app", "sqlalchemy.engine:execute"], 0.001)
+        profile.add(["main:app"], 0.0005)
+        profile.duration = 0.004
+
+        self.assertEqual(profile.folded(), "main:app;sqlalchemy.engine:execute 3000\nmain:app 500\n")
+        self.assertEqual(profile.server_timing(), "profile;dur=4.0, sql;dur=3.0, other;dur=0.5")
+
+
+class TestProfileStore(unittest.IsolatedAsyncioTestCase):
+    async def test_save_and_load(self):
+        redis = AsyncMock()
+        redis.get.return_value = b"main:app 500\n"
+        store = ProfileStore(redis, ttl=60)
+        profile = Profile()
+        profile.add(["main:app"], 0.0005)
+
+        profile_id = await store.save(profile)
+
+        redis.set.assert_awaited_once_with(f"profile:{profile_id}", "main:app 500\n", ex=60)
+        self.assertEqual(await store.load(profile_id), "main:app 500\n")
+
+    async def test_save_failure(self):
+        store = ProfileStore(AsyncMock(set=AsyncMock(side_effect=ConnectionError())))
+
+        self.assertIsNone(await store.save(Profile()))
+
+
+class TestProfilingMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def request(self, headers, allowed=True):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        authorize = AsyncMock(return_value=allowed)
+        store = AsyncMock(save=AsyncMock(return_value="0" * 32))
+        middleware = ProfilingMiddleware(app, authorize, store)
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "headers": headers}, AsyncMock(), send)
+
+        return authorize, dict(messages[0]["headers"])
+
+    async def test_not_requested(self):
+        authorize, headers = await self.request([])
+
+        authorize.assert_not_awaited()
+        self.assertEqual(headers, {})
+
+    async def test_not_allowed(self):
+        authorize, headers = await self.request([(b"x-profile", b"1")], allowed=False)
+
+        authorize.assert_awaited_once()
+        self.assertEqual(headers, {})
+
+    async def test_profiled(self):
+        _, headers = await self.request([(b"x-profile", b"1")])
+
+        self.assertEqual(headers[b"x-profile-id"], b"0" * 32)
+        self.assertTrue(headers[b"server-timing"].startswith(b"profile;dur="))
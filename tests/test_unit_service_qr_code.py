@@ -0,0 +1,79 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from redis.exceptions import ConnectionError
+
+from app.services import qr_code
+from app.services.qr_code import QRCodeCache, QRCodeFormat, create_qr_for_url, qr_code_key, render_qr_code
+
+
+URL = "https://res.cloudinary.com/cloud/image/upload/c_fill,h_250,w_250/media/image"
+
+
+class TestCreateQrForUrl(unittest.TestCase):
+    def test_png(self):
+        self.assertTrue(create_qr_for_url(URL, 1, 10, 5).getvalue().startswith(b"\x89PNG"))
+
+    def test_svg(self):
+        content = create_qr_for_url(URL, 1, 10, 5, image_format=QRCodeFormat.SVG).getvalue()
+
+        self.assertIn(b"<svg", content)
+        self.assertIn(b"<path", content)
+
+    def test_key(self):
+        key = qr_code_key(URL, 1, 10, 5, True, QRCodeFormat.PNG)
+
+        self.assertEqual(key, qr_code_key(URL, 1, 10, 5, True, "png"))
+        self.assertNotEqual(key, qr_code_key(URL, 1, 10, 5, True, QRCodeFormat.SVG))
+        self.assertNotEqual(key, qr_code_key(URL, 1, 11, 5, True, QRCodeFormat.PNG))
+
+
+class TestQRCodeCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = AsyncMock()
+        self.redis.get.return_value = None
+        self.cache = QRCodeCache(max_size=10, redis_client=self.redis, ttl=60)
+
+    async def test_memory_hit(self):
+        await self.cache.set("key", b"content")
+
+        self.assertEqual(await self.cache.get("key"), b"content")
+        self.redis.set.assert_awaited_once_with("qr:key", b"content", ex=60)
+        self.redis.get.assert_not_awaited()
+
+    async def test_redis_hit(self):
+        self.redis.get.return_value = b"content"
+
+        self.assertEqual(await self.cache.get("key"), b"content")
+        self.assertEqual(await self.cache.get("key"), b"content")
+        self.redis.get.assert_awaited_once_with("qr:key")
+
+    async def test_evicts_least_recently_used(self):
+        await self.cache.set("first", b"12345")
+        await self.cache.set("second", b"12345")
+        await self.cache.get("first")
+        await self.cache.set("third", b"12345")
+
+        self.assertEqual(list(self.cache.entries), ["first", "third"])
+        self.assertEqual(self.cache.size, 10)
+
+    async def test_redis_errors_are_misses(self):
+        self.redis.get.side_effect = ConnectionError()
+        self.redis.set.side_effect = ConnectionError()
+
+        self.assertIsNone(await self.cache.get("key"))
+        await self.cache.set("key", b"content")
+        self.assertEqual(await self.cache.get("key"), b"content")
+
+
+class TestRenderQrCode(unittest.IsolatedAsyncioTestCase):
+    async def test_renders_once(self):
+        cache = QRCodeCache(max_size=1024 ** 2)
+
+        with patch.object(qr_code, "qr_cache", cache), \
+                patch.object(qr_code, "create_qr_for_url", wraps=create_qr_for_url) as mock_create:
+            key, content = await render_qr_code(URL, 1, 10, 5)
+            cached_key, cached_content = await render_qr_code(URL, 1, 10, 5)
+
+        self.assertEqual(mock_create.call_count, 1)
+        self.assertEqual((key, content), (cached_key, cached_content))
@@ -0,0 +1,176 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+from redis.exceptions import ConnectionError
+
+from app.services import rate_limit
+from app.services.rate_limit import RateLimiter, RateLimits, TokenBucket
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def hincrby(self, key, field, amount):
+        self.commands.append(("hincrby", key, field, amount))
+
+    def pexpire(self, key, milliseconds):
+        self.commands.append(("pexpire", key, milliseconds))
+
+    def hgetall(self, key):
+        self.commands.append(("hgetall", key))
+
+    def hset(self, key, field, value):
+        self.commands.append(("hset", key, field, value))
+
+    async def execute(self):
+        if self.redis.down:
+            raise ConnectionError("Connection refused")
+
+        results = []
+        for command, key, *args in self.commands:
+            if command == "hincrby":
+                fields = self.redis.data.setdefault(key, {})
+                fields[args[0]] = fields.get(args[0], 0) + args[1]
+                results.append(fields[args[0]])
+            elif command == "pexpire":
+                results.append(True)
+            elif command == "hset":
+                self.redis.data.setdefault(key, {})[args[0]] = args[1]
+                results.append(1)
+            else:
+                results.append(dict(self.redis.data.get(key, {})))
+        return results
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def total(self):
+        return sum(count for fields in self.data.values() for count in fields.values())
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_take(self):
+        bucket = TokenBucket(times=2, window=10)
+        now = bucket.updated
+
+        self.assertEqual(bucket.take(now), 0)
+        self.assertEqual(bucket.take(now), 0)
+        self.assertAlmostEqual(bucket.take(now), 5)
+        self.assertEqual(bucket.take(now + 5), 0)
+        self.assertEqual(bucket.pending, 3)
+
+
+class TestRateLimits(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.workers = [RateLimits(), RateLimits()]
+        for worker in self.workers:
+            worker.redis = self.redis
+            worker.available = True
+
+    async def hits(self, worker, count):
+        return [await worker.hit("user:1", 10, 60) for _ in range(count)]
+
+    async def test_local_limit(self):
+        worker = RateLimits()
+
+        self.assertEqual((await self.hits(worker, 11)).count(0), 10)
+
+    async def test_limit_is_shared_by_workers(self):
+        first, second = self.workers
+
+        await self.hits(first, 6)
+        await first.sync_all()
+
+        self.assertEqual((await self.hits(second, 10)).count(0), 2)
+        self.assertEqual(second.buckets["user:1"].share, 0.5)
+
+        await second.sync_all()
+        await first.sync_all()
+
+        self.assertEqual(self.redis.total(), 8)
+        self.assertEqual(first.buckets["user:1"].tokens, 1)
+
+    async def test_consumption_is_pushed(self):
+        first, second = self.workers
+
+        await self.hits(first, 3)
+        await self.hits(second, 3)
+        await first.sync_all()
+        await second.sync_all()
+
+        self.assertEqual(self.redis.total(), 6)
+        self.assertEqual(first.buckets["user:1"].tokens, 3.5)
+        self.assertEqual(second.buckets["user:1"].tokens, 2)
+
+        await first.sync_all()
+        self.assertEqual(first.buckets["user:1"].tokens, 2)
+
+    async def test_previous_window_is_weighted(self):
+        worker = self.workers[0]
+        current, previous, elapsed = worker.window_keys("user:1", 60, 120 + 15)
+        self.redis.data[previous] = {"other": 8}
+
+        with patch.object(rate_limit.time, "time", return_value=120 + 15):
+            await worker.hit("user:1", 10, 60)
+
+        self.assertEqual(elapsed, 0.25)
+        self.assertAlmostEqual(worker.buckets["user:1"].tokens, (10 - 8 * 0.75) / 2 - 1, places=3)
+
+    async def test_redis_unreachable(self):
+        self.redis.down = True
+        worker = self.workers[0]
+
+        self.assertEqual((await self.hits(worker, 11)).count(0), 10)
+        self.assertFalse(worker.available)
+
+        with self.assertRaises(ConnectionError):
+            await worker.sync_all()
+        self.assertEqual(worker.buckets["user:1"].pending, 0)
+
+    async def test_idle_keys_are_forgotten(self):
+        worker = self.workers[0]
+        await self.hits(worker, 1)
+        worker.buckets["user:1"].last_hit -= 120
+
+        worker.evict()
+        self.assertIn("user:1", worker.buckets)
+
+        await worker.sync_all()
+        worker.evict()
+        self.assertNotIn("user:1", worker.buckets)
+
+    async def test_idle_keys_are_forgotten_while_redis_is_unreachable(self):
+        self.redis.down = True
+        worker = self.workers[0]
+        await self.hits(worker, 1)
+        worker.buckets["user:1"].last_hit -= 120
+
+        await worker.tick()
+        await worker.tick()
+
+        self.assertFalse(worker.available)
+        self.assertEqual(worker.buckets, {})
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_too_many_requests(self):
+        limiter = RateLimiter(times=1, minutes=1)
+        request = MagicMock(scope={"endpoint": self.test_too_many_requests}, headers={})
+
+        with patch.object(rate_limit, "rate_limits", RateLimits()):
+            await limiter(request, MagicMock())
+            with self.assertRaises(HTTPException) as error:
+                await limiter(request, MagicMock())
+
+        self.assertEqual(error.exception.status_code, 429)
+        self.assertEqual(error.exception.headers["Retry-After"], "60")
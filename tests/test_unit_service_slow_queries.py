@@ -0,0 +1,167 @@
+import asyncio
+import datetime
+import unittest
+from types import SimpleNamespace
+
+from redis.exceptions import ConnectionError
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.database.statements import track_statements
+from app.services.slow_queries import SlowQueryLog, redact
+from config import settings
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def lpush(self, key, value):
+        self.commands.append(("lpush", key, value))
+
+    def ltrim(self, key, start, end):
+        self.commands.append(("ltrim", key, start, end))
+
+    async def execute(self):
+        if self.redis.down:
+            raise ConnectionError("Connection refused")
+
+        for command, key, *args in self.commands:
+            items = self.redis.lists.setdefault(key, [])
+            if command == "lpush":
+                items.insert(0, args[0].encode())
+            else:
+                del items[args[1] + 1:]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.lists = {}
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def lrange(self, key, start, end):
+        return list(self.lists.get(key, []))
+
+    async def delete(self, key):
+        self.lists.pop(key, None)
+
+    async def close(self):
+        pass
+
+
+class TestRedact(unittest.TestCase):
+    def test_redact(self):
+        parameters = (1, 2.5, True, None, "email@test.com", b"hash", datetime.date(2023, 4, 1), ["a", 2])
+
+        self.assertEqual(redact(parameters), [1, 2.5, True, None, "<str, 14>", "<bytes, 4>", "2023-04-01",
+                                              ["<str, 1>", 2]])
+        self.assertEqual(redact({"token": "secret"}), {"token": "<str, 6>"})
+        self.assertEqual(redact(object()), "<object>")
+
+
+class TestSlowQueryLog(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(settings.db_url, poolclass=NullPool)
+        self.redis = FakeRedis()
+        self.log = SlowQueryLog(self.redis, threshold=0.05, size=2)
+        self.log.install(self.engine)
+
+    async def asyncTearDown(self):
+        await self.log.close()
+        await self.engine.dispose()
+
+    async def execute(self, statement: str, **parameters) -> None:
+        async with self.engine.connect() as connection:
+            await connection.execute(text(statement), parameters)
+
+    async def recent(self) -> list[dict]:
+        await asyncio.gather(*self.log.tasks)
+        return await self.log.recent()
+
+    async def test_fast_statements_are_not_logged(self):
+        await self.execute("SELECT 1")
+
+        self.assertEqual(await self.recent(), [])
+
+    async def test_slow_statement(self):
+        scope = {"route": SimpleNamespace(path="/api/images/{image_id}")}
+        with track_statements(scope):
+            await self.execute("SELECT pg_sleep(:delay), :email", delay=0.06, email="email@test.com")
+
+        [entry] = await self.recent()
+        self.assertGreaterEqual(entry["duration"], 0.06)
+        self.assertIn("pg_sleep", entry["statement"])
+        self.assertEqual(entry["parameters"], [0.06, "<str, 14>"])
+        self.assertEqual(entry["route"], "/api/images/{image_id}")
+        self.assertIn("Result", entry["plan"])
+
+    async def test_failed_statement(self):
+        async with self.engine.connect() as connection:
+            await connection.execute(text("SET statement_timeout = 60"))
+            with self.assertRaises(DBAPIError):
+                await connection.execute(text("SELECT pg_sleep(:delay)"), {"delay": 1})
+
+        [entry] = await self.recent()
+        self.assertGreaterEqual(entry["duration"], 0.06)
+        self.assertLess(entry["duration"], 1)
+        self.assertEqual(entry["parameters"], [1])
+        self.assertEqual(entry["error"], "QueryCanceledError")
+        self.assertIn("Result", entry["plan"])
+
+    async def test_cancelled_statement(self):
+        async with self.engine.connect() as connection:
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(connection.execute(text("SELECT pg_sleep(1)")), 0.06)
+
+        [entry] = await self.recent()
+        self.assertGreaterEqual(entry["duration"], 0.05)
+        self.assertLess(entry["duration"], 1)
+        self.assertEqual(entry["error"], "CancelledError")
+
+    async def test_fast_failed_statements_are_not_logged(self):
+        with self.assertRaises(DBAPIError):
+            await self.execute("SELECT 1 / 0")
+
+        self.assertEqual(await self.recent(), [])
+
+    async def test_ring_buffer(self):
+        for delay in (0.07, 0.06, 0.08):
+            await self.execute("SELECT pg_sleep(:delay)", delay=delay)
+            await asyncio.gather(*self.log.tasks)
+
+        entries = await self.recent()
+        self.assertEqual([entry["parameters"] for entry in entries], [[0.08], [0.06]])
+        self.assertEqual(entries[0]["route"], "<background>")
+
+        await self.log.clear()
+        self.assertEqual(await self.recent(), [])
+
+    async def test_shared_by_the_workers(self):
+        other = SlowQueryLog(self.redis, threshold=0.05, size=2)
+
+        await self.execute("SELECT pg_sleep(:delay)", delay=0.06)
+
+        await asyncio.gather(*self.log.tasks)
+        self.assertEqual([entry["parameters"] for entry in await other.recent()], [[0.06]])
+
+    async def test_redis_down(self):
+        self.redis.down = True
+
+        with self.assertLogs("app.services.slow_queries") as logs:
+            await self.execute("SELECT pg_sleep(:delay)", delay=0.06)
+            await asyncio.gather(*self.log.tasks)
+
+        self.assertIn("Slow statement was not stored", logs.output[-1])
+
+    async def test_close_removes_the_hooks(self):
+        await self.log.close()
+
+        await self.execute("SELECT pg_sleep(0.06)")
+
+        self.assertEqual(await self.recent(), [])
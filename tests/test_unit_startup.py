@@ -0,0 +1,26 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+# Total of python -X importtime for main, in seconds. About 1.1 s on a developer machine, the margin absorbs slow CI
+# runners; a regression of the size of an eagerly imported SDK still shows up in benchmarks.startup.
+IMPORT_BUDGET = 3.0
+
+# Imported on first use only, see get_mail_config, sdk, get_html_templates and the __main__ block of main.
+LAZY_MODULES = ("uvicorn", "fastapi_mail", "cloudinary", "fastapi.templating")
+
+
+class TestStartup(unittest.TestCase):
+    def test_import_time(self):
+        script = f"import main, sys; print(','.join(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT, capture_output=True,
+                                text=True, check=True)
+
+        total = next(int(line.split("|")[1]) for line in result.stderr.splitlines()
+                     if line.startswith("import time:") and line.endswith("| main")) / 1e6
+
+        self.assertEqual(result.stdout.strip(), "")
+        self.assertLess(total, IMPORT_BUDGET)